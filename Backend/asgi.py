@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
 
 application = get_asgi_application()
+
+# importa las URLs (vistas, DRF, serializers) al arrancar el worker y no en la primera request
+get_resolver().url_patterns
@@ -1,16 +1,12 @@
 from pathlib import Path
 from datetime import timedelta
 import os
-from pathlib import Path
-import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-
 # -------------------------
 # Seguridad
 # -------------------------
@@ -45,8 +41,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",      # 👈 debe ser lo primero
     "django.middleware.common.CommonMiddleware",  # 👈 y este justo después
+    "usuarios.middleware.MetricasMiddleware",     # Server-Timing, /metrics y log de requests lentas
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "usuarios.middleware.WhiteNoiseMiddleware",   # whitenoise con soporte async (ASGI)
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -54,15 +51,33 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# -------------------------
+# Métricas
+# -------------------------
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 500))
+
 # -------------------------
 # DRF & JWT
 # -------------------------
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "usuarios.autenticacion.UsuarioJWTAuthentication",  # JWT con usuario_id/correo en el token
     ),
+    # proxies delante de la app: la IP del cliente (límites por IP) es la que agregó el último;
+    # en Render hay uno. Con 0 se usa REMOTE_ADDR y X-Forwarded-For se ignora (nunca se confía
+    # en el encabezado tal como llega: el cliente lo puede inventar)
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 1 if os.getenv("RENDER") else 0)),
 }
 
+# cuántos gastos recientes incluye /api/dashboard/
+DASHBOARD_GASTOS_RECIENTES = int(os.getenv("DASHBOARD_GASTOS_RECIENTES", 20))
+
+# límite de filas por POST a /api/gastos/importar/
+IMPORTACION_MAX_FILAS = int(os.getenv("IMPORTACION_MAX_FILAS", 10000))
+# límite de operaciones por POST a /api/gastos/lote/
+LOTE_MAX_OPERACIONES = int(os.getenv("LOTE_MAX_OPERACIONES", 1000))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -106,6 +121,15 @@ CORS_ALLOW_CREDENTIALS = True
 # EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "usuarios.backends.SendGridEmailBackend")
+# EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"  # sin red, para pruebas
+# EMAIL_FILE_PATH = BASE_DIR / "correos"
+
+# bandeja de salida (manage.py procesar_correos)
+CORREO_MAX_INTENTOS = int(os.getenv("CORREO_MAX_INTENTOS", 5))
+CORREO_BACKOFF_SEGUNDOS = int(os.getenv("CORREO_BACKOFF_SEGUNDOS", 30))
+CORREO_BACKOFF_MAXIMO_SEGUNDOS = 60 * 60
+CORREO_ALQUILER_SEGUNDOS = 5 * 60
 
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "noreply@cashtrack.com")
 
@@ -144,9 +168,110 @@ DATABASES = {
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT"),
+        # conexiones persistentes entre requests, verificadas antes de reusarlas
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# sin DB_NAME (desarrollo local / tests) usamos SQLite
+if not os.getenv("DB_NAME"):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+    }
+
+# réplica de solo lectura opcional para dashboard / lista / exportación (usuarios/replicas.py)
+if os.getenv("DB_NAME") and os.getenv("DB_REPLICA_HOST"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv("DB_REPLICA_HOST"),
+        'PORT': os.getenv("DB_REPLICA_PORT", DATABASES['default']['PORT']),
+        'USER': os.getenv("DB_REPLICA_USER", DATABASES['default']['USER']),
+        'PASSWORD': os.getenv("DB_REPLICA_PASSWORD", DATABASES['default']['PASSWORD']),
+    }
+elif not os.getenv("DB_NAME") and os.getenv("SQLITE_REPLICA_PATH"):
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': os.getenv("SQLITE_REPLICA_PATH")}
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ["usuarios.replicas.RouterReplica"]
+# después de escribir, las lecturas del usuario van al primario durante estos segundos
+LECTURA_PRIMARIA_SEGUNDOS = int(os.getenv("LECTURA_PRIMARIA_SEGUNDOS", 5))
+
+
+# -------------------------
+# Cache
+# -------------------------
+# las respuestas cacheadas van versionadas por usuario (usuarios/versiones.py), así que
+# para ellas una cache local por worker es correcta; con REDIS_URL se comparte entre workers.
+# Lo que tiene que verse desde todos los workers (marca de read-your-writes de la réplica)
+# exige una cache compartida: ver _cache_compartida más abajo.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+RESPUESTAS_CACHE_SEGUNDOS = int(os.getenv("RESPUESTAS_CACHE_SEGUNDOS", 300))
+
+
+def _cache_compartida(alias):
+    # locmem (y dummy) viven dentro de cada proceso: con varios workers no se comparten
+    backend = CACHES.get(alias, {}).get("BACKEND", "")
+    return backend.rsplit(".", 1)[-1] not in ("LocMemCache", "DummyCache")
+
+
+# la marca de read-your-writes (usuarios/replicas.py) la deja el worker que escribió y la
+# mira el que atiende la lectura siguiente: sin cache compartida se lee de la réplica atrasada
+if "replica" in DATABASES and not _cache_compartida("default"):
+    raise ImproperlyConfigured("Con réplica de lectura hace falta una cache compartida (REDIS_URL)")
+
+# "bd" (tabla OTPCode) o "cache" (TTL en la cache OTP_CACHE, sin escrituras en la tabla).
+# Con "cache", OTP_CACHE tiene que ser compartida (Redis): el login y la verificación del
+# código pueden caer en workers distintos y una locmem daría "OTP inválido"
+OTP_ALMACEN = os.getenv("OTP_ALMACEN", "bd")
+OTP_CACHE = os.getenv("OTP_CACHE", "default")
+if OTP_ALMACEN == "cache" and not _cache_compartida(OTP_CACHE):
+    raise ImproperlyConfigured("OTP_ALMACEN=cache necesita una OTP_CACHE compartida (REDIS_URL)")
+
+# pedidos de OTP (login/registro) por IP y por correo en cada periodo; 429 al pasarse
+LIMITE_OTP_POR_IP = int(os.getenv("LIMITE_OTP_POR_IP", 20))
+LIMITE_OTP_POR_CORREO = int(os.getenv("LIMITE_OTP_POR_CORREO", 5))
+LIMITE_OTP_PERIODO = int(os.getenv("LIMITE_OTP_PERIODO", 900))  # segundos
+LIMITES_CACHE = os.getenv("LIMITES_CACHE", "default")
+# con varios workers un límite en locmem se multiplica por la cantidad de workers; en
+# desarrollo y tests (sin DB_NAME) hay un solo proceso y alcanza
+if os.getenv("DB_NAME") and not _cache_compartida(LIMITES_CACHE):
+    raise ImproperlyConfigured("LIMITES_CACHE tiene que ser una cache compartida (REDIS_URL)")
+
+# días que se guardan las lápidas de gastos borrados para /api/gastos/sync/;
+# un cliente que no sincroniza en ese tiempo tiene que recargar todo
+SYNC_ELIMINADOS_DIAS = int(os.getenv("SYNC_ELIMINADOS_DIAS", 90))
+
+# `manage.py archivar_gastos` saca de la tabla caliente los meses completos anteriores a
+# los últimos ARCHIVO_MESES (usuarios/archivo.py); ARCHIVO_LOTE gastos por transacción
+ARCHIVO_MESES = int(os.getenv("ARCHIVO_MESES", 24))
+ARCHIVO_LOTE = int(os.getenv("ARCHIVO_LOTE", 2000))
+
+# -------------------------
+# Particionado de gastos (solo PostgreSQL)
+# -------------------------
+# usuarios_gasto particionada por mes de fecha; ver usuarios/particiones.py
+GASTOS_PARTICIONADOS = os.getenv("GASTOS_PARTICIONADOS", "False").lower() == "true"
+# meses futuros que `manage.py crear_particiones` deja creados
+GASTOS_PARTICIONES_ADELANTE = int(os.getenv("GASTOS_PARTICIONES_ADELANTE", 3))
+# "los más recientes" se buscan primero en esta ventana de días (0 = sin ventana)
+GASTOS_VENTANA_DIAS = int(os.getenv("GASTOS_VENTANA_DIAS", 92 if GASTOS_PARTICIONADOS else 0))
+
 
 # -------------------------
 # Passwords
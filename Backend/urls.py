@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from usuarios.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
         path('api/', include('usuarios.urls')),  # 👈 incluye rutas de la app
+    path('metrics', metrics, name='metrics'),  # interno, formato Prometheus
 ]
@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
 
 application = get_wsgi_application()
+
+# importa las URLs (vistas, DRF, serializers) al cargar la app y no en la primera request;
+# con preload_app (gunicorn.conf.py) pasa una sola vez, en el master, antes del fork
+get_resolver().url_patterns
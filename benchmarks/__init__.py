@@ -0,0 +1,78 @@
+# benchmarks/__init__.py
+# Utilidades comunes para los benchmarks. Se ejecutan como módulos desde la raíz:
+#     python -m benchmarks.importacion --filas 2000
+# Cada benchmark crea una base de datos de prueba (igual que `manage.py test`),
+# así nunca escribe sobre la base configurada, e imprime sus resultados en JSON.
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def configurar_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Backend.settings")
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def base_de_prueba(keepdb=False):
+    configurar_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    nombre_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def cliente_autenticado(correo="bench@cashtrack.com", nombre="Bench"):
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from usuarios.autenticacion import tokens_para
+    from usuarios.models import Usuario
+
+    usuario, _ = Usuario.objects.get_or_create(correo=correo, defaults={"nombre": nombre})
+    user, _ = User.objects.get_or_create(username=correo, defaults={"email": correo})
+    cliente = APIClient()
+    token = tokens_para(user, usuario).access_token  # con usuario_id/correo, como los de verify-login
+    cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return usuario, cliente
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def percentiles(muestras):
+    if not muestras:
+        return {}
+    ordenadas = sorted(muestras)
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(round(q * (len(ordenadas) - 1))))]
+
+    return {
+        "n": len(ordenadas),
+        "media_ms": statistics.fmean(ordenadas) * 1000,
+        "p50_ms": p(0.50) * 1000,
+        "p95_ms": p(0.95) * 1000,
+        "p99_ms": p(0.99) * 1000,
+    }
+
+
+def emitir(resultado, salida=None):
+    texto = json.dumps(resultado, indent=2, default=str)
+    if salida:
+        with open(salida, "w") as f:
+            f.write(texto + "\n")
+    sys.stdout.write(texto + "\n")
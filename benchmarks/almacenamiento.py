@@ -0,0 +1,91 @@
+# benchmarks/almacenamiento.py
+# Tamaño de la tabla de gastos y de cada uno de sus índices, más el tiempo de las
+# consultas por usuario que hacen el dashboard, la lista, el detalle y las series.
+# Solo usa la relación inversa (usuario.gasto_set), así sirve para comparar esquemas:
+#     git checkout <antes>   && python -m benchmarks.almacenamiento --salida antes.json
+#     git checkout <despues> && python -m benchmarks.almacenamiento --salida despues.json
+import argparse
+import io
+import time
+from datetime import timedelta
+
+from benchmarks import base_de_prueba, emitir, percentiles
+
+
+def tamanos(connection, tabla):
+    # bytes de la tabla y de cada índice
+    indices = [nombre for nombre, info in
+               connection.introspection.get_constraints(connection.cursor(), tabla).items()
+               if info["index"] or info["unique"] or info["primary_key"]]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_relation_size(%s)", [tabla])
+            resultado = {"tabla": cursor.fetchone()[0]}
+            cursor.execute(
+                "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes WHERE relname = %s",
+                [tabla],
+            )
+            resultado["indices"] = dict(cursor.fetchall())
+        elif connection.vendor == "sqlite":
+            cursor.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+            paginas = dict(cursor.fetchall())
+            resultado = {"tabla": paginas.get(tabla, 0),
+                         "indices": {n: paginas[n] for n in paginas if n in indices or n.startswith(f"sqlite_autoindex_{tabla}")}}
+        else:
+            return {}
+    resultado["indices_total"] = sum(resultado["indices"].values())
+    return resultado
+
+
+def cronometrar_consulta(consulta, iteraciones):
+    muestras = []
+    for _ in range(iteraciones + 1):
+        inicio = time.perf_counter()
+        list(consulta())
+        muestras.append(time.perf_counter() - inicio)
+    return percentiles(muestras[1:])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tamaño de gastos/índices y tiempo de las consultas por usuario")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--gastos", type=int, default=200000)
+    parser.add_argument("--iteraciones", type=int, default=200)
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with base_de_prueba():
+        from django.core.management import call_command
+        from django.db import connection
+        from django.db.models import Sum
+        from django.utils import timezone
+        from usuarios.models import Gasto, Usuario
+
+        call_command("generar_datos", usuarios=args.usuarios, gastos=args.gastos, stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Gasto._meta.db_table}")
+        usuario = Usuario.objects.get(correo="sintetico0@cashtrack.test")
+        gasto = usuario.gasto_set.order_by("id").first()
+        hoy = timezone.localdate()
+
+        consultas = {
+            # las que arman el dashboard y la primera página de /api/gastos/
+            "recientes_20": lambda: usuario.gasto_set.order_by("-fecha", "-id")[:20],
+            "pagina_50": lambda: usuario.gasto_set.order_by("-fecha", "-id")[:51],
+            "detalle": lambda: usuario.gasto_set.filter(pk=gasto.pk),
+            "rango_90_dias": lambda: usuario.gasto_set.filter(fecha__gte=hoy - timedelta(days=90))
+                                     .values("categoria").annotate(total=Sum("cantidad")).order_by(),
+            "conteo": lambda: [usuario.gasto_set.count()],
+        }
+        resultado = {
+            "meta": {"motor": connection.vendor, "gastos": Gasto.objects.count(),
+                     "gastos_usuario": usuario.gasto_set.count()},
+            "tamanos": tamanos(connection, Gasto._meta.db_table),
+            "consultas": {n: cronometrar_consulta(c, args.iteraciones) for n, c in consultas.items()},
+        }
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
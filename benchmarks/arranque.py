@@ -0,0 +1,117 @@
+# benchmarks/arranque.py
+# Arranque en frío: tiempo de import por módulo (`python -X importtime` cargando
+# Backend.wsgi, que incluye las URLs) y tiempo hasta la primera respuesta de gunicorn
+# con y sin preload_app (gunicorn.conf.py).
+#     python -m benchmarks.arranque --top 25 --repeticiones 5
+#     git checkout <antes> && python -m benchmarks.arranque --salida antes.json
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import emitir
+
+CARGAR_APP = "import Backend.wsgi"
+
+
+def importtime(entorno):
+    # {modulo: (propio_us, acumulado_us)} de una carga de Backend.wsgi en un proceso nuevo
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", CARGAR_APP],
+                             env=entorno, capture_output=True, text=True, check=True)
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        if propio.strip().isdigit():
+            modulos[nombre.strip()] = (int(propio), int(acumulado))
+    return modulos
+
+
+def resumen_imports(modulos, top):
+    # por paquete raíz (propio sumado) y los módulos más caros (acumulado)
+    paquetes = {}
+    for nombre, (propio, _) in modulos.items():
+        raiz = nombre.split(".")[0]
+        paquetes[raiz] = paquetes.get(raiz, 0) + propio
+    mas_caros = sorted(modulos.items(), key=lambda m: m[1][1], reverse=True)[:top]
+    return {
+        "total_ms": sum(p for p, _ in modulos.values()) / 1000,
+        "modulos": len(modulos),
+        "por_paquete_ms": {n: us / 1000 for n, us in sorted(paquetes.items(), key=lambda p: -p[1])[:top]},
+        "acumulado_ms": {n: acumulado / 1000 for n, (_, acumulado) in mas_caros},
+    }
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def primera_respuesta(entorno, workers, timeout=60):
+    # segundos desde lanzar gunicorn hasta completar la primera request, y lo que tardó esa request
+    puerto = _puerto_libre()
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "Backend.wsgi:application", "-c", "gunicorn.conf.py",
+         "--workers", str(workers), "--bind", f"127.0.0.1:{puerto}", "--log-level", "warning"],
+        env=entorno, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < timeout:
+            try:
+                conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=timeout)
+                pedido = time.perf_counter()
+                # sin token: pasa por middleware, URLs y autenticación de DRF sin tocar la base
+                conexion.request("GET", "/api/dashboard/")
+                conexion.getresponse().read()
+                fin = time.perf_counter()
+                conexion.close()
+                return fin - inicio, fin - pedido
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("gunicorn no respondió")
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de import por módulo y hasta la primera respuesta")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE="Backend.settings",
+                       SQLITE_PATH=os.path.join(carpeta, "arranque.sqlite3"))
+        entorno.pop("DB_NAME", None)
+
+        cargas = [importtime(entorno) for _ in range(args.repeticiones)]
+        # la mediana por módulo descarta la primera corrida con la cache de disco fría
+        modulos = {n: tuple(statistics.median(c[n][i] for c in cargas if n in c) for i in (0, 1))
+                   for n in cargas[-1]}
+        resultado = {"meta": {"repeticiones": args.repeticiones, "workers": args.workers},
+                     "imports": resumen_imports(modulos, args.top), "primera_respuesta": {}}
+
+        for modo, preload in (("preload", "True"), ("sin_preload", "False")):
+            medidas = [primera_respuesta(dict(entorno, GUNICORN_PRELOAD=preload), args.workers)
+                       for _ in range(args.repeticiones)]
+            resultado["primera_respuesta"][modo] = {
+                "hasta_respuesta_ms": statistics.median(m[0] for m in medidas) * 1000,
+                "request_ms": statistics.median(m[1] for m in medidas) * 1000,
+            }
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
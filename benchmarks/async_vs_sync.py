@@ -0,0 +1,154 @@
+# benchmarks/async_vs_sync.py
+# Throughput con muchas conexiones concurrentes: las vistas sync servidas por gunicorn
+# (workers sync) contra las variantes async (/api/async/...) servidas por uvicorn, con la
+# misma cantidad de workers y los mismos datos (SQLite temporal + manage.py generar_datos).
+#     python -m benchmarks.async_vs_sync --workers 2 --concurrencia 64 --segundos 10
+#     python -m benchmarks.async_vs_sync --sin-cache     # fuerza el ORM en cada request
+import argparse
+import http.client
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import configurar_django, emitir, percentiles
+
+# nombre -> (ruta sync en gunicorn, ruta async en uvicorn)
+RUTAS = {
+    "dashboard": ("/api/dashboard/", "/api/async/dashboard/"),
+    "gastos": ("/api/gastos/", "/api/async/gastos/"),
+}
+
+SERVIDORES = {
+    "sync": lambda puerto, workers: [sys.executable, "-m", "gunicorn", "Backend.wsgi:application",
+                                     "--workers", str(workers), "--bind", f"127.0.0.1:{puerto}",
+                                     "--log-level", "warning"],
+    "async": lambda puerto, workers: [sys.executable, "-m", "uvicorn", "Backend.asgi:application",
+                                      "--workers", str(workers), "--port", str(puerto),
+                                      "--log-level", "warning", "--no-access-log"],
+}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(puerto, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor no levantó en el puerto {puerto}")
+
+
+def _pedir(puerto, ruta, token):
+    # una conexión por request: gunicorn sync no mantiene keep-alive
+    conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+    try:
+        conexion.request("GET", ruta, headers={"Authorization": f"Bearer {token}"})
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        return respuesta.status
+    finally:
+        conexion.close()
+
+
+def carga(puerto, ruta, token, concurrencia, segundos):
+    muestras, errores = [], 0
+    lock = threading.Lock()
+    fin = time.monotonic() + segundos
+
+    def cliente():
+        nonlocal errores
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                estado = _pedir(puerto, ruta, token)
+            except OSError:
+                estado = None
+            duracion = time.perf_counter() - inicio
+            with lock:
+                if estado == 200:
+                    muestras.append(duracion)
+                else:
+                    errores += 1
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        for _ in range(concurrencia):
+            pool.submit(cliente)
+    resultado = percentiles(muestras)
+    resultado["req_por_s"] = len(muestras) / segundos
+    resultado["errores"] = errores
+    return resultado
+
+
+def preparar_datos(usuarios, gastos):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from usuarios.autenticacion import tokens_para
+    from usuarios.models import Usuario
+
+    call_command("migrate", verbosity=0)
+    call_command("generar_datos", usuarios=usuarios, gastos=gastos, stdout=io.StringIO())
+    usuario = Usuario.objects.get(correo="sintetico0@cashtrack.test")
+    user = User.objects.get(username=usuario.correo)
+    return str(tokens_para(user, usuario).access_token)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput sync (gunicorn) vs async (uvicorn)")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--gastos", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--sin-cache", action="store_true", help="Desactiva la cache de respuestas")
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        # base SQLite desechable compartida por este proceso y los servidores
+        entorno = dict(os.environ, SQLITE_PATH=os.path.join(carpeta, "bench.sqlite3"))
+        entorno.pop("DB_NAME", None)
+        if args.sin_cache:
+            entorno["RESPUESTAS_CACHE_SEGUNDOS"] = "0"
+        os.environ.clear()
+        os.environ.update(entorno)
+        configurar_django()
+        token = preparar_datos(args.usuarios, args.gastos)
+
+        resultado = {"meta": {"workers": args.workers, "segundos": args.segundos,
+                              "gastos": args.gastos, "cache": not args.sin_cache}, "servidores": {}}
+        for modo, comando in SERVIDORES.items():
+            puerto = _puerto_libre()
+            servidor = subprocess.Popen(comando(puerto, args.workers), env=entorno)
+            try:
+                _esperar(puerto)
+                medidas = {}
+                for nombre, rutas in RUTAS.items():
+                    ruta = rutas[0] if modo == "sync" else rutas[1]
+                    _pedir(puerto, ruta, token)  # calentar
+                    for concurrencia in args.concurrencia:
+                        medidas[f"{nombre} x{concurrencia}"] = carga(
+                            puerto, ruta, token, concurrencia, args.segundos
+                        )
+                resultado["servidores"][modo] = medidas
+            finally:
+                servidor.terminate()
+                servidor.wait(timeout=30)
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/importacion.py
+# Compara N POST individuales a /api/gastos/ contra un solo POST a /api/gastos/importar/
+# (JSON y CSV) con las mismas N filas.
+#     python -m benchmarks.importacion --filas 2000
+import argparse
+import csv
+import io
+import random
+from datetime import date, timedelta
+
+from benchmarks import base_de_prueba, cliente_autenticado, cronometrar, emitir
+
+CATEGORIAS = ["comida", "transporte", "entretenimiento", "otros"]
+
+
+def generar_filas(n, semilla=1):
+    rnd = random.Random(semilla)
+    hoy = date.today()
+    return [
+        {
+            "categoria": rnd.choice(CATEGORIAS),
+            "cantidad": f"{rnd.uniform(1, 300):.2f}",
+            "fecha": (hoy - timedelta(days=rnd.randint(0, 730))).isoformat(),
+        }
+        for _ in range(n)
+    ]
+
+
+def como_csv(filas):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=["categoria", "cantidad", "fecha"])
+    escritor.writeheader()
+    escritor.writerows(filas)
+    archivo = io.BytesIO(buffer.getvalue().encode("utf-8"))
+    archivo.name = "gastos.csv"
+    return archivo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filas", type=int, default=1000)
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    filas = generar_filas(args.filas)
+    resultados = {"filas": args.filas}
+
+    with base_de_prueba():
+        from usuarios.models import Gasto
+
+        _, cliente = cliente_autenticado("individual@bench.com")
+        segundos, _ = cronometrar(lambda: [
+            cliente.post("/api/gastos/", fila, format="json") for fila in filas
+        ])
+        resultados["post_individual_s"] = segundos
+
+        usuario, cliente = cliente_autenticado("json@bench.com")
+        segundos, resp = cronometrar(lambda: cliente.post("/api/gastos/importar/", filas, format="json"))
+        assert resp.status_code == 201, resp.data
+        assert Gasto.objects.filter(usuario=usuario).count() == args.filas
+        resultados["importar_json_s"] = segundos
+
+        _, cliente = cliente_autenticado("csv@bench.com")
+        archivo = como_csv(filas)
+        segundos, resp = cronometrar(lambda: cliente.post("/api/gastos/importar/", {"archivo": archivo}))
+        assert resp.status_code == 201, resp.data
+        resultados["importar_csv_s"] = segundos
+
+    resultados["aceleracion_json"] = resultados["post_individual_s"] / resultados["importar_json_s"]
+    resultados["aceleracion_csv"] = resultados["post_individual_s"] / resultados["importar_csv_s"]
+    emitir(resultados, args.salida)
+
+
+if __name__ == "__main__":
+    main()
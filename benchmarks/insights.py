@@ -0,0 +1,87 @@
+# benchmarks/insights.py
+# Motor de insights en lote (usuarios/insights.py) sobre 1M+ de gastos: tiempo de
+# `calcular` según la cantidad de procesos del pool, contra el cálculo ingenuo por
+# usuario recorriendo sus Gasto (medido en una muestra y extrapolado a todos).
+# Usa una base SQLite temporal en disco: los procesos del pool abren su propia conexión.
+#     python -m benchmarks.insights --usuarios 5000 --gastos 1000000 --procesos 1 2 4
+import argparse
+import io
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks import configurar_django, emitir
+
+
+def ingenuo(usuario, hoy, meses):
+    # lo que haría una vista por request: traer los Gasto y sumar en Python
+    from usuarios.models import Gasto
+    desde = (hoy.replace(day=1) - timedelta(days=31 * meses)).replace(day=1)
+    por_mes, por_categoria = {}, {}
+    for gasto in Gasto.objects.filter(usuario=usuario, fecha__gte=desde):
+        mes = gasto.fecha.replace(day=1)
+        por_mes[mes] = por_mes.get(mes, Decimal("0")) + gasto.cantidad
+        clave = (mes, gasto.categoria)
+        por_categoria[clave] = por_categoria.get(clave, Decimal("0")) + gasto.cantidad
+    return por_mes, por_categoria
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Insights en lote con NumPy y pool de procesos")
+    parser.add_argument("--usuarios", type=int, default=5000)
+    parser.add_argument("--gastos", type=int, default=1000000)
+    parser.add_argument("--procesos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--lote", type=int, default=1000, help="Usuarios por tramo")
+    parser.add_argument("--muestra", type=int, default=200, help="Usuarios para el cálculo ingenuo")
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.environ["SQLITE_PATH"] = os.path.join(carpeta, "insights.sqlite3")
+        os.environ.pop("DB_NAME", None)
+        configurar_django()
+        from django.core.management import call_command
+        from django.utils import timezone
+        from usuarios import insights
+        from usuarios.models import Gasto, InsightUsuario, ResumenGasto, Usuario
+
+        call_command("migrate", verbosity=0)
+        inicio = time.perf_counter()
+        call_command("generar_datos", usuarios=args.usuarios, gastos=args.gastos, otps=0, dias=400,
+                     stdout=io.StringIO())
+        hoy = timezone.localdate()
+        resultado = {
+            "meta": {"usuarios": Usuario.objects.count(), "gastos": Gasto.objects.count(),
+                     "filas_resumen": ResumenGasto.objects.count(), "lote": args.lote,
+                     "generacion_s": time.perf_counter() - inicio},
+            "motor": {},
+        }
+
+        for procesos in args.procesos:
+            InsightUsuario.objects.all().delete()
+            inicio = time.perf_counter()
+            calculados = insights.calcular(hoy=hoy, lote=args.lote, procesos=procesos)
+            segundos = time.perf_counter() - inicio
+            resultado["motor"][f"procesos={procesos}"] = {
+                "segundos": segundos, "usuarios": calculados, "usuarios_por_s": calculados / segundos,
+            }
+
+        # los usuarios con más historial primero (reparto tipo Zipf): la muestra es pesimista
+        muestra = list(Usuario.objects.order_by("id")[:args.muestra])
+        inicio = time.perf_counter()
+        for usuario in muestra:
+            ingenuo(usuario, hoy, insights.MESES_HISTORIA)
+        segundos = time.perf_counter() - inicio
+        resultado["ingenuo"] = {
+            "usuarios_muestra": len(muestra), "segundos_muestra": segundos,
+            "ms_por_usuario": segundos / len(muestra) * 1000,
+            "segundos_estimados_todos": segundos / len(muestra) * resultado["meta"]["usuarios"],
+        }
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
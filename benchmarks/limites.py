@@ -0,0 +1,67 @@
+# benchmarks/limites.py
+# Costo por request del límite de OTP (usuarios.limites): la verificación sola contra
+# la cache configurada y POST /api/login/ con y sin los límites activos.
+#     python -m benchmarks.limites --iteraciones 2000
+#     REDIS_URL=redis://localhost:6379/0 python -m benchmarks.limites   # contra Redis
+import argparse
+import time
+
+from benchmarks import base_de_prueba, emitir, percentiles
+
+
+def cronometrar_llamadas(funcion, iteraciones):
+    muestras = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion()
+        muestras.append(time.perf_counter() - inicio)
+    return percentiles(muestras)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Overhead del límite de pedidos de OTP")
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with base_de_prueba():
+        from django.conf import settings
+        from django.core.cache import caches
+        from django.test import override_settings
+        from rest_framework.test import APIClient, APIRequestFactory
+        from rest_framework.request import Request
+        from rest_framework.parsers import JSONParser
+        from usuarios.limites import LIMITES_OTP
+        from usuarios.models import Usuario
+        from usuarios.views import LoginView
+
+        cache = caches[settings.LIMITES_CACHE]
+        resultado = {"meta": {"cache": cache.__class__.__name__, "iteraciones": args.iteraciones}}
+
+        # solo la verificación (IP + correo) sin límite efectivo, como en el camino normal
+        fabrica = APIRequestFactory()
+        with override_settings(LIMITE_OTP_POR_IP=10 ** 9, LIMITE_OTP_POR_CORREO=10 ** 9):
+            request = Request(fabrica.post("/api/login/", {"correo": "bench@cashtrack.com"}, format="json"),
+                              parsers=[JSONParser()])
+            resultado["verificacion"] = cronometrar_llamadas(
+                lambda: all(limite().allow_request(request, None) for limite in LIMITES_OTP), args.iteraciones
+            )
+
+            # el endpoint completo; el correo se encola pero no se envía
+            Usuario.objects.create(nombre="Bench", correo="bench@cashtrack.com")
+            cliente = APIClient()
+            login = lambda: cliente.post("/api/login/", {"correo": "bench@cashtrack.com"}, format="json")
+            iteraciones = max(1, args.iteraciones // 10)
+            resultado["login_con_limites"] = cronometrar_llamadas(login, iteraciones)
+            LoginView.throttle_classes = []
+            resultado["login_sin_limites"] = cronometrar_llamadas(login, iteraciones)
+            LoginView.throttle_classes = LIMITES_OTP
+
+        resultado["overhead_media_ms"] = (resultado["login_con_limites"]["media_ms"]
+                                          - resultado["login_sin_limites"]["media_ms"])
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/recurrentes.py
+# Pasada nocturna de `manage.py materializar_recurrentes` sobre muchas plantillas:
+# tiempo total según el tamaño del lote (usuarios por transacción de lectura) y, con
+# --memoria, el pico de memoria de Python (tracemalloc, que a su vez hace más lento todo).
+#     python -m benchmarks.recurrentes --plantillas 100000 --lote 200 1000
+#     python -m benchmarks.recurrentes --plantillas 100000 --memoria
+import argparse
+import io
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks import base_de_prueba, emitir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialización de gastos recurrentes por lotes")
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--plantillas", type=int, default=100000)
+    parser.add_argument("--lote", type=int, nargs="+", default=[1000])
+    parser.add_argument("--memoria", action="store_true", help="Medir el pico con tracemalloc")
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    with base_de_prueba():
+        from decimal import Decimal
+        from django.core.management import call_command
+        from django.utils import timezone
+        from usuarios.models import Gasto, GastoRecurrente, Usuario
+
+        call_command("generar_datos", usuarios=args.usuarios, gastos=0, otps=0, stdout=io.StringIO())
+        usuarios = list(Usuario.objects.values_list("id", flat=True))
+        hoy = timezone.localdate()
+        resultado = {"meta": {"usuarios": len(usuarios), "plantillas": args.plantillas}, "lotes": {}}
+
+        for lote in args.lote:
+            Gasto.objects.filter(recurrente__isnull=False).delete()
+            GastoRecurrente.objects.all().delete()
+            # una ocurrencia vencida por plantilla (la de hoy), como en una corrida diaria
+            GastoRecurrente.objects.bulk_create(
+                [GastoRecurrente(usuario_id=usuarios[i % len(usuarios)], categoria="otros",
+                                 cantidad=Decimal("9.99"), frecuencia="mensual",
+                                 inicio=hoy - timedelta(days=i % 3), proxima=hoy)
+                 for i in range(args.plantillas)],
+                batch_size=5000,
+            )
+            if args.memoria:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            call_command("materializar_recurrentes", lote=lote, stdout=io.StringIO())
+            segundos = time.perf_counter() - inicio
+            medida = {"segundos": segundos,
+                      "gastos_creados": Gasto.objects.filter(recurrente__isnull=False).count()}
+            if args.memoria:
+                medida["pico_memoria_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            resultado["lotes"][str(lote)] = medida
+
+    emitir(resultado, args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# benchmarks/rutas.py
+# Llama a cada ruta de usuarios/urls.py con el cliente de pruebas de Django sobre un
+# dataset sintético (manage.py generar_datos) y reporta p50/p95/p99, throughput y
+# consultas por request. Usa el motor configurado en settings: SQLite por defecto o
+# PostgreSQL si están las variables DB_*.
+#     python -m benchmarks.rutas --usuarios 200 --gastos 100000 --salida actual.json
+#     python -m benchmarks.rutas --comparar base.json      # marca regresiones
+import argparse
+import io
+import json
+import subprocess
+import time
+from datetime import date
+from decimal import Decimal
+
+from benchmarks import base_de_prueba, emitir, percentiles
+
+CODIGO = "123456"
+# el límite de OTP (usuarios/limites.py) sigue activo, pero sin cortar a un cliente que
+# repite login/registro cientos de veces: se mide el camino normal, no respuestas 429
+LIMITES_BENCHMARK = {"LIMITE_OTP_POR_IP": 10 ** 9, "LIMITE_OTP_POR_CORREO": 10 ** 9}
+
+
+class Contexto:
+    # estado compartido por los casos: clientes, usuario de prueba y contador de iteración
+    def __init__(self, usuario, autenticado, anonimo):
+        self.usuario = usuario
+        self.autenticado = autenticado
+        self.anonimo = anonimo
+        self.i = 0
+
+    def gasto_nuevo(self):
+        from usuarios.models import Gasto
+        from usuarios import resumen
+        gasto = Gasto.objects.create(usuario_id=self.usuario.id, categoria="otros",
+                                     cantidad=Decimal("1.00"))
+        resumen.registrar_gasto(self.usuario.id, gasto)
+        return gasto
+
+    def recurrente_nuevo(self):
+        from usuarios.models import GastoRecurrente
+        return GastoRecurrente.objects.create(usuario_id=self.usuario.id, categoria="otros", cantidad=Decimal("1.00"),
+                                              frecuencia="mensual", inicio=date(2030, 1, 1), proxima=date(2030, 1, 1))
+
+    def con_insights(self):
+        # la ruta solo lee: el cálculo en lote se hace una vez, fuera de la medición
+        from django.utils import timezone
+        from usuarios.insights import calcular_tramo
+        from usuarios.models import InsightUsuario
+        if not InsightUsuario.objects.filter(usuario_id=self.usuario.id).exists():
+            calcular_tramo(self.usuario.id, self.usuario.id, timezone.localdate())
+
+    def otp_nuevo(self):
+        from usuarios import otp
+        otp.emitir(self.usuario, CODIGO)  # en la tabla o en la cache según OTP_ALMACEN
+
+
+def _url(nombre, **kwargs):
+    from django.urls import reverse
+    return reverse(nombre, kwargs=kwargs or None)
+
+
+def _verificar(nombre):
+    def preparar(c):
+        c.otp_nuevo()
+        return _url(nombre), {"correo": c.usuario.correo, "otp": CODIGO}
+    return preparar
+
+
+def _insights(c):
+    c.con_insights()
+    return _url("insights"), None
+
+
+# nombre de ruta -> lista de (método, anónimo?, preparar(ctx) -> (url, datos))
+CASOS = {
+    "register": [("post", True, lambda c: (_url("register"), {"correo": f"bench{c.i}@nuevo.test", "nombre": "Bench"}))],
+    "verify-register": [("post", True, _verificar("verify-register"))],
+    "login": [("post", True, lambda c: (_url("login"), {"correo": c.usuario.correo}))],
+    "verify-login": [("post", True, _verificar("verify-login"))],
+    "dashboard": [("get", False, lambda c: (_url("dashboard"), None))],
+    "gastos": [
+        ("get", False, lambda c: (_url("gastos"), None)),
+        ("get", False, lambda c: (_url("gastos") + "?categoria=comida&cantidad_min=10&orden=-cantidad", None)),
+        ("post", False, lambda c: (_url("gastos"), {"categoria": "comida", "cantidad": "12.34"})),
+    ],
+    "gastos-importar": [("post", False, lambda c: (_url("gastos-importar"), [
+        {"categoria": "comida", "cantidad": "1.00", "fecha": "2024-01-01"} for _ in range(100)
+    ]))],
+    "gastos-lote": [("post", False, lambda c: (_url("gastos-lote"), [
+        {"id": c.gasto_nuevo().pk, "op": op, "categoria": "otros", "cantidad": "3.00"}
+        for op in ("eliminar", "categoria", "cantidad") for _ in range(10)
+    ]))],
+    "gastos-exportar": [("get", False, lambda c: (_url("gastos-exportar") + "?formato=ndjson", None))],
+    "gastos-series": [("get", False, lambda c: (_url("gastos-series") + "?periodo=semana", None))],
+    "gastos-sync": [("get", False, lambda c: (_url("gastos-sync") + "?token=0", None))],
+    "gasto-detail": [
+        ("get", False, lambda c: (_url("gasto-detail", pk=c.gasto_nuevo().pk), None)),
+        ("patch", False, lambda c: (_url("gasto-detail", pk=c.gasto_nuevo().pk), {"cantidad": "2.00"})),
+        ("delete", False, lambda c: (_url("gasto-detail", pk=c.gasto_nuevo().pk), None)),
+    ],
+    "presupuesto": [("post", False, lambda c: (_url("presupuesto"), {"presupuesto": "1500"}))],
+    "insights": [("get", False, _insights)],
+    "recurrentes": [
+        ("get", False, lambda c: (_url("recurrentes"), None)),
+        ("post", False, lambda c: (_url("recurrentes"), {"categoria": "otros", "cantidad": "9.99",
+                                                         "frecuencia": "mensual", "inicio": "2030-01-01"})),
+    ],
+    "recurrente-detail": [("patch", False, lambda c: (_url("recurrente-detail", pk=c.recurrente_nuevo().pk),
+                                                      {"cantidad": "5.00"}))],
+    "async-verify-login": [("post", True, _verificar("async-verify-login"))],
+    "async-dashboard": [("get", False, lambda c: (_url("async-dashboard"), None))],
+    "async-gastos": [("get", False, lambda c: (_url("async-gastos"), None))],
+}
+
+
+def _llamar(cliente, metodo, url, datos):
+    respuesta = getattr(cliente, metodo)(url, datos, format="json")
+    if respuesta.status_code >= 400:
+        # un error respondería más rápido que la ruta real: no se cronometra
+        raise RuntimeError(f"{metodo.upper()} {url} respondió {respuesta.status_code}")
+    if getattr(respuesta, "streaming", False):
+        for _ in respuesta.streaming_content:
+            pass
+    return respuesta
+
+
+def medir(ctx, metodo, anonimo, preparar, iteraciones, calentamiento, mantener_cache):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    cliente = ctx.anonimo if anonimo else ctx.autenticado
+    muestras, consultas = [], None
+    for n in range(calentamiento + iteraciones + 1):
+        ctx.i += 1
+        if not mantener_cache:
+            cache.clear()
+        url, datos = preparar(ctx)
+        if n == 0:
+            # una pasada aparte para contar consultas (capturarlas agrega overhead)
+            with CaptureQueriesContext(connection) as capturadas:
+                _llamar(cliente, metodo, url, datos)
+            consultas = len(capturadas.captured_queries)
+            continue
+        inicio = time.perf_counter()
+        _llamar(cliente, metodo, url, datos)
+        if n > calentamiento:
+            muestras.append(time.perf_counter() - inicio)
+
+    resultado = percentiles(muestras)
+    resultado["req_por_s"] = len(muestras) / sum(muestras)
+    resultado["consultas"] = consultas
+    return resultado
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(base, actual, umbral):
+    regresiones = {}
+    for ruta, datos in actual["rutas"].items():
+        anterior = base.get("rutas", {}).get(ruta)
+        if not anterior:
+            continue
+        razon = datos["p50_ms"] / anterior["p50_ms"] if anterior["p50_ms"] else None
+        if (razon and razon > umbral) or datos["consultas"] > anterior["consultas"]:
+            regresiones[ruta] = {
+                "p50_ms": [anterior["p50_ms"], datos["p50_ms"]],
+                "consultas": [anterior["consultas"], datos["consultas"]],
+            }
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de todas las rutas de la API")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--gastos", type=int, default=20000)
+    parser.add_argument("--iteraciones", type=int, default=50)
+    parser.add_argument("--calentamiento", type=int, default=5)
+    parser.add_argument("--cache", action="store_true", help="No vaciar la cache entre requests")
+    parser.add_argument("--keepdb", action="store_true", help="Reutilizar la base de prueba (y sus datos)")
+    parser.add_argument("--salida", help="Guardar el JSON de resultados en este archivo")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=1.2, help="Razón p50 a partir de la cual es regresión")
+    args = parser.parse_args(argv)
+
+    with base_de_prueba(keepdb=args.keepdb):
+        from django.test.utils import override_settings
+        limites = override_settings(**LIMITES_BENCHMARK)
+        limites.enable()
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.db import connection
+        from rest_framework.test import APIClient
+        from usuarios.autenticacion import tokens_para
+        from usuarios.models import Gasto, Usuario
+        from usuarios.urls import urlpatterns
+
+        if not Usuario.objects.filter(correo__endswith="@cashtrack.test").exists():
+            call_command("generar_datos", usuarios=args.usuarios, gastos=args.gastos, stdout=io.StringIO())
+        # el usuario con más historial es el peor caso
+        usuario = Usuario.objects.get(correo="sintetico0@cashtrack.test")
+        user = User.objects.get(username=usuario.correo)
+        autenticado = APIClient()
+        autenticado.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_para(user, usuario).access_token}")
+        ctx = Contexto(usuario, autenticado, APIClient())
+
+        faltantes = {p.name for p in urlpatterns} - set(CASOS)
+        if faltantes:
+            raise SystemExit(f"Rutas sin caso de benchmark: {', '.join(sorted(faltantes))}")
+
+        meta = {
+            "commit": _commit(),
+            "motor": connection.vendor,
+            "usuarios": Usuario.objects.count(),
+            "gastos": Gasto.objects.count(),
+            "gastos_usuario_bench": Gasto.objects.filter(usuario_id=usuario.id).count(),
+            "iteraciones": args.iteraciones,
+            "cache": args.cache,
+        }
+        rutas = {}
+        for nombre, casos in CASOS.items():
+            for metodo, anonimo, preparar in casos:
+                clave = f"{metodo.upper()} {nombre}"
+                if clave in rutas:  # varios casos del mismo método (p. ej. con filtros)
+                    clave += f" #{sum(k == clave or k.startswith(clave + ' #') for k in rutas) + 1}"
+                rutas[clave] = medir(
+                    ctx, metodo, anonimo, preparar, args.iteraciones, args.calentamiento, args.cache
+                )
+        resultado = {"meta": meta, "rutas": rutas}
+        limites.disable()
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            resultado["regresiones"] = comparar(json.load(f), resultado, args.umbral)
+    emitir(resultado, args.salida)
+    if resultado.get("regresiones"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
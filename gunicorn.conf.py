@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+# gunicorn lo lee solo desde la raíz del proyecto (Render: `gunicorn Backend.wsgi:application`).
+# Con preload_app el master importa Django, las URLs y las vistas una vez y cada worker
+# nace de un fork ya caliente: un worker nuevo (arranque, reinicio por max_requests,
+# caída) atiende enseguida y la memoria de los módulos queda compartida entre workers.
+# PORT y WEB_CONCURRENCY los toma gunicorn directamente del entorno.
+#     GUNICORN_PRELOAD=False gunicorn Backend.wsgi:application   # cada worker importa todo
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+
+def pre_fork(server, worker):
+    # lo que el master haya abierto al cargar la app no se comparte con los workers:
+    # cada uno abre sus propias conexiones a la base y a la cache
+    if server.cfg.preload_app:
+        from django.core.cache import caches
+        from django.db import connections
+        connections.close_all()
+        caches.close_all()
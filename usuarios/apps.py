@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuarios'
+
+    def ready(self):
+        # mide el SQL de cada request en cualquier hilo (MetricasMiddleware / /metrics)
+        from django.db.backends.signals import connection_created
+        from . import metricas
+        connection_created.connect(metricas.instalar, dispatch_uid="usuarios.metricas")
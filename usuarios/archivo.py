@@ -0,0 +1,68 @@
+# usuarios/archivo.py
+# Archivo de gastos fríos. `manage.py archivar_gastos` mueve los gastos de los meses
+# anteriores al horizonte (ARCHIVO_MESES) de usuarios_gasto a GastoArchivado, por lotes y
+# cada lote en su transacción, y suma sus totales por mes/categoria a ResumenArchivo.
+#   - ResumenGasto no se toca: sigue contando caliente + archivado, así que el dashboard
+#     y los totales sin filtro salen igual que antes, sin otra consulta.
+#   - Lo que agrega desde filas (series, totales filtrados, exportación) suma también el
+#     archivo cuando el rango llega antes de Usuario.archivado_hasta.
+#   - Invariante: ResumenGasto == agregado(Gasto) + ResumenArchivo
+#     (`manage.py resumen_gastos --verificar` lo comprueba sin leer GastoArchivado).
+# Los archivados son de solo lectura: no salen en la lista paginada ni en el sync, y no
+# se editan ni se borran por la API (GastoDetailView relee la fila con el usuario
+# bloqueado: si se archivó mientras tanto, 404).
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import resumen
+from .filtros import filtrar_gastos, rango_fechas
+from .models import Usuario, Gasto, GastoArchivado, ResumenArchivo
+from .versiones import invalidar
+
+
+def corte(meses=None, hoy=None):
+    # primer día del mes más viejo que queda caliente: se archivan meses completos
+    meses = settings.ARCHIVO_MESES if meses is None else meses
+    hoy = hoy or timezone.localdate()
+    total = hoy.year * 12 + hoy.month - 1 - meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def archivar_usuario(usuario_id, hasta, lote=None):
+    # mueve los gastos con fecha < hasta; devuelve cuántos
+    lote = lote or settings.ARCHIVO_LOTE
+    viejos = Gasto.objects.filter(usuario_id=usuario_id, fecha__lt=hasta)
+    if not viejos.exists():
+        return 0  # el caso común: no sube la versión ni bloquea al usuario
+    archivados = 0
+    while True:
+        with transaction.atomic():
+            invalidar(usuario_id)  # bloquea al usuario: ninguna escritura suya se cruza con el lote
+            gastos = list(viejos.order_by("fecha", "id").only("id", "fecha", "cantidad", "categoria")[:lote])
+            GastoArchivado.objects.bulk_create([
+                GastoArchivado(id=g.id, usuario_id=usuario_id, fecha=g.fecha, cantidad=g.cantidad,
+                               categoria=g.categoria)
+                for g in gastos
+            ])
+            resumen.registrar_lote(usuario_id, gastos, modelo=ResumenArchivo)
+            Gasto.objects.filter(pk__in=[g.id for g in gastos]).delete()
+            # en la misma transacción: quien vea las filas archivadas ve también el corte
+            Usuario.objects.filter(Q(archivado_hasta__isnull=True) | Q(archivado_hasta__lt=hasta),
+                                   pk=usuario_id).update(archivado_hasta=hasta)
+        archivados += len(gastos)
+        if len(gastos) < lote:
+            return archivados
+
+
+def llega_al_archivo(usuario, desde):
+    return usuario.archivado_hasta is not None and (desde is None or desde < usuario.archivado_hasta)
+
+
+def consulta_archivo(usuario, params):
+    # gastos archivados que cumplen los filtros de la lista, o None si el rango no llega
+    desde, _ = rango_fechas(params)
+    if not llega_al_archivo(usuario, desde):
+        return None
+    return filtrar_gastos(GastoArchivado.objects.filter(usuario_id=usuario.id), params)
@@ -0,0 +1,61 @@
+# usuarios/autenticacion.py
+# JWT con la identidad del Usuario dentro del token: las vistas protegidas saben
+# quién llama (id y correo) sin consultar ni auth_user ni usuarios_usuario.
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Usuario
+
+
+def tokens_para(user, usuario):
+    refresh = RefreshToken.for_user(user)
+    # los claims del refresh se copian al access token
+    refresh["usuario_id"] = usuario.id
+    refresh["correo"] = usuario.correo
+    return refresh
+
+
+class UsuarioToken(TokenUser):
+    @cached_property
+    def usuario_id(self):
+        return self.token["usuario_id"]
+
+    @cached_property
+    def username(self):
+        # igual que User.username: el correo
+        return self.token["correo"]
+
+
+class UsuarioJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if "usuario_id" in validated_token and "correo" in validated_token:
+            return UsuarioToken(validated_token)
+        # tokens emitidos antes de estos claims: se resuelve el User en BD como antes
+        return super().get_user(validated_token)
+
+
+# --- helpers para las vistas ---
+
+def usuario_id(request):
+    uid = getattr(request.user, "usuario_id", None)
+    if uid is None:
+        uid = get_usuario(request).id
+    return uid
+
+
+def correo(request):
+    return request.user.username
+
+
+def get_usuario(request):
+    # fila Usuario cacheada durante la request (lanza Usuario.DoesNotExist)
+    usuario = getattr(request, "_usuario_cache", None)
+    if usuario is None:
+        uid = getattr(request.user, "usuario_id", None)
+        if uid is not None:
+            usuario = Usuario.objects.get(pk=uid)
+        else:
+            usuario = Usuario.objects.get(correo=request.user.username)
+        request._usuario_cache = usuario
+    return usuario
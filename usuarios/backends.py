@@ -0,0 +1,58 @@
+# usuarios/backends.py
+# Backend de correo de Django sobre la API HTTP de SendGrid.
+# Se configura con EMAIL_BACKEND = "usuarios.backends.SendGridEmailBackend"; en tests
+# o desarrollo se puede cambiar por locmem/filebased/console sin tocar el worker.
+# sendgrid se importa recién al abrir la conexión: cuesta ~100 ms y solo lo usa
+# `manage.py procesar_correos`, no los workers web (que solo encolan).
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from .metricas import medir
+
+
+class SendGridEmailBackend(BaseEmailBackend):
+    def __init__(self, api_key=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently, **kwargs)
+        self.api_key = api_key or settings.SENDGRID_API_KEY
+        self.client = None
+
+    def open(self):
+        # un solo cliente reutilizado mientras la conexión esté abierta
+        if self.client is not None:
+            return False
+        import sendgrid
+        self.client = sendgrid.SendGridAPIClient(api_key=self.api_key)
+        return True
+
+    def close(self):
+        self.client = None
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        nueva = self.open()
+        enviados = 0
+        try:
+            for message in email_messages:
+                try:
+                    self._send(message)
+                    enviados += 1
+                except Exception:
+                    if not self.fail_silently:
+                        raise
+        finally:
+            if nueva:
+                self.close()
+        return enviados
+
+    def _send(self, message):
+        from sendgrid.helpers.mail import Mail
+        email = Mail(
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,  # remitente validado en SendGrid
+            to_emails=message.to,
+            subject=message.subject,
+            plain_text_content=message.body,
+        )
+        with medir("email"):
+            response = self.client.send(email)
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid respondió {response.status_code}")
@@ -0,0 +1,93 @@
+# usuarios/correo.py
+# Bandeja de salida de correos (CorreoPendiente). Las vistas llaman a encolar()
+# dentro de su transacción; procesar_pendientes() lo ejecuta el comando procesar_correos.
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .metricas import medir
+from .models import CorreoPendiente
+
+logger = logging.getLogger(__name__)
+
+
+def encolar(destinatario, asunto, mensaje):
+    # mide el INSERT en la bandeja de salida, no el envío (ese es "email", en el backend)
+    with medir("email_encolado"):
+        return CorreoPendiente.objects.create(destinatario=destinatario, asunto=asunto, mensaje=mensaje)
+
+
+def _reclamar(lote, ahora):
+    # toma un lote y lo "alquila" moviendo proximo_intento, así otro worker no lo repite
+    # mientras se envía fuera de la transacción (skip_locked en PostgreSQL)
+    with transaction.atomic():
+        pendientes = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True)
+            .filter(estado="pendiente", proximo_intento__lte=ahora)
+            .order_by("proximo_intento", "id")[:lote]
+        )
+        if pendientes:
+            CorreoPendiente.objects.filter(pk__in=[c.pk for c in pendientes]).update(
+                proximo_intento=ahora + timedelta(seconds=settings.CORREO_ALQUILER_SEGUNDOS)
+            )
+    return pendientes
+
+
+def espera_reintento(intentos):
+    # backoff exponencial: base, 2*base, 4*base... con tope
+    segundos = settings.CORREO_BACKOFF_SEGUNDOS * (2 ** max(intentos - 1, 0))
+    return timedelta(seconds=min(segundos, settings.CORREO_BACKOFF_MAXIMO_SEGUNDOS))
+
+
+# envía un lote de la bandeja de salida con una sola conexión; devuelve (enviados, fallidos)
+def procesar_pendientes(lote=50, conexion=None):
+    ahora = timezone.now()
+    pendientes = _reclamar(lote, ahora)
+    if not pendientes:
+        return 0, 0
+
+    conexion = conexion or get_connection()
+    abierta = conexion.open()
+    enviados = fallidos = 0
+    try:
+        for correo in pendientes:
+            if _enviar(conexion, correo):
+                enviados += 1
+            else:
+                fallidos += 1
+    finally:
+        if abierta:
+            conexion.close()
+    return enviados, fallidos
+
+
+def _enviar(conexion, correo):
+    mensaje = EmailMessage(
+        subject=correo.asunto,
+        body=correo.mensaje,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[correo.destinatario],
+        connection=conexion,
+    )
+    try:
+        conexion.send_messages([mensaje])
+    except Exception as e:
+        correo.intentos += 1
+        correo.ultimo_error = str(e)[:1000]
+        if correo.intentos >= settings.CORREO_MAX_INTENTOS:
+            correo.estado = "fallido"
+            logger.error("Correo %s a %s descartado tras %s intentos: %s",
+                         correo.pk, correo.destinatario, correo.intentos, e)
+        else:
+            correo.proximo_intento = timezone.now() + espera_reintento(correo.intentos)
+            logger.warning("Error enviando correo %s a %s (intento %s): %s",
+                           correo.pk, correo.destinatario, correo.intentos, e)
+        correo.save(update_fields=["intentos", "ultimo_error", "estado", "proximo_intento"])
+        return False
+
+    CorreoPendiente.objects.filter(pk=correo.pk).update(
+        estado="enviado", enviado_en=timezone.now(), intentos=correo.intentos + 1
+    )
+    return True
@@ -0,0 +1,108 @@
+# usuarios/filtros.py
+# Filtros por query params compartidos por las vistas de gastos.
+from decimal import Decimal, InvalidOperation
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from .models import Gasto
+
+CATEGORIAS_VALIDAS = {c for c, _ in Gasto.CATEGORIAS}
+FILTROS = ("desde", "hasta", "categoria", "cantidad_min", "cantidad_max")
+
+# ?orden= -> (campo, descendente); cada uno tiene su índice (ver Gasto.Meta.indexes)
+ORDENES = {
+    "-fecha": ("fecha", True),
+    "fecha": ("fecha", False),
+    "-cantidad": ("cantidad", True),
+    "cantidad": ("cantidad", False),
+}
+ORDEN_POR_DEFECTO = "-fecha"
+
+
+def _fecha(params, nombre):
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValidationError({nombre: "Fecha inválida, usa YYYY-MM-DD"})
+    return fecha
+
+
+# ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (ambos inclusive)
+def rango_fechas(params):
+    desde = _fecha(params, "desde")
+    hasta = _fecha(params, "hasta")
+    if desde and hasta and desde > hasta:
+        raise ValidationError({"desde": "desde no puede ser posterior a hasta"})
+    return desde, hasta
+
+
+# ?categoria=a&categoria=b o ?categoria=a,b
+def categorias(params):
+    valores = [c for valor in params.getlist("categoria") for c in valor.split(",") if c]
+    invalidas = set(valores) - CATEGORIAS_VALIDAS
+    if invalidas:
+        raise ValidationError({"categoria": f"Categoría inválida: {', '.join(sorted(invalidas))}"})
+    return valores
+
+
+def _cantidad(params, nombre):
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    try:
+        cantidad = Decimal(valor)
+    except InvalidOperation:
+        cantidad = None
+    if cantidad is None or not cantidad.is_finite():
+        raise ValidationError({nombre: "Cantidad inválida"})
+    return cantidad
+
+
+# ?cantidad_min=10&cantidad_max=50 (ambos inclusive)
+def rango_cantidades(params):
+    minimo = _cantidad(params, "cantidad_min")
+    maximo = _cantidad(params, "cantidad_max")
+    if minimo is not None and maximo is not None and minimo > maximo:
+        raise ValidationError({"cantidad_min": "cantidad_min no puede ser mayor que cantidad_max"})
+    return minimo, maximo
+
+
+# ?orden=-fecha|fecha|-cantidad|cantidad
+def orden(params):
+    valor = params.get("orden") or ORDEN_POR_DEFECTO
+    if valor not in ORDENES:
+        raise ValidationError({"orden": f"Orden inválido, usa {', '.join(ORDENES)}"})
+    return ORDENES[valor]
+
+
+def hay_filtros(params):
+    return any(params.get(nombre) for nombre in FILTROS)
+
+
+def filtrar_gastos(queryset, params):
+    desde, hasta = rango_fechas(params)
+    if desde:
+        queryset = queryset.filter(fecha__gte=desde)
+    if hasta:
+        queryset = queryset.filter(fecha__lte=hasta)
+
+    seleccion = categorias(params)
+    if seleccion:
+        queryset = queryset.filter(categoria__in=seleccion)
+
+    minimo, maximo = rango_cantidades(params)
+    if minimo is not None:
+        queryset = queryset.filter(cantidad__gte=minimo)
+    if maximo is not None:
+        queryset = queryset.filter(cantidad__lte=maximo)
+    return queryset
+
+
+def ordenar_gastos(queryset, params):
+    campo, descendente = orden(params)
+    signo = "-" if descendente else ""
+    return queryset.order_by(f"{signo}{campo}", f"{signo}id")
@@ -0,0 +1,168 @@
+# usuarios/insights.py
+# Insights por usuario calculados en lote (`manage.py calcular_insights`, cron nocturno).
+# Se lee ResumenGasto, que ya está agregado por usuario/mes/categoria e incluye lo
+# archivado, por tramos de usuarios. Cada tramo se arma en un cubo NumPy
+# [usuario, mes, categoria] y todo se calcula vectorizado:
+#   - promedio y tendencia (pendiente por mínimos cuadrados) de los meses completos;
+#   - anomalías: categorías cuyo gasto del mes en curso ya supera su media + Z desvíos;
+#   - pronóstico de fin de mes: lo gastado más el ritmo diario, mezcla del mes y la historia.
+# Los tramos son independientes: con procesos > 1 se reparten en un pool de procesos.
+# GET /api/insights/ solo lee InsightUsuario.
+import calendar
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+from itertools import repeat
+import django
+import numpy as np
+from django.db import connections
+from django.utils import timezone
+from .models import Usuario, Gasto, InsightUsuario, ResumenGasto
+from .resumen import inicio_mes
+
+CATEGORIAS = [c for c, _ in Gasto.CATEGORIAS]
+MESES_HISTORIA = 12
+Z_ANOMALIA = 2.0
+MIN_MESES_ANOMALIA = 3  # con menos historia no hay contra qué comparar
+LECTURA = 20000  # filas de ResumenGasto por bloque
+
+
+def _numero_mes(fecha):
+    return fecha.year * 12 + fecha.month - 1
+
+
+def _mes(numero):
+    return date(numero // 12, numero % 12 + 1, 1)
+
+
+def armar_cubo(ids, filas, primer_mes, meses):
+    # ids ordenados (np.int64); filas (usuario_id, mes, categoria, total) de cualquier largo,
+    # se pasan a arrays por bloques. El último mes del cubo es el mes en curso.
+    cubo = np.zeros((len(ids), meses + 1, len(CATEGORIAS)))
+    indice = {c: i for i, c in enumerate(CATEGORIAS)}
+    base = _numero_mes(primer_mes)
+    bloque = []
+
+    def volcar():
+        n = len(bloque)
+        usuarios = np.fromiter((f[0] for f in bloque), np.int64, n)
+        mes = np.fromiter((_numero_mes(f[1]) - base for f in bloque), np.int64, n)
+        categoria = np.fromiter((indice[f[2]] for f in bloque), np.int64, n)
+        total = np.fromiter((f[3] for f in bloque), np.float64, n)
+        np.add.at(cubo, (np.searchsorted(ids, usuarios), mes, categoria), total)
+        bloque.clear()
+
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= LECTURA:
+            volcar()
+    if bloque:
+        volcar()
+    return cubo
+
+
+def estadisticas(cubo, dia, dias_mes):
+    historia, actual = cubo[:, :-1, :], cubo[:, -1, :]
+    mensual = historia.sum(axis=2)  # [usuarios, meses]
+    usuarios, meses = mensual.shape
+
+    # la historia empieza en el primer mes con gastos: antes no usaba la app, no es un 0
+    activo = mensual > 0
+    primero = np.where(activo.any(axis=1), activo.argmax(axis=1), meses)
+    valido = np.arange(meses) >= primero[:, None]
+    n = valido.sum(axis=1)
+    con_historia = n > 0
+    divisor = np.maximum(n, 1)
+    promedio = (mensual * valido).sum(axis=1) / divisor
+
+    x = np.arange(meses, dtype=float)
+    dx = (x - (x * valido).sum(axis=1)[:, None] / divisor[:, None]) * valido
+    varianza = (dx ** 2).sum(axis=1)
+    tendencia = np.divide((dx * (mensual - promedio[:, None])).sum(axis=1), varianza,
+                          out=np.full(usuarios, np.nan), where=varianza > 0)
+
+    # por categoría: lo que va del mes contra media y desvío de los meses con historia
+    media = (historia * valido[:, :, None]).sum(axis=1) / divisor[:, None]
+    desvio = np.sqrt((((historia - media[:, None, :]) ** 2) * valido[:, :, None]).sum(axis=1) / divisor[:, None])
+    escala = np.maximum(desvio, 0.1 * media)  # sin variación, un 10% de la media
+    z = np.divide(actual - media, escala, out=np.zeros_like(media), where=escala > 0)
+    anomala = (n[:, None] >= MIN_MESES_ANOMALIA) & (z >= Z_ANOMALIA)
+
+    gastado = actual.sum(axis=1)
+    ritmo_mes = gastado / dia
+    ritmo_historia = np.where(con_historia, promedio / dias_mes, ritmo_mes)
+    peso = dia / dias_mes  # cuanto más avanzado el mes, más pesa su propio ritmo
+    pronostico = gastado + (dias_mes - dia) * (peso * ritmo_mes + (1 - peso) * ritmo_historia)
+
+    return {"gastado": gastado, "pronostico": pronostico, "promedio": promedio, "tendencia": tendencia,
+            "meses": n, "anomala": anomala, "actual": actual, "media": media, "z": z}
+
+
+def _centavos(valor):
+    return Decimal(f"{valor:.2f}")
+
+
+def calcular_tramo(desde_id, hasta_id, hoy, meses=MESES_HISTORIA):
+    # calcula y guarda los insights de los usuarios con id en [desde_id, hasta_id]
+    mes_actual = inicio_mes(hoy)
+    primer_mes = _mes(_numero_mes(mes_actual) - meses)
+    ids = np.fromiter(
+        Usuario.objects.filter(pk__gte=desde_id, pk__lte=hasta_id).order_by("pk").values_list("pk", flat=True),
+        np.int64,
+    )
+    filas = (
+        ResumenGasto.objects.filter(usuario_id__gte=desde_id, usuario_id__lte=hasta_id,
+                                    mes__gte=primer_mes, mes__lte=mes_actual, num_gastos__gt=0)
+        .values_list("usuario_id", "mes", "categoria", "total")
+        .iterator(chunk_size=LECTURA)
+    )
+    datos = estadisticas(armar_cubo(ids, filas, primer_mes, meses),
+                         hoy.day, calendar.monthrange(hoy.year, hoy.month)[1])
+
+    ahora = timezone.now()
+    insights = []
+    for i, usuario_id in enumerate(ids.tolist()):
+        anomalias = [
+            {"categoria": CATEGORIAS[c], "gastado": float(_centavos(datos["actual"][i, c])),
+             "promedio": float(_centavos(datos["media"][i, c])), "z": round(float(datos["z"][i, c]), 2)}
+            for c in np.flatnonzero(datos["anomala"][i])
+        ]
+        tendencia = datos["tendencia"][i]
+        insights.append(InsightUsuario(
+            usuario_id=usuario_id, mes=mes_actual, calculado_en=ahora,
+            gastado_mes=_centavos(datos["gastado"][i]), pronostico_mes=_centavos(datos["pronostico"][i]),
+            promedio_mensual=_centavos(datos["promedio"][i]),
+            tendencia_mensual=None if np.isnan(tendencia) else _centavos(tendencia),
+            meses_historia=int(datos["meses"][i]), anomalias=anomalias,
+        ))
+    InsightUsuario.objects.bulk_create(
+        insights, batch_size=1000, update_conflicts=True, unique_fields=["usuario"],
+        update_fields=["mes", "gastado_mes", "pronostico_mes", "promedio_mensual", "tendencia_mensual",
+                       "meses_historia", "anomalias", "calculado_en"],
+    )
+    return len(insights)
+
+
+def tramos(lote):
+    # (primer id, último id) de cada lote de usuarios, por keyset
+    ultimo = 0
+    while True:
+        ids = list(Usuario.objects.filter(pk__gt=ultimo).order_by("pk").values_list("pk", flat=True)[:lote])
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        ultimo = ids[-1]
+
+
+def calcular(hoy=None, meses=MESES_HISTORIA, lote=5000, procesos=1):
+    hoy = hoy or timezone.localdate()
+    partes = list(tramos(lote))
+    if procesos <= 1 or len(partes) <= 1:
+        return sum(calcular_tramo(desde, hasta, hoy, meses) for desde, hasta in partes)
+    # spawn: cada proceso arranca Django de cero y abre sus propias conexiones
+    connections.close_all()
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=django.setup) as pool:
+        desdes, hastas = zip(*partes)
+        return sum(pool.map(calcular_tramo, desdes, hastas, repeat(hoy), repeat(meses)))
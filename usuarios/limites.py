@@ -0,0 +1,88 @@
+# usuarios/limites.py
+# Límite de pedidos de OTP (login / registro) por IP y por correo, compartido entre
+# workers porque vive en la cache (Redis en producción, locmem en tests).
+# Cada cubeta se recarga a LIMITE_OTP_PERIODO: un contador por ventana con incr()
+# atómico, y la ventana anterior pesa según lo que falta para que termine (ventana
+# deslizante), así no hay ráfagas dobles en el borde. No toca la BD.
+# Los pedidos rechazados no cuentan: si no, alguien que insiste con el correo de otra
+# persona la dejaría bloqueada mientras dure la insistencia.
+# La cache tiene que ser compartida entre workers (settings lo exige fuera de desarrollo).
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+class LimiteOTP(BaseThrottle):
+    alcance = None
+    ajuste = None  # nombre del setting con el máximo por periodo
+
+    def identificador(self, request):
+        raise NotImplementedError
+
+    def _contar(self, cache, clave, periodo):
+        # incr() es atómico; la primera vez de la ventana se crea con add()
+        try:
+            return cache.incr(clave)
+        except ValueError:
+            if cache.add(clave, 1, periodo * 2):
+                return 1
+            return cache.incr(clave)
+
+    def allow_request(self, request, view):
+        ident = self.identificador(request)
+        if not ident:
+            return True
+        limite = getattr(settings, self.ajuste)
+        periodo = settings.LIMITE_OTP_PERIODO
+        cache = caches[settings.LIMITES_CACHE]
+
+        ahora = time.time()
+        ventana, transcurrido = divmod(ahora, periodo)
+        huella = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+        base = f"limite:{self.alcance}:{huella}:"
+        actual, anterior = f"{base}{int(ventana)}", f"{base}{int(ventana) - 1}"
+        cuentas = cache.get_many([actual, anterior])
+        usados, previos = cuentas.get(actual, 0), cuentas.get(anterior, 0)
+
+        peso = 1 - transcurrido / periodo
+        if previos * peso + usados + 1 <= limite:
+            usados = self._contar(cache, actual, periodo)
+            if previos * peso + usados <= limite:
+                return True
+            cache.decr(actual)  # otro worker contó entre la lectura y el incr(): se devuelve
+            usados -= 1
+        self.espera = self._espera(limite, periodo, transcurrido, previos, usados)
+        return False
+
+    @staticmethod
+    def _espera(limite, periodo, transcurrido, previos, usados):
+        # segundos hasta que entre un pedido más, si no llega ninguno otro (usados: los
+        # aceptados en la ventana actual)
+        if usados < limite and previos:
+            return max(0.0, periodo * (1 - (limite - usados - 1) / previos) - transcurrido)
+        return (periodo - transcurrido) + max(0.0, periodo * (1 - (limite - 1) / max(usados, 1)))
+
+    def wait(self):
+        return getattr(self, "espera", None)
+
+
+class LimitePorIP(LimiteOTP):
+    alcance = "ip"
+    ajuste = "LIMITE_OTP_POR_IP"
+
+    def identificador(self, request):
+        return self.get_ident(request)
+
+
+class LimitePorCorreo(LimiteOTP):
+    alcance = "correo"
+    ajuste = "LIMITE_OTP_POR_CORREO"
+
+    def identificador(self, request):
+        correo = request.data.get("correo") if hasattr(request.data, "get") else None
+        return str(correo).strip().lower() if correo else None
+
+
+LIMITES_OTP = [LimitePorIP, LimitePorCorreo]
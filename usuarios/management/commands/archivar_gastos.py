@@ -0,0 +1,26 @@
+# usuarios/management/commands/archivar_gastos.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from usuarios.archivo import archivar_usuario, corte
+from usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = "Mueve los gastos anteriores al horizonte a GastoArchivado y resume sus totales (cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=settings.ARCHIVO_MESES,
+                            help="Meses completos que quedan en la tabla caliente")
+        parser.add_argument("--lote", type=int, default=settings.ARCHIVO_LOTE, help="Gastos por transacción")
+
+    def handle(self, *args, **options):
+        hasta = corte(options["meses"])
+        archivados, usuarios = 0, 0
+        for usuario_id in Usuario.objects.order_by("id").values_list("id", flat=True).iterator(chunk_size=1000):
+            movidos = archivar_usuario(usuario_id, hasta, options["lote"])
+            if movidos:
+                archivados += movidos
+                usuarios += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"{archivados} gastos archivados de {usuarios} usuarios (anteriores a {hasta})"
+        ))
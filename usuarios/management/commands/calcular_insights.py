@@ -0,0 +1,20 @@
+# usuarios/management/commands/calcular_insights.py
+import time
+from django.core.management.base import BaseCommand
+from usuarios.insights import MESES_HISTORIA, calcular
+
+
+class Command(BaseCommand):
+    help = "Recalcula InsightUsuario de todos los usuarios (tendencia, anomalías, pronóstico) (cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=1, help="Procesos del pool (1 = en este proceso)")
+        parser.add_argument("--lote", type=int, default=5000, help="Usuarios por tramo")
+        parser.add_argument("--meses", type=int, default=MESES_HISTORIA, help="Meses completos de historia")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        calculados = calcular(meses=options["meses"], lote=options["lote"], procesos=options["procesos"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{calculados} usuarios con insights en {time.perf_counter() - inicio:.1f} s"
+        ))
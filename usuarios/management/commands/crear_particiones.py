@@ -0,0 +1,36 @@
+# usuarios/management/commands/crear_particiones.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from usuarios.models import Gasto
+from usuarios.particiones import activo, convertir, crear_particiones, esta_particionada
+
+
+class Command(BaseCommand):
+    help = "Crea por adelantado las particiones mensuales de usuarios_gasto (PostgreSQL, cron diario)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=settings.GASTOS_PARTICIONES_ADELANTE,
+                            help="Meses futuros a dejar creados")
+        parser.add_argument("--convertir", action="store_true",
+                            help="Si la tabla todavía no está particionada, convertirla primero")
+
+    def handle(self, *args, **options):
+        if not activo(connection):
+            self.stdout.write("Particionado desactivado (requiere PostgreSQL y GASTOS_PARTICIONADOS=True)")
+            return
+
+        if not esta_particionada(connection):
+            if not options["convertir"]:
+                raise CommandError("usuarios_gasto no está particionada; usa --convertir")
+            with connection.schema_editor() as editor:
+                convertir(editor, Gasto, options["meses"])
+            self.stdout.write(self.style.SUCCESS("usuarios_gasto convertida a tabla particionada"))
+
+        hoy = timezone.localdate()
+        creadas = crear_particiones(connection, hoy, hoy + timedelta(days=31 * options["meses"]))
+        for nombre in creadas:
+            self.stdout.write(f"Creada {nombre}")
+        self.stdout.write(self.style.SUCCESS(f"{len(creadas)} particiones nuevas"))
@@ -0,0 +1,122 @@
+# usuarios/management/commands/generar_datos.py
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from usuarios.models import Usuario, Gasto, OTPCode
+from usuarios.resumen import reconstruir
+
+# reparto aproximado de categorías y montos (media, desvío del log) de una app de gastos personales
+CATEGORIAS = [
+    ("comida", 0.45, 2.6, 0.7),
+    ("transporte", 0.25, 1.8, 0.6),
+    ("entretenimiento", 0.15, 3.2, 0.8),
+    ("otros", 0.15, 3.0, 1.0),
+]
+
+
+class Command(BaseCommand):
+    help = "Genera usuarios, gastos y OTPs sintéticos para pruebas de carga"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=100)
+        parser.add_argument("--gastos", type=int, default=10000, help="Total de gastos a repartir")
+        parser.add_argument("--otps", type=int, default=2, help="OTPs por usuario")
+        parser.add_argument("--dias", type=int, default=730, help="Antigüedad máxima de los gastos")
+        parser.add_argument("--lote", type=int, default=5000, help="Filas por bulk_create")
+        parser.add_argument("--prefijo", default="sintetico", help="Prefijo de los correos generados")
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["semilla"])
+        prefijo = options["prefijo"]
+        if self._generados(prefijo).exists():
+            raise CommandError(f"Ya hay usuarios con el prefijo '{prefijo}', usa otro --prefijo")
+
+        usuarios = self._crear_usuarios(options["usuarios"], prefijo, options["lote"])
+        self.stdout.write(f"{len(usuarios)} usuarios creados")
+
+        total = self._crear_gastos(rnd, usuarios, options["gastos"], options["dias"], options["lote"])
+        self.stdout.write(f"{total} gastos creados")
+
+        otps = self._crear_otps(rnd, usuarios, options["otps"], options["lote"])
+        self.stdout.write(f"{otps} OTPs creados")
+
+        for usuario in usuarios:
+            reconstruir(usuario)
+        self.stdout.write(self.style.SUCCESS("Resúmenes reconstruidos"))
+
+    def _crear_usuarios(self, n, prefijo, lote):
+        correos = [f"{prefijo}{i}@cashtrack.test" for i in range(n)]
+        Usuario.objects.bulk_create(
+            [Usuario(nombre=f"Usuario {i}"[:15], correo=c, presupuesto=Decimal(500 + (i % 20) * 100))
+             for i, c in enumerate(correos)],
+            batch_size=lote,
+        )
+        User.objects.bulk_create(
+            [User(username=c, email=c) for c in correos],
+            batch_size=lote, ignore_conflicts=True,
+        )
+        return list(self._generados(prefijo).order_by("id"))
+
+    def _generados(self, prefijo):
+        return Usuario.objects.filter(correo__startswith=prefijo, correo__endswith="@cashtrack.test")
+
+    def _reparto(self, n_usuarios, n_gastos):
+        # pocos usuarios con mucho historial y muchos con poco (tipo Zipf)
+        pesos = [1 / (i + 1) ** 0.8 for i in range(n_usuarios)]
+        suma = sum(pesos)
+        cuotas = [int(n_gastos * p / suma) for p in pesos]
+        for i in range(n_gastos - sum(cuotas)):
+            cuotas[i % n_usuarios] += 1
+        return cuotas
+
+    def _crear_gastos(self, rnd, usuarios, n_gastos, dias, lote):
+        hoy = timezone.localdate()
+        nombres = [c[0] for c in CATEGORIAS]
+        pesos = [c[1] for c in CATEGORIAS]
+        parametros = {c[0]: (c[2], c[3]) for c in CATEGORIAS}
+
+        buffer, total = [], 0
+        for usuario, cuota in zip(usuarios, self._reparto(len(usuarios), n_gastos)):
+            for categoria in rnd.choices(nombres, weights=pesos, k=cuota):
+                mu, sigma = parametros[categoria]
+                # más gastos recientes que antiguos
+                antiguedad = int(dias * rnd.random() ** 1.5)
+                buffer.append(Gasto(
+                    usuario_id=usuario.id,
+                    fecha=hoy - timedelta(days=antiguedad),
+                    categoria=categoria,
+                    cantidad=Decimal(f"{rnd.lognormvariate(mu, sigma):.2f}") or Decimal("0.01"),
+                ))
+                if len(buffer) >= lote:
+                    Gasto.objects.bulk_create(buffer)
+                    total += len(buffer)
+                    buffer = []
+        if buffer:
+            Gasto.objects.bulk_create(buffer)
+            total += len(buffer)
+        return total
+
+    def _crear_otps(self, rnd, usuarios, por_usuario, lote):
+        ahora = timezone.now()
+        buffer, total = [], 0
+        for usuario in usuarios:
+            for _ in range(por_usuario):
+                creado_hace = timedelta(minutes=rnd.randint(0, 60 * 24 * 30))
+                buffer.append(OTPCode(
+                    usuario=usuario,
+                    code=f"{rnd.randint(100000, 999999)}",
+                    expires_at=ahora - creado_hace + timedelta(minutes=5),
+                    used=rnd.random() < 0.8,
+                ))
+                if len(buffer) >= lote:
+                    OTPCode.objects.bulk_create(buffer)
+                    total += len(buffer)
+                    buffer = []
+        if buffer:
+            OTPCode.objects.bulk_create(buffer)
+            total += len(buffer)
+        return total
@@ -0,0 +1,37 @@
+# usuarios/management/commands/materializar_recurrentes.py
+from itertools import groupby
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from usuarios.models import GastoRecurrente
+from usuarios.recurrentes import MAX_OCURRENCIAS, materializar, materializar_usuario, vencidas
+
+
+class Command(BaseCommand):
+    help = "Crea los gastos recurrentes vencidos de todos los usuarios, por lotes de usuarios (cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Usuarios por lote")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        pendientes = GastoRecurrente.objects.filter(proxima__lte=hoy)
+        ultimo, creados = 0, 0
+        while True:
+            # los siguientes N usuarios con algo vencido, por id (índice usuario, proxima):
+            # memoria acotada al lote y una sola transacción por usuario
+            usuarios = list(
+                pendientes.filter(usuario_id__gt=ultimo).order_by("usuario_id")
+                .values_list("usuario_id", flat=True).distinct()[:options["lote"]]
+            )
+            if not usuarios:
+                break
+            ultimo = usuarios[-1]
+            plantillas = pendientes.filter(usuario_id__in=usuarios).order_by("usuario_id", "id")
+            for usuario_id, grupo in groupby(plantillas, key=lambda p: p.usuario_id):
+                grupo = list(grupo)
+                atrasado = any(len(vencidas(p, hoy)) >= MAX_OCURRENCIAS for p in grupo)
+                creados += materializar(usuario_id, grupo, hoy)
+                if atrasado:
+                    # alguna superó el tope por pasada: el resto se completa ahora
+                    creados += materializar_usuario(usuario_id, hoy)
+        self.stdout.write(self.style.SUCCESS(f"{creados} gastos recurrentes creados"))
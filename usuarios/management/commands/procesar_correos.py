@@ -0,0 +1,35 @@
+# usuarios/management/commands/procesar_correos.py
+import time
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from usuarios.correo import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Worker de la bandeja de salida: envía los correos pendientes (OTP) con reintentos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=50, help="Correos por lote")
+        parser.add_argument("--intervalo", type=float, default=2.0,
+                            help="Segundos de espera cuando no hay pendientes")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Vaciar lo pendiente y salir (útil en cron o tests)")
+        parser.add_argument("--backend", help="Backend de correo a usar en vez de EMAIL_BACKEND")
+
+    def handle(self, *args, **options):
+        # una sola conexión (cliente SendGrid) para todo el proceso
+        conexion = get_connection(options["backend"])
+        conexion.open()
+        try:
+            while True:
+                enviados, fallidos = procesar_pendientes(options["lote"], conexion=conexion)
+                if enviados or fallidos:
+                    self.stdout.write(f"{enviados} enviados, {fallidos} con error")
+                    continue
+                if options["una_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            conexion.close()
@@ -0,0 +1,17 @@
+# usuarios/management/commands/purgar_eliminados.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from usuarios.sync import purgar
+
+
+class Command(BaseCommand):
+    help = "Borra las lápidas de gastos eliminados más viejas que --dias (sync incremental)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=settings.SYNC_ELIMINADOS_DIAS)
+
+    def handle(self, *args, **options):
+        purgadas = purgar(timezone.now() - timedelta(days=options["dias"]))
+        self.stdout.write(self.style.SUCCESS(f"{purgadas} lápidas borradas"))
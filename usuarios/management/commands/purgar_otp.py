@@ -0,0 +1,25 @@
+# usuarios/management/commands/purgar_otp.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from usuarios.models import OTPCode
+
+
+class Command(BaseCommand):
+    help = "Borra los OTP vencidos o ya usados, por lotes de id (cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Filas por DELETE")
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        borrables = OTPCode.objects.filter(Q(used=True) | Q(expires_at__lt=ahora)).order_by("id")
+        ultimo, borrados = 0, 0
+        while True:
+            # avanza por la PK: cada lote es un rango corto, no un recorrido desde el principio
+            ids = list(borrables.filter(id__gt=ultimo).values_list("id", flat=True)[:options["lote"]])
+            if not ids:
+                break
+            borrados += OTPCode.objects.filter(id__in=ids).delete()[0]
+            ultimo = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"{borrados} OTP borrados"))
@@ -0,0 +1,41 @@
+# usuarios/management/commands/resumen_gastos.py
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Usuario
+from usuarios.resumen import calcular_desde_gastos, leer_resumen, reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye o verifica ResumenGasto a partir de la tabla de gastos (más ResumenArchivo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--correo", help="Procesar solo este usuario")
+        parser.add_argument(
+            "--verificar", action="store_true",
+            help="Solo comparar resumen vs gastos, sin escribir (sale con error si hay diferencias)",
+        )
+
+    def handle(self, *args, **options):
+        usuarios = Usuario.objects.order_by("id")
+        if options["correo"]:
+            usuarios = usuarios.filter(correo=options["correo"])
+            if not usuarios.exists():
+                raise CommandError(f"Usuario {options['correo']} no existe")
+
+        procesados = 0
+        con_diferencias = []
+        for usuario in usuarios.iterator(chunk_size=500):
+            procesados += 1
+            if options["verificar"]:
+                if leer_resumen(usuario) != calcular_desde_gastos(usuario):
+                    con_diferencias.append(usuario.correo)
+            else:
+                reconstruir(usuario)
+
+        if options["verificar"]:
+            for correo in con_diferencias:
+                self.stdout.write(f"Resumen desalineado: {correo}")
+            if con_diferencias:
+                raise CommandError(f"{len(con_diferencias)} de {procesados} usuarios con diferencias")
+            self.stdout.write(self.style.SUCCESS(f"{procesados} usuarios verificados, sin diferencias"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{procesados} usuarios reconstruidos"))
@@ -0,0 +1,142 @@
+# usuarios/metricas.py
+# Métricas por request (latencia, SQL, serializer, correo) en histogramas con formato
+# Prometheus. El registro vive en memoria del proceso: con varios workers de gunicorn
+# cada uno expone los suyos en /metrics.
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+MAX_SQL_GUARDADO = 200
+
+_actual = ContextVar("medicion", default=None)
+
+
+class Medicion:
+    # lo que se acumula durante una request
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.tiempos = {}
+        self.sql = []
+
+    def envolver_sql(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.segundos_db += duracion
+            if len(self.sql) < MAX_SQL_GUARDADO:
+                self.sql.append((duracion, sql))
+
+    def sumar(self, nombre, segundos):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + segundos
+
+
+def envolver_sql(execute, sql, params, many, context):
+    # execute_wrapper fijo de cada conexión (ver instalar): cuenta en la request en curso.
+    # Bajo ASGI el ORM corre en hilos de sync_to_async con sus propias conexiones, pero
+    # el contexto se copia, así que la medición llega igual.
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion.envolver_sql(execute, sql, params, many, context)
+
+
+def instalar(sender=None, connection=None, **kwargs):
+    # receptor de connection_created (UsuariosConfig.ready): una vez por conexión
+    if envolver_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(envolver_sql)
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _actual.set(medicion)
+
+
+def terminar(token):
+    _actual.reset(token)
+
+
+@contextmanager
+def medir(nombre):
+    # suma el tiempo del bloque a la request en curso (no hace nada fuera de una request)
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.sumar(nombre, time.perf_counter() - inicio)
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self.series = {}  # valores de etiquetas -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(str(etiquetas[e]) for e in self.etiquetas)
+        with self._lock:
+            serie = self.series.setdefault(clave, [0] * len(self.buckets) + [0.0, 0])
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exportar(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self.series.items()}
+        for clave, serie in sorted(series.items()):
+            base = ",".join(f'{e}="{v}"' for e, v in zip(self.etiquetas, clave))
+            for limite, conteo in zip(self.buckets, serie):
+                lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {conteo}')
+            lineas.append(f'{self.nombre}_bucket{{{base},le="+Inf"}} {serie[-1]}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {serie[-1]}")
+        return lineas
+
+
+ETIQUETAS = ("ruta", "metodo")
+
+LATENCIA = Histograma("cashtrack_request_duration_seconds", "Latencia total por request",
+                      ETIQUETAS + ("estado",), BUCKETS_SEGUNDOS)
+CONSULTAS = Histograma("cashtrack_db_queries", "Consultas SQL por request", ETIQUETAS, BUCKETS_CONSULTAS)
+TIEMPO_DB = Histograma("cashtrack_db_duration_seconds", "Tiempo en SQL por request", ETIQUETAS, BUCKETS_SEGUNDOS)
+TIEMPOS = {
+    "serializer": Histograma("cashtrack_serializer_duration_seconds", "Tiempo serializando por request",
+                             ETIQUETAS, BUCKETS_SEGUNDOS),
+    "email": Histograma("cashtrack_email_duration_seconds", "Tiempo enviando correo (SendGrid) por request",
+                        ETIQUETAS, BUCKETS_SEGUNDOS),
+    "email_encolado": Histograma("cashtrack_email_encolado_duration_seconds",
+                                 "Tiempo encolando correo en la bandeja de salida por request",
+                                 ETIQUETAS, BUCKETS_SEGUNDOS),
+}
+
+
+def registrar(medicion, total, ruta, metodo, estado):
+    LATENCIA.observar(total, ruta=ruta, metodo=metodo, estado=estado)
+    CONSULTAS.observar(medicion.consultas, ruta=ruta, metodo=metodo)
+    TIEMPO_DB.observar(medicion.segundos_db, ruta=ruta, metodo=metodo)
+    for nombre, histograma in TIEMPOS.items():
+        if nombre in medicion.tiempos:
+            histograma.observar(medicion.tiempos[nombre], ruta=ruta, metodo=metodo)
+
+
+def exportar():
+    lineas = []
+    for histograma in (LATENCIA, CONSULTAS, TIEMPO_DB, *TIEMPOS.values()):
+        lineas += histograma.exportar()
+    return "\n".join(lineas) + "\n"
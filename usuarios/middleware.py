@@ -0,0 +1,89 @@
+# usuarios/middleware.py
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware as _WhiteNoiseMiddleware
+from . import metricas
+
+logger = logging.getLogger("usuarios.lentas")
+
+
+class MetricasMiddleware:
+    # Mide cada request: latencia total, consultas y tiempo SQL (metricas.envolver_sql,
+    # instalado en cada conexión), serializer y correo (metricas.medir). Lo devuelve en Server-Timing y lo acumula
+    # para /metrics. Las requests más lentas que SLOW_REQUEST_MS se loguean con su SQL.
+    # Soporta sync y async para no forzar cambios de hilo bajo ASGI.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicion, token = metricas.iniciar()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.terminar(token)
+        return self._terminar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        medicion, token = metricas.iniciar()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.terminar(token)
+        return self._terminar(request, response, medicion, time.perf_counter() - inicio)
+
+    def _terminar(self, request, response, medicion, total):
+        match = getattr(request, "resolver_match", None)
+        ruta = (match.url_name if match else None) or "sin_ruta"
+        metricas.registrar(medicion, total, ruta, request.method, response.status_code)
+
+        partes = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={medicion.segundos_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+        ]
+        partes += [f"{nombre};dur={seg * 1000:.1f}" for nombre, seg in medicion.tiempos.items()]
+        response["Server-Timing"] = ", ".join(partes)
+
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            sql = "\n".join(f"  [{seg * 1000:.1f} ms] {texto}" for seg, texto in medicion.sql)
+            logger.warning("Request lenta %s %s (%s): %.1f ms, %s consultas (%.1f ms en SQL)\n%s",
+                           request.method, request.path, ruta, total * 1000,
+                           medicion.consultas, medicion.segundos_db * 1000, sql)
+        return response
+
+
+class WhiteNoiseMiddleware(_WhiteNoiseMiddleware):
+    # el de whitenoise solo es sync: bajo ASGI obligaría a pasar cada request por un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def poblar_resumenes(apps, schema_editor):
+    Gasto = apps.get_model('usuarios', 'Gasto')
+    ResumenGasto = apps.get_model('usuarios', 'ResumenGasto')
+
+    filas = (
+        Gasto.objects.annotate(mes=TruncMonth('fecha'))
+        .values('correo_usuarios__id', 'mes', 'categoria')
+        .annotate(total=Sum('cantidad'), num=Count('id'))
+        .order_by()
+    )
+    lote = []
+    for fila in filas.iterator(chunk_size=2000):
+        lote.append(ResumenGasto(
+            usuario_id=fila['correo_usuarios__id'],
+            mes=fila['mes'],
+            categoria=fila['categoria'],
+            total=fila['total'],
+            num_gastos=fila['num'],
+        ))
+        if len(lote) >= 2000:
+            ResumenGasto.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        ResumenGasto.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_usuario_presupuesto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenGasto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('categoria', models.CharField(choices=[('comida', 'Comida'), ('transporte', 'Transporte'), ('entretenimiento', 'Entretenimiento'), ('otros', 'Otros')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('num_gastos', models.IntegerField(default=0)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='usuarios.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'mes', 'categoria'), name='resumen_usuario_mes_categoria')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_resumengasto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['correo_usuarios', 'fecha', 'id'], name='gasto_usuario_fecha_id_idx'),
+        ),
+    ]
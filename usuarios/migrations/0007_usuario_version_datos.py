@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_correopendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='version_datos',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
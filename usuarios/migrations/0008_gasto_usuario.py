@@ -0,0 +1,73 @@
+# Gasto.correo_usuarios (FK al correo, varchar) -> Gasto.usuario (FK entera a Usuario.id).
+# No atómica: el backfill va por lotes de ids y cada lote es su propia transacción, así
+# en tablas grandes no queda un UPDATE gigante bloqueando ni un WAL enorme.
+
+from django.db import migrations, models, transaction
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+LOTE = 10000
+
+
+def _por_lotes(apps, schema_editor, actualizar):
+    Gasto = apps.get_model('usuarios', 'Gasto')
+    alias = schema_editor.connection.alias
+    ultimo = Gasto.objects.using(alias).aggregate(m=Max('id'))['m'] or 0
+    for inicio in range(0, ultimo + 1, LOTE):
+        with transaction.atomic(using=alias):
+            actualizar(Gasto.objects.using(alias).filter(id__gte=inicio, id__lt=inicio + LOTE))
+
+
+def copiar_usuario(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    por_correo = Usuario.objects.filter(correo=OuterRef('correo_usuarios_id')).values('id')[:1]
+    _por_lotes(apps, schema_editor,
+               lambda qs: qs.filter(usuario__isnull=True).update(usuario_id=Subquery(por_correo)))
+
+
+def copiar_correo(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    por_id = Usuario.objects.filter(id=OuterRef('usuario_id')).values('correo')[:1]
+    _por_lotes(apps, schema_editor,
+               lambda qs: qs.filter(correo_usuarios__isnull=True).update(correo_usuarios_id=Subquery(por_id)))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('usuarios', '0007_usuario_version_datos'),
+    ]
+
+    operations = [
+        # nullable durante la transición (y para que la migración se pueda revertir)
+        migrations.AlterField(
+            model_name='gasto',
+            name='correo_usuarios',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario', to_field='correo'),
+        ),
+        # sin índice mientras se llena: se crea una sola vez al final
+        migrations.AddField(
+            model_name='gasto',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario'),
+        ),
+        migrations.RunPython(copiar_usuario, copiar_correo),
+        migrations.RemoveIndex(
+            model_name='gasto',
+            name='gasto_usuario_fecha_id_idx',
+        ),
+        migrations.RemoveField(
+            model_name='gasto',
+            name='correo_usuarios',
+        ),
+        migrations.AlterField(
+            model_name='gasto',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['usuario', 'fecha', 'id'], name='gasto_usuario_fecha_id_idx'),
+        ),
+    ]
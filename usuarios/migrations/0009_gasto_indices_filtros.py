@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_gasto_usuario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['usuario', 'categoria', 'fecha', 'id'], name='gasto_usuario_cat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['usuario', 'cantidad', 'id'], name='gasto_usuario_cantidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['usuario', 'categoria', 'cantidad', 'id'], name='gasto_usuario_cat_cant_idx'),
+        ),
+    ]
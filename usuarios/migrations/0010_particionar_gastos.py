@@ -0,0 +1,24 @@
+# Particiona usuarios_gasto por mes de fecha, solo en PostgreSQL con GASTOS_PARTICIONADOS=True.
+# En cualquier otro caso no hace nada (SQLite, desarrollo). El estado de Django no cambia:
+# el modelo Gasto es el mismo con o sin particiones, por eso revertir no des-particiona.
+
+from django.conf import settings
+from django.db import migrations
+
+
+def particionar(apps, schema_editor):
+    from usuarios import particiones
+    if not particiones.activo(schema_editor.connection):
+        return
+    particiones.convertir(schema_editor, apps.get_model('usuarios', 'Gasto'), settings.GASTOS_PARTICIONES_ADELANTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_gasto_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
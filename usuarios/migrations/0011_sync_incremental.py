@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0010_particionar_gastos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GastoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gasto_id', models.IntegerField()),
+                ('version_sync', models.PositiveBigIntegerField()),
+                ('eliminado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='version_sync',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='sync_desde',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['usuario', 'version_sync'], name='gasto_usuario_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='gastoeliminado',
+            name='usuario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario'),
+        ),
+        migrations.AddIndex(
+            model_name='gastoeliminado',
+            index=models.Index(fields=['usuario', 'version_sync'], name='eliminado_usuario_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0011_sync_incremental'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(condition=models.Q(('used', False)), fields=['usuario', 'code', 'id'], name='otp_pendiente_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0012_otp_pendiente_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='recurrente_proxima',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='GastoRecurrente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('comida', 'Comida'), ('transporte', 'Transporte'), ('entretenimiento', 'Entretenimiento'), ('otros', 'Otros')], max_length=20)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('frecuencia', models.CharField(choices=[('semanal', 'Semanal'), ('mensual', 'Mensual'), ('anual', 'Anual')], max_length=10)),
+                ('inicio', models.DateField()),
+                ('fin', models.DateField(blank=True, null=True)),
+                ('generados', models.PositiveIntegerField(default=0)),
+                ('proxima', models.DateField(null=True)),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recurrentes', to='usuarios.usuario')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='recurrente',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gastos', to='usuarios.gastorecurrente'),
+        ),
+        migrations.AddConstraint(
+            model_name='gasto',
+            constraint=models.UniqueConstraint(fields=('recurrente', 'fecha'), name='gasto_recurrente_fecha_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='gastorecurrente',
+            index=models.Index(fields=['usuario', 'proxima'], name='recurrente_usuario_prox_idx'),
+        ),
+    ]
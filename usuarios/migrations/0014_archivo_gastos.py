@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0013_gastos_recurrentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='archivado_hasta',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='GastoArchivado',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('categoria', models.CharField(choices=[('comida', 'Comida'), ('transporte', 'Transporte'), ('entretenimiento', 'Entretenimiento'), ('otros', 'Otros')], max_length=20)),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', 'fecha', 'id'], name='archivado_usuario_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('categoria', models.CharField(choices=[('comida', 'Comida'), ('transporte', 'Transporte'), ('entretenimiento', 'Entretenimiento'), ('otros', 'Otros')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('num_gastos', models.IntegerField(default=0)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_archivo', to='usuarios.usuario')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'mes', 'categoria'), name='archivo_usuario_mes_categoria')],
+            },
+        ),
+    ]
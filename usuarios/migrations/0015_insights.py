@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0014_archivo_gastos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='insight', serialize=False, to='usuarios.usuario')),
+                ('mes', models.DateField()),
+                ('gastado_mes', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('pronostico_mes', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('promedio_mensual', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('tendencia_mensual', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('meses_historia', models.PositiveSmallIntegerField(default=0)),
+                ('anomalias', models.JSONField(default=list)),
+                ('calculado_en', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0015_insights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='alerta_umbral',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='gastado_periodo',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='periodo_inicio',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='periodo_presupuesto',
+            field=models.CharField(choices=[('mensual', 'Mensual'), ('semanal', 'Semanal')], default='mensual', max_length=10),
+        ),
+    ]
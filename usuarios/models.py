@@ -4,12 +4,33 @@ from django.utils import timezone
 import random
 from datetime import date, timedelta
 
+VIGENCIA_OTP = timedelta(minutes=5)
+
 
 class Usuario(models.Model):
+    PERIODOS = [
+        ('mensual', 'Mensual'),
+        ('semanal', 'Semanal'),
+    ]
+
     id = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=15)
     correo = models.EmailField(unique=True)
     presupuesto = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # 🔥 nuevo campo
+    # el presupuesto es por período; lo gastado en el período se lleva incrementalmente
+    # en cada escritura de gastos (usuarios/presupuestos.py)
+    periodo_presupuesto = models.CharField(max_length=10, choices=PERIODOS, default='mensual')
+    periodo_inicio = models.DateField(null=True, blank=True)  # período al que corresponde gastado_periodo
+    gastado_periodo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    alerta_umbral = models.PositiveSmallIntegerField(default=0)  # último umbral avisado (50/80/100)
+    # se incrementa en cada escritura de gastos/presupuesto; versiona la cache y los ETag
+    version_datos = models.PositiveBigIntegerField(default=0)
+    # próxima fecha en que vence algún gasto recurrente; las lecturas la miran sin otra consulta
+    recurrente_proxima = models.DateField(null=True, blank=True)
+    # los gastos con fecha anterior a esta pueden estar en GastoArchivado (usuarios/archivo.py)
+    archivado_hasta = models.DateField(null=True, blank=True)
+    # tokens de sync anteriores a esta versión ya no sirven (se purgaron sus eliminados)
+    sync_desde = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return self.correo
@@ -23,10 +44,137 @@ class Gasto(models.Model):
     ]
 
     id = models.AutoField(primary_key=True)
-    correo_usuarios = models.ForeignKey(Usuario, on_delete=models.CASCADE, to_field="correo")
+    # FK entera a Usuario.id; sin índice propio porque gasto_usuario_fecha_id_idx empieza por usuario
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_index=False)
     fecha = models.DateField(default=date.today)  # ahora sí solo guarda la fecha
     cantidad = models.DecimalField(max_digits=12, decimal_places=2)
     categoria = models.CharField(max_length=20, choices=CATEGORIAS)
+    updated_at = models.DateTimeField(auto_now=True)
+    # version_datos del usuario en la última escritura de este gasto (sync incremental)
+    version_sync = models.PositiveBigIntegerField(default=0)
+    # plantilla que lo generó (gastos recurrentes)
+    recurrente = models.ForeignKey("GastoRecurrente", null=True, blank=True, on_delete=models.SET_NULL,
+                                   db_index=False, related_name="gastos")
+
+    class Meta:
+        constraints = [
+            # una ocurrencia por plantilla y fecha: nunca se materializa dos veces (el índice
+            # sirve también al SET NULL al borrar la plantilla)
+            models.UniqueConstraint(fields=["recurrente", "fecha"], name="gasto_recurrente_fecha_uniq"),
+        ]
+        indexes = [
+            # lista paginada por cursor y gastos recientes del dashboard
+            models.Index(fields=["usuario", "fecha", "id"], name="gasto_usuario_fecha_id_idx"),
+            # filtros de /api/gastos/: uno por cada ?orden=, con y sin categoría delante
+            models.Index(fields=["usuario", "categoria", "fecha", "id"], name="gasto_usuario_cat_fecha_idx"),
+            models.Index(fields=["usuario", "cantidad", "id"], name="gasto_usuario_cantidad_idx"),
+            models.Index(fields=["usuario", "categoria", "cantidad", "id"], name="gasto_usuario_cat_cant_idx"),
+            models.Index(fields=["usuario", "version_sync"], name="gasto_usuario_sync_idx"),
+        ]
+
+class GastoRecurrente(models.Model):
+    # plantilla de gasto periódico (alquiler, suscripciones...); usuarios/recurrentes.py
+    # crea los Gasto que van venciendo
+    FRECUENCIAS = [
+        ('semanal', 'Semanal'),
+        ('mensual', 'Mensual'),
+        ('anual', 'Anual'),
+    ]
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_index=False, related_name="recurrentes")
+    categoria = models.CharField(max_length=20, choices=Gasto.CATEGORIAS)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS)
+    inicio = models.DateField()  # primera ocurrencia; fija el día del mes / de la semana
+    fin = models.DateField(null=True, blank=True)
+    generados = models.PositiveIntegerField(default=0)  # ocurrencias ya materializadas
+    proxima = models.DateField(null=True)  # fecha de la ocurrencia número `generados`; NULL si terminó
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["usuario", "proxima"], name="recurrente_usuario_prox_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.categoria} {self.cantidad} ({self.frecuencia})"
+
+class GastoEliminado(models.Model):
+    # lápida de un gasto borrado, para que /api/gastos/sync/ avise a los clientes
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_index=False)
+    gasto_id = models.IntegerField()
+    version_sync = models.PositiveBigIntegerField()
+    eliminado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["usuario", "version_sync"], name="eliminado_usuario_sync_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} gasto {self.gasto_id} (v{self.version_sync})"
+
+class ResumenGasto(models.Model):
+    # totales por usuario / mes / categoria, mantenidos en cada escritura de Gasto
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="resumenes")
+    mes = models.DateField()  # primer día del mes
+    categoria = models.CharField(max_length=20, choices=Gasto.CATEGORIAS)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    num_gastos = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "mes", "categoria"], name="resumen_usuario_mes_categoria"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m} {self.categoria}: {self.total}"
+
+class GastoArchivado(models.Model):
+    # gasto viejo sacado de la tabla caliente por `manage.py archivar_gastos`; conserva su id
+    id = models.IntegerField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_index=False)
+    fecha = models.DateField()
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    categoria = models.CharField(max_length=20, choices=Gasto.CATEGORIAS)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["usuario", "fecha", "id"], name="archivado_usuario_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.fecha} {self.categoria}: {self.cantidad}"
+
+class ResumenArchivo(models.Model):
+    # totales por usuario / mes / categoria de lo que hay en GastoArchivado
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="resumenes_archivo")
+    mes = models.DateField()  # primer día del mes
+    categoria = models.CharField(max_length=20, choices=Gasto.CATEGORIAS)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    num_gastos = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "mes", "categoria"], name="archivo_usuario_mes_categoria"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m} {self.categoria}: {self.total} (archivo)"
+
+class InsightUsuario(models.Model):
+    # estadísticas por usuario que calcula en lote `manage.py calcular_insights` (usuarios/insights.py)
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, related_name="insight")
+    mes = models.DateField()  # mes en curso al calcular
+    gastado_mes = models.DecimalField(max_digits=14, decimal_places=2)
+    pronostico_mes = models.DecimalField(max_digits=14, decimal_places=2)  # gasto estimado a fin de mes
+    promedio_mensual = models.DecimalField(max_digits=14, decimal_places=2)  # meses completos con historia
+    tendencia_mensual = models.DecimalField(max_digits=14, decimal_places=2, null=True)  # pendiente por mes
+    meses_historia = models.PositiveSmallIntegerField(default=0)
+    anomalias = models.JSONField(default=list)  # categorías del mes muy por encima de su historia
+    calculado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.mes:%Y-%m}: {self.pronostico_mes}"
 
 class OTPCode(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
@@ -35,15 +183,48 @@ class OTPCode(models.Model):
     expires_at = models.DateTimeField()
     used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # la consulta de verificación: usuario + código sin usar, el más nuevo
+            models.Index(fields=["usuario", "code", "id"], condition=models.Q(used=False), name="otp_pendiente_idx"),
+        ]
+
     @classmethod
-    def create_otp(cls, usuario):
-        code = str(random.randint(100000, 999999))  # 6 dígitos
+    def create_otp(cls, usuario, code=None):
+        code = code or str(random.randint(100000, 999999))  # 6 dígitos
         otp = cls.objects.create(
             usuario=usuario,
             code=code,
-            expires_at=timezone.now() + timedelta(minutes=5)
+            expires_at=timezone.now() + VIGENCIA_OTP
         )
         return otp
 
     def __str__(self):
         return f"{self.usuario.correo} - {self.code}"
+
+
+class CorreoPendiente(models.Model):
+    # bandeja de salida: las vistas solo insertan aquí, el comando procesar_correos envía
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    mensaje = models.TextField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, default="")
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "proximo_intento"], name="correo_estado_proximo_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.asunto} ({self.estado})"
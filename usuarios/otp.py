@@ -0,0 +1,91 @@
+# usuarios/otp.py
+# Dónde viven los códigos OTP, según OTP_ALMACEN:
+#   - "bd" (por defecto): tabla OTPCode, como siempre. `manage.py purgar_otp` borra los
+#     vencidos y usados.
+#   - "cache": en la cache de Django con TTL (Redis en producción, locmem en tests). La
+#     cache tiene que ser compartida entre workers; settings no arranca con una locmem.
+#     Login y registro no escriben en la tabla; lo vencido lo borra el TTL.
+# En los dos casos consumir() es atómico: un código solo se usa una vez aunque lleguen
+# dos verificaciones a la vez (UPDATE ... WHERE used=false / delete() de la cache).
+import random
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from .models import OTPCode, VIGENCIA_OTP
+
+
+class OTPInvalido(Exception):
+    def __init__(self, mensaje="OTP inválido"):
+        super().__init__(mensaje)
+
+
+class OTPExpirado(OTPInvalido):
+    def __init__(self):
+        super().__init__("OTP expirado")
+
+
+def en_cache():
+    return settings.OTP_ALMACEN == "cache"
+
+
+def _cache():
+    return caches[settings.OTP_CACHE]
+
+
+def _clave(correo, code):
+    return f"otp:{correo}:{code}"
+
+
+def emitir(usuario, code=None):
+    # crea el código para el usuario y lo devuelve (el envío lo hace la vista)
+    if not en_cache():
+        return OTPCode.create_otp(usuario, code).code
+    code = code or str(random.randint(100000, 999999))
+    _cache().set(_clave(usuario.correo, code), usuario.id, int(VIGENCIA_OTP.total_seconds()))
+    return code
+
+
+def _pendiente(correo, code):
+    return OTPCode.objects.filter(usuario__correo=correo, code=code, used=False).values(
+        "id", "usuario_id", "expires_at"
+    )
+
+
+def consumir(correo, code):
+    # marca el código como usado y devuelve el id del usuario; lanza OTPInvalido / OTPExpirado
+    if en_cache():
+        clave = _clave(correo, code)
+        usuario_id = _cache().get(clave)
+        # delete() solo devuelve True a uno de los que compiten por la misma clave
+        if usuario_id is None or not _cache().delete(clave):
+            raise OTPInvalido()
+        return usuario_id
+
+    try:
+        fila = _pendiente(correo, code).latest("id")
+    except OTPCode.DoesNotExist:
+        raise OTPInvalido()
+    if fila["expires_at"] < timezone.now():
+        raise OTPExpirado()
+    if not OTPCode.objects.filter(pk=fila["id"], used=False).update(used=True):
+        raise OTPInvalido()  # otra request lo usó entre la lectura y el UPDATE
+    return fila["usuario_id"]
+
+
+async def aconsumir(correo, code):
+    if en_cache():
+        clave = _clave(correo, code)
+        usuario_id = await _cache().aget(clave)
+        if usuario_id is None or not await _cache().adelete(clave):
+            raise OTPInvalido()
+        return usuario_id
+
+    try:
+        fila = await _pendiente(correo, code).alatest("id")
+    except OTPCode.DoesNotExist:
+        raise OTPInvalido()
+    if fila["expires_at"] < timezone.now():
+        raise OTPExpirado()
+    if not await OTPCode.objects.filter(pk=fila["id"], used=False).aupdate(used=True):
+        raise OTPInvalido()
+    return fila["usuario_id"]
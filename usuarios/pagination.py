@@ -0,0 +1,141 @@
+# usuarios/pagination.py
+# Paginación por cursor (keyset) sobre (campo de orden, id): cada página es un rango
+# del índice que corresponde al orden (?orden=, ver filtros.ORDENES), así la página 500
+# cuesta lo mismo que la 1.
+import base64
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .filtros import orden
+from .particiones import apor_ventana, por_ventana
+
+
+class GastoCursorPagination(BasePagination):
+    campo = "fecha"              # por defecto; ?orden= lo cambia. El desempate siempre es por id
+    descendente = True           # más recientes primero
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "limite"
+    todos_query_param = "todos"  # ?todos=1 devuelve la lista completa sin paginar
+    invalid_cursor_message = "Cursor inválido"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.paginar(request):
+            return None
+        consulta = self._preparar(queryset, request)
+        if self._por_ventana:
+            return self._cerrar(por_ventana(consulta, self.limite + 1, self._tope))
+        return self._cerrar(list(consulta[:self.limite + 1]))
+
+    async def apaginate_queryset(self, queryset, request):
+        # igual que paginate_queryset pero con iteración async del ORM (vistas ASGI)
+        if not self.paginar(request):
+            return None
+        consulta = self._preparar(queryset, request)
+        if self._por_ventana:
+            return self._cerrar(await apor_ventana(consulta, self.limite + 1, self._tope))
+        return self._cerrar([fila async for fila in consulta[:self.limite + 1]])
+
+    def paginar(self, request):
+        return request.query_params.get(self.todos_query_param) not in ("1", "true")
+
+    def es_primera(self, request):
+        return not request.query_params.get(self.cursor_query_param)
+
+    def _preparar(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limite = self.get_page_size(request)
+        self.campo, self.descendente = orden(request.query_params)
+        model = queryset.model
+        posicion = self.decode_cursor(request, model)
+
+        # "hacia_atras" recorre el índice en sentido contrario y luego invierte la página
+        hacia_atras = posicion is not None and posicion[2]
+        descendente = self.descendente != hacia_atras
+        if posicion is not None:
+            valor, pk, _ = posicion
+            op = "lt" if descendente else "gt"
+            # el primer filtro es redundante pero da la cota del rango en el índice
+            queryset = queryset.filter(**{f"{self.campo}__{op}e": valor}).filter(
+                Q(**{f"{self.campo}__{op}": valor}) | Q(**{self.campo: valor, f"id__{op}": pk})
+            )
+        signo = "-" if descendente else ""
+        self._posicion, self._hacia_atras = posicion, hacia_atras
+        # recorriendo por fecha hacia atrás la consulta lleva predicado de fecha (poda de particiones)
+        self._por_ventana = self.campo == "fecha" and descendente
+        self._tope = posicion[0] if posicion is not None else None
+        return queryset.order_by(f"{signo}{self.campo}", f"{signo}id")
+
+    def _cerrar(self, filas):
+        posicion, hacia_atras = self._posicion, self._hacia_atras
+        hay_mas = len(filas) > self.limite
+        filas = filas[:self.limite]
+        if hacia_atras:
+            filas.reverse()
+        self.page = filas
+
+        self.next_cursor = self.previous_cursor = None
+        if filas:
+            if hay_mas or hacia_atras:
+                self.next_cursor = self.encode_cursor(filas[-1], atras=False)
+            if posicion is not None and (hay_mas or not hacia_atras):
+                self.previous_cursor = self.encode_cursor(filas[0], atras=True)
+        return filas
+
+    def get_page_size(self, request):
+        try:
+            limite = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(limite, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            texto = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+            valor, pk, direccion = texto.rsplit("|", 2)
+            valor = model._meta.get_field(self.campo).to_python(valor)
+            return valor, int(pk), direccion == "p"
+        except (ValueError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, fila, atras):
+        valor = getattr(fila, self.campo)
+        valor = valor.isoformat() if hasattr(valor, "isoformat") else str(valor)
+        texto = f"{valor}|{fila.id}|{'p' if atras else 'n'}"
+        return base64.urlsafe_b64encode(texto.encode("ascii")).decode("ascii")
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,159 @@
+# usuarios/particiones.py
+# Particionado por rango mensual de usuarios_gasto sobre fecha. Solo en PostgreSQL y con
+# GASTOS_PARTICIONADOS=True; en SQLite / desarrollo la tabla sigue siendo normal y todo
+# esto no hace nada. Django no se entera: el modelo Gasto es el mismo en los dos modos.
+#   - convertir(): pasa la tabla actual a particionada (migración 0010 o
+#     `manage.py crear_particiones --convertir`).
+#   - crear_particiones(): crea los meses que falten (cron: `manage.py crear_particiones`).
+#   - por_ventana(): lecturas "los N más recientes" con predicado de fecha para podar particiones.
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .resumen import inicio_mes
+
+TABLA = "usuarios_gasto"
+DEFECTO = f"{TABLA}_default"      # filas fuera de los meses creados (fechas muy viejas o futuras)
+RESPALDO = f"{TABLA}_sin_particion"  # la tabla original queda renombrada hasta que se borre a mano
+SECUENCIA = f"{TABLA}_id_part_seq"
+LOTE_COPIA = 50000
+
+
+def activo(connection):
+    return settings.GASTOS_PARTICIONADOS and connection.vendor == "postgresql"
+
+
+def siguiente_mes(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def meses(desde, hasta):
+    # primer día de cada mes entre desde y hasta (ambos incluidos)
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        yield mes
+        mes = siguiente_mes(mes)
+
+
+def nombre_particion(mes):
+    return f"{TABLA}_{mes:%Y%m}"
+
+
+def esta_particionada(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE relname = %s AND pg_table_is_visible(oid)", [TABLA]
+        )
+        fila = cursor.fetchone()
+    return fila is not None and fila[0] == "p"
+
+
+def _existe(cursor, nombre):
+    cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s AND pg_table_is_visible(oid)", [nombre])
+    return cursor.fetchone() is not None
+
+
+def crear_particiones(connection, desde, hasta, tabla=TABLA):
+    # Crea las particiones mensuales que falten. Cada una se arma aparte, recibe las filas
+    # de ese mes que hubieran caído en la partición por defecto y recién ahí se adjunta
+    # (ATTACH crea también los índices de la tabla padre).
+    creadas = []
+    with connection.cursor() as cursor:
+        for mes in meses(desde, hasta):
+            nombre = nombre_particion(mes)
+            if _existe(cursor, nombre):
+                continue
+            rango = [mes, siguiente_mes(mes)]
+            with transaction.atomic(using=connection.alias):
+                cursor.execute(f'CREATE TABLE "{nombre}" (LIKE "{tabla}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                if _existe(cursor, DEFECTO):
+                    cursor.execute(
+                        f'WITH movidos AS (DELETE FROM "{DEFECTO}" WHERE fecha >= %s AND fecha < %s RETURNING *) '
+                        f'INSERT INTO "{nombre}" SELECT * FROM movidos',
+                        rango,
+                    )
+                cursor.execute(f'ALTER TABLE "{tabla}" ATTACH PARTITION "{nombre}" FOR VALUES FROM (%s) TO (%s)', rango)
+            creadas.append(nombre)
+    return creadas
+
+
+def convertir(schema_editor, modelo, meses_adelante):
+    # Copia usuarios_gasto a una tabla particionada y las intercambia. Todo en una
+    # transacción con la tabla original en modo SHARE: se puede seguir leyendo, las
+    # escrituras esperan al final. La copia va por lotes de id para acotar cada INSERT.
+    connection = schema_editor.connection
+    if esta_particionada(connection):
+        return False
+    nueva = f"{TABLA}_nueva"
+    hoy = timezone.localdate()
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLA}" IN SHARE MODE')
+        cursor.execute(f'SELECT MIN(fecha), MAX(id) FROM "{TABLA}"')
+        primera, ultimo_id = cursor.fetchone()
+
+        # sin INCLUDING IDENTITY: las tablas particionadas (PG < 17) no la admiten, va con secuencia
+        cursor.execute(
+            f'CREATE TABLE "{nueva}" (LIKE "{TABLA}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (fecha)'
+        )
+        cursor.execute(f'CREATE TABLE "{DEFECTO}" PARTITION OF "{nueva}" DEFAULT')
+        crear_particiones(connection, primera or hoy, hoy + timedelta(days=31 * meses_adelante), tabla=nueva)
+
+        for inicio in range(0, (ultimo_id or 0) + 1, LOTE_COPIA):
+            cursor.execute(
+                f'INSERT INTO "{nueva}" SELECT * FROM "{TABLA}" WHERE id >= %s AND id < %s',
+                [inicio, inicio + LOTE_COPIA],
+            )
+
+        # la original queda como respaldo; sus índices cambian de nombre para liberar los de Django
+        cursor.execute(f'ALTER TABLE "{TABLA}" RENAME TO "{RESPALDO}"')
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [RESPALDO])
+        for (indice,) in cursor.fetchall():
+            cursor.execute(f'ALTER INDEX "{indice}" RENAME TO "{indice[:59]}_sp"')
+        cursor.execute(f'ALTER TABLE "{nueva}" RENAME TO "{TABLA}"')
+
+        # la PK de una tabla particionada tiene que incluir la clave de partición
+        cursor.execute(f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{TABLA}_pkey" PRIMARY KEY (id, fecha)')
+        # LIKE no copia las FK: se recrean las del modelo (usuario, recurrente...)
+        for campo in modelo._meta.concrete_fields:
+            if campo.remote_field is None:
+                continue
+            destino = campo.remote_field.model._meta
+            cursor.execute(
+                f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{TABLA}_{campo.column}_fk" FOREIGN KEY ({campo.column}) '
+                f'REFERENCES "{destino.db_table}" ({destino.pk.column}) DEFERRABLE INITIALLY DEFERRED'
+            )
+        cursor.execute(f'CREATE SEQUENCE "{SECUENCIA}" OWNED BY "{TABLA}".id')
+        cursor.execute("SELECT setval(%s, %s, false)", [SECUENCIA, (ultimo_id or 0) + 1])
+        cursor.execute(f'ALTER TABLE "{TABLA}" ALTER COLUMN id SET DEFAULT nextval(%s)', [SECUENCIA])
+        for indice in modelo._meta.indexes:
+            schema_editor.add_index(modelo, indice)
+        # las UNIQUE incluyen fecha (la clave de partición), así que valen en la tabla particionada
+        for restriccion in modelo._meta.constraints:
+            schema_editor.add_constraint(modelo, restriccion)
+    return True
+
+
+def por_ventana(queryset, limite, tope=None):
+    # Los `limite` primeros de un queryset ordenado por -fecha. Primero se busca dentro
+    # de GASTOS_VENTANA_DIAS (el planner descarta las particiones más viejas) y solo si
+    # no alcanza se completa con lo anterior. Con la ventana en 0 es una sola consulta.
+    dias = settings.GASTOS_VENTANA_DIAS
+    if not dias:
+        return list(queryset[:limite])
+    corte = (tope or timezone.localdate()) - timedelta(days=dias)
+    filas = list(queryset.filter(fecha__gte=corte)[:limite])
+    if len(filas) < limite:
+        filas += list(queryset.filter(fecha__lt=corte)[:limite - len(filas)])
+    return filas
+
+
+async def apor_ventana(queryset, limite, tope=None):
+    dias = settings.GASTOS_VENTANA_DIAS
+    if not dias:
+        return [fila async for fila in queryset[:limite]]
+    corte = (tope or timezone.localdate()) - timedelta(days=dias)
+    filas = [fila async for fila in queryset.filter(fecha__gte=corte)[:limite]]
+    if len(filas) < limite:
+        filas += [fila async for fila in queryset.filter(fecha__lt=corte)[:limite - len(filas)]]
+    return filas
@@ -0,0 +1,171 @@
+# usuarios/presupuestos.py
+# Presupuesto por período (mensual o semanal). Usuario.gastado_periodo lleva lo gastado en
+# el período que empieza en Usuario.periodo_inicio y se actualiza en cada escritura de
+# gastos, en su misma transacción y después de invalidar() (la fila del usuario ya está
+# bloqueada, así que dos escrituras del mismo usuario no se cruzan):
+#   - un UPDATE ... RETURNING suma el delta si el período guardado es el actual;
+#   - si no (primer gasto del período, o período recién cambiado) se recalcula una sola
+#     vez desde ResumenGasto (mensual) o el rango de fechas de la semana (semanal).
+# Al cruzar 50/80/100% del presupuesto se encola un correo (bandeja de salida), una sola
+# vez por umbral y período: lo decide el UPDATE condicionado de alerta_umbral, sin
+# recorrer la tabla de gastos.
+# Las lecturas del camino de escritura van siempre al primario: la materialización perezosa
+# de recurrentes corre dentro de lecturas de réplica (@en_replica), que no ve lo recién insertado.
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from .correo import encolar
+from .models import Usuario, Gasto, ResumenGasto
+from .particiones import siguiente_mes
+from .resumen import centavos, inicio_mes
+
+UMBRALES = (50, 80, 100)
+PRIMARIO = "default"
+
+
+def inicio_periodo(periodo, fecha):
+    return fecha - timedelta(days=fecha.weekday()) if periodo == "semanal" else inicio_mes(fecha)
+
+
+def fin_periodo(periodo, inicio):
+    return inicio + timedelta(days=7) if periodo == "semanal" else siguiente_mes(inicio)
+
+
+def umbral_alcanzado(gastado, presupuesto):
+    # el mayor umbral cruzado (0 si ninguno o sin presupuesto)
+    if not presupuesto or presupuesto <= 0:
+        return 0
+    return max((u for u in UMBRALES if gastado * 100 >= presupuesto * u), default=0)
+
+
+def presupuesto_mensual(usuario, mes):
+    # el presupuesto llevado a un mes (para comparar con el pronóstico mensual de insights):
+    # uno semanal se prorratea por los días del mes
+    presupuesto = usuario.presupuesto or Decimal("0")
+    if usuario.periodo_presupuesto != "semanal":
+        return presupuesto
+    dias = (siguiente_mes(mes) - mes).days
+    return centavos(presupuesto * dias / 7)
+
+
+def _consulta(usuario_id, periodo, inicio):
+    # (queryset, agregados) de lo gastado en el período, para aggregate() o aaggregate()
+    if periodo == "semanal":
+        return (Gasto.objects.filter(usuario_id=usuario_id, fecha__gte=inicio, fecha__lt=fin_periodo(periodo, inicio)),
+                {"gastado": Sum("cantidad")})
+    return ResumenGasto.objects.filter(usuario_id=usuario_id, mes=inicio), {"gastado": Sum("total")}
+
+
+def gastado_en(usuario_id, periodo, inicio, alias=None):
+    consulta, agregados = _consulta(usuario_id, periodo, inicio)
+    if alias:
+        consulta = consulta.using(alias)
+    return centavos(consulta.aggregate(**agregados)["gastado"] or 0)
+
+
+def gastado_actual(usuario, hoy=None):
+    # para las lecturas: el contador si ya es del período en curso; si todavía no hubo
+    # escrituras en este período, se calcula (sin guardarlo: las lecturas no escriben)
+    periodo = usuario.periodo_presupuesto
+    inicio = inicio_periodo(periodo, hoy or timezone.localdate())
+    if usuario.periodo_inicio == inicio:
+        return usuario.gastado_periodo
+    return gastado_en(usuario.id, periodo, inicio)
+
+
+async def agastado_actual(usuario, hoy=None):
+    periodo = usuario.periodo_presupuesto
+    inicio = inicio_periodo(periodo, hoy or timezone.localdate())
+    if usuario.periodo_inicio == inicio:
+        return usuario.gastado_periodo
+    consulta, agregados = _consulta(usuario.id, periodo, inicio)
+    return centavos((await consulta.aaggregate(**agregados))["gastado"] or 0)
+
+
+def _neto(antes, despues, periodo, hoy):
+    inicio = inicio_periodo(periodo, hoy)
+    fin = fin_periodo(periodo, inicio)
+    delta = sum((g.cantidad for g in despues if inicio <= g.fecha < fin), Decimal("0"))
+    delta -= sum((g.cantidad for g in antes if inicio <= g.fecha < fin), Decimal("0"))
+    return inicio, delta
+
+
+def _sumar(usuario_id, mensual, semanal):
+    # suma el delta del período del usuario solo si su contador es de ese período
+    tabla = Usuario._meta.db_table
+    (inicio_m, delta_m), (inicio_s, delta_s) = mensual, semanal
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{tabla}" SET gastado_periodo = gastado_periodo + '
+            f"CASE periodo_presupuesto WHEN 'semanal' THEN %s ELSE %s END "
+            f"WHERE id = %s AND periodo_inicio = CASE periodo_presupuesto WHEN 'semanal' THEN %s ELSE %s END "
+            f"RETURNING gastado_periodo, presupuesto, alerta_umbral, periodo_presupuesto, correo",
+            [delta_s, delta_m, usuario_id, inicio_s, inicio_m],
+        )
+        return cursor.fetchone()
+
+
+def _campos(usuario_id):
+    campos = ("presupuesto", "periodo_presupuesto", "periodo_inicio", "gastado_periodo", "alerta_umbral", "correo")
+    return Usuario.objects.using(PRIMARIO).only(*campos).get(pk=usuario_id)
+
+
+def reiniciar(usuario, hoy, avisados=False):
+    # recalcula el contador del período en curso (una vez por período). En un período nuevo
+    # los umbrales vuelven a 0; con avisados=True quedan marcados los ya alcanzados
+    inicio = inicio_periodo(usuario.periodo_presupuesto, hoy)
+    gastado = gastado_en(usuario.id, usuario.periodo_presupuesto, inicio, alias=PRIMARIO)
+    alerta = umbral_alcanzado(gastado, usuario.presupuesto) if avisados else 0
+    Usuario.objects.filter(pk=usuario.id).update(periodo_inicio=inicio, gastado_periodo=gastado, alerta_umbral=alerta)
+    return gastado, usuario.presupuesto, alerta, usuario.periodo_presupuesto, usuario.correo
+
+
+def avisar(usuario_id, gastado, presupuesto, alerta_umbral, periodo, correo):
+    # encola la alerta del mayor umbral cruzado si todavía no se avisó; devuelve el umbral o 0.
+    # El UPDATE condicionado es el que decide: entre dos escrituras que ven el mismo cruce,
+    # solo una cambia la fila y solo esa encola el correo.
+    gastado, presupuesto = centavos(gastado), centavos(presupuesto)
+    nivel = umbral_alcanzado(gastado, presupuesto)
+    if nivel <= alerta_umbral:
+        return 0
+    if not Usuario.objects.filter(pk=usuario_id, alerta_umbral__lt=nivel).update(alerta_umbral=nivel):
+        return 0
+    if nivel >= 100:
+        asunto = "Superaste tu presupuesto - CashTrack"
+    else:
+        asunto = f"Llevas el {nivel}% de tu presupuesto - CashTrack"
+    mensaje = f"Llevas gastados {gastado} de tu presupuesto {periodo} de {presupuesto}."
+    encolar(correo, asunto, mensaje)
+    return nivel
+
+
+def registrar(usuario_id, antes=(), despues=(), hoy=None):
+    # llamar una vez por escritura, dentro de la transacción y después de invalidar() y del
+    # resumen; antes/despues: gastos (o copias con fecha y cantidad) quitados y puestos
+    hoy = hoy or timezone.localdate()
+    mensual = _neto(antes, despues, "mensual", hoy)
+    semanal = _neto(antes, despues, "semanal", hoy)
+    if not mensual[1] and not semanal[1]:
+        return 0  # nada cae en el período en curso
+    fila = _sumar(usuario_id, mensual, semanal)
+    if fila is None:
+        fila = reiniciar(_campos(usuario_id), hoy)  # período nuevo: ya incluye esta escritura
+    return avisar(usuario_id, *fila)
+
+
+def ajustar(usuario_id, cambio_periodo=False, hoy=None):
+    # después de cambiar el presupuesto (y quizá el período), con el usuario bloqueado.
+    # No encola correos: los umbrales ya pasados con el presupuesto nuevo quedan como
+    # avisados y los que dejaron de estarlo (presupuesto más alto) se vuelven a avisar.
+    # Devuelve el período del usuario.
+    hoy = hoy or timezone.localdate()
+    usuario = _campos(usuario_id)
+    if cambio_periodo or usuario.periodo_inicio != inicio_periodo(usuario.periodo_presupuesto, hoy):
+        reiniciar(usuario, hoy, avisados=True)
+        return usuario.periodo_presupuesto
+    nivel = umbral_alcanzado(usuario.gastado_periodo, usuario.presupuesto)
+    if nivel != usuario.alerta_umbral:
+        Usuario.objects.filter(pk=usuario_id).update(alerta_umbral=nivel)
+    return usuario.periodo_presupuesto
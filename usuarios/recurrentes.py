@@ -0,0 +1,128 @@
+# usuarios/recurrentes.py
+# Materializa los gastos recurrentes: cada GastoRecurrente sabe cuántas ocurrencias ya
+# generó (`generados`) y la fecha de la siguiente (`proxima`). Lo vencido se crea con
+# bulk_create en la misma transacción que avanza la plantilla, por dos caminos:
+#   - perezoso: en la próxima lectura del dashboard o la lista del usuario
+#     (Usuario.recurrente_proxima dice si hay algo vencido sin otra consulta), una sola
+#     pasada de hasta MAX_OCURRENCIAS por plantilla: un atraso de años no se crea entero
+#     dentro de un GET, lo completan las lecturas siguientes o el comando;
+#   - por lotes: `manage.py materializar_recurrentes` (cron nocturno).
+# Idempotente: la plantilla se reclama con un UPDATE condicionado a `generados` (si otro
+# proceso ya la avanzó no se crea nada) y UNIQUE (recurrente, fecha) es la red de seguridad.
+import calendar
+from datetime import timedelta
+from functools import wraps
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from . import presupuestos, resumen
+from .models import Usuario, Gasto, GastoRecurrente
+from .replicas import lecturas
+from .versiones import invalidar
+
+# tope de ocurrencias por plantilla en cada pasada (una semanal de 10 años atrás no arma
+# miles de filas de una vez: el resto sale en la pasada siguiente)
+MAX_OCURRENCIAS = 120
+PRIMARIO = "default"
+
+
+def _sumar_meses(fecha, meses):
+    total = fecha.month - 1 + meses
+    anio, mes = fecha.year + total // 12, total % 12 + 1
+    # día 31 en un mes de 30 -> último día del mes
+    return fecha.replace(year=anio, month=mes, day=min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def ocurrencia(inicio, frecuencia, n):
+    # fecha de la ocurrencia n (0 = inicio); siempre desde el inicio para no arrastrar recortes
+    if frecuencia == "semanal":
+        return inicio + timedelta(weeks=n)
+    return _sumar_meses(inicio, n if frecuencia == "mensual" else 12 * n)
+
+
+def siguiente(plantilla, n):
+    fecha = ocurrencia(plantilla.inicio, plantilla.frecuencia, n)
+    return None if plantilla.fin and fecha > plantilla.fin else fecha
+
+
+def vencidas(plantilla, hasta):
+    # [(n, fecha)] pendientes hasta `hasta`, como mucho MAX_OCURRENCIAS
+    pendientes, n = [], plantilla.generados
+    fecha = plantilla.proxima
+    while fecha is not None and fecha <= hasta and len(pendientes) < MAX_OCURRENCIAS:
+        pendientes.append((n, fecha))
+        n += 1
+        fecha = siguiente(plantilla, n)
+    return pendientes
+
+
+def actualizar_proxima(usuario_id):
+    proxima = (GastoRecurrente.objects.using(PRIMARIO).filter(usuario_id=usuario_id, proxima__isnull=False)
+               .aggregate(m=Min("proxima"))["m"])
+    Usuario.objects.filter(pk=usuario_id).update(recurrente_proxima=proxima)
+
+
+def materializar(usuario_id, plantillas, hasta):
+    # crea las ocurrencias vencidas de las plantillas (todas del mismo usuario)
+    with transaction.atomic(using=PRIMARIO):
+        version = invalidar(usuario_id)  # bloquea al usuario: una materialización a la vez
+        gastos = []
+        for plantilla in plantillas:
+            pendientes = vencidas(plantilla, hasta)
+            if not pendientes:
+                continue
+            generados = pendientes[-1][0] + 1
+            reclamada = GastoRecurrente.objects.filter(pk=plantilla.pk, generados=plantilla.generados).update(
+                generados=generados, proxima=siguiente(plantilla, generados)
+            )
+            if not reclamada:
+                continue  # otro proceso ya la materializó
+            gastos += [
+                Gasto(usuario_id=usuario_id, recurrente_id=plantilla.pk, categoria=plantilla.categoria,
+                      cantidad=plantilla.cantidad, fecha=fecha, version_sync=version)
+                for _, fecha in pendientes
+            ]
+        Gasto.objects.bulk_create(gastos)
+        resumen.registrar_lote(usuario_id, gastos)
+        presupuestos.registrar(usuario_id, despues=gastos)
+        actualizar_proxima(usuario_id)
+    return len(gastos)
+
+
+def materializar_usuario(usuario_id, hasta=None, pasadas=None):
+    # pasadas=None: hasta que no quede nada vencido (comando); las lecturas hacen una
+    hasta = hasta or timezone.localdate()
+    creados = 0
+    while pasadas is None or pasadas > 0:
+        if pasadas is not None:
+            pasadas -= 1
+        plantillas = list(GastoRecurrente.objects.using(PRIMARIO).filter(usuario_id=usuario_id, proxima__lte=hasta))
+        if not plantillas:
+            return creados
+        nuevos = materializar(usuario_id, plantillas, hasta)
+        if not nuevos:
+            return creados
+        creados += nuevos
+    return creados
+
+
+def hay_vencidos(usuario, hoy=None):
+    return usuario.recurrente_proxima is not None and usuario.recurrente_proxima <= (hoy or timezone.localdate())
+
+
+def con_recurrentes(metodo):
+    # decora un GET de DRF (debajo de @en_replica): antes de leer, materializa lo vencido
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        from .autenticacion import get_usuario
+        try:
+            usuario = get_usuario(request)
+        except Usuario.DoesNotExist:
+            return metodo(self, request, *args, **kwargs)
+        if not hay_vencidos(usuario):
+            return metodo(self, request, *args, **kwargs)
+        materializar_usuario(usuario.id, pasadas=1)
+        request._usuario_cache = None  # cambió la versión
+        with lecturas(usuario.id):  # recién escrito: el resto de la request lee del primario
+            return metodo(self, request, *args, **kwargs)
+    return envoltura
@@ -0,0 +1,92 @@
+# usuarios/replicas.py
+# Réplica de solo lectura opcional (alias "replica" en DATABASES). Las lecturas pesadas
+# (dashboard, lista y exportación de gastos) se marcan con @en_replica y el router las
+# manda a la réplica; todo lo demás, y cualquier escritura, sigue en "default".
+# Read-your-writes: cada escritura de un usuario (versiones.invalidar) deja una marca en
+# la cache por LECTURA_PRIMARIA_SEGUNDOS; mientras exista, sus lecturas van al primario.
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.connection import ConnectionDoesNotExist
+
+REPLICA = "replica"
+
+# alias para las lecturas de la request en curso (None = lo decide Django: default)
+_alias = contextvars.ContextVar("alias_lectura", default=None)
+
+
+def _destino(alias):
+    datos = connections[alias].settings_dict
+    return datos["NAME"], datos.get("HOST"), datos.get("PORT")
+
+
+def hay_replica():
+    # una réplica que apunta a la misma base que default (p. ej. TEST MIRROR con SQLite) no cuenta
+    try:
+        return _destino(REPLICA) != _destino("default")
+    except ConnectionDoesNotExist:
+        return False
+
+
+def _clave(usuario_id):
+    return f"escritura:{usuario_id}"
+
+
+def escribio(usuario_id):
+    # llamar en cada escritura del usuario (lo hace versiones.invalidar)
+    if hay_replica() and settings.LECTURA_PRIMARIA_SEGUNDOS:
+        cache.set(_clave(usuario_id), 1, settings.LECTURA_PRIMARIA_SEGUNDOS)
+
+
+def alias_lectura():
+    return _alias.get()
+
+
+@contextmanager
+def lecturas(usuario_id):
+    # dentro del bloque las lecturas van a la réplica, salvo escritura reciente del usuario
+    usar = hay_replica() and cache.get(_clave(usuario_id)) is None
+    token = _alias.set(REPLICA if usar else None)
+    try:
+        yield _alias.get()
+    finally:
+        _alias.reset(token)
+
+
+@asynccontextmanager
+async def alecturas(usuario_id):
+    usar = hay_replica() and await cache.aget(_clave(usuario_id)) is None
+    token = _alias.set(REPLICA if usar else None)
+    try:
+        yield _alias.get()
+    finally:
+        _alias.reset(token)
+
+
+def en_replica(metodo):
+    # decora un método de vista DRF (self, request, ...)
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        from .autenticacion import usuario_id
+        with lecturas(usuario_id(request)):
+            return metodo(self, request, *args, **kwargs)
+    return envoltura
+
+
+class RouterReplica:
+    def db_for_read(self, model, **hints):
+        return _alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # la réplica tiene los mismos datos que el primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # el esquema de la réplica lo trae la replicación
+        return db != REPLICA
@@ -0,0 +1,139 @@
+# usuarios/resumen.py
+# Mantenimiento incremental de ResumenGasto (totales por usuario/mes/categoria).
+# Se llama desde las vistas dentro de la misma transacción que escribe el Gasto.
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from .models import Gasto, ResumenArchivo, ResumenGasto
+
+
+CENTAVOS = Decimal("0.01")
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+# SQLite devuelve SUM() de decimales como float: se redondea a centavos para que
+# los totales sean exactos en cualquier motor
+def centavos(valor):
+    return Decimal(valor).quantize(CENTAVOS)
+
+
+def aplicar_delta(usuario_id, fecha, categoria, cantidad, num=1, modelo=ResumenGasto):
+    # modelo: ResumenGasto, o ResumenArchivo al archivar (mismas columnas)
+    filtro = dict(usuario_id=usuario_id, mes=inicio_mes(fecha), categoria=categoria)
+    actualizados = modelo.objects.filter(**filtro).update(
+        total=F("total") + cantidad,
+        num_gastos=F("num_gastos") + num,
+    )
+    if not actualizados:
+        # primera vez para ese mes/categoria; get_or_create resuelve la carrera de creación
+        resumen, _ = modelo.objects.get_or_create(**filtro)
+        modelo.objects.filter(pk=resumen.pk).update(
+            total=F("total") + cantidad,
+            num_gastos=F("num_gastos") + num,
+        )
+
+
+def registrar_gasto(usuario_id, gasto):
+    aplicar_delta(usuario_id, gasto.fecha, gasto.categoria, gasto.cantidad, 1)
+
+
+def retirar_gasto(usuario_id, gasto):
+    aplicar_delta(usuario_id, gasto.fecha, gasto.categoria, -gasto.cantidad, -1)
+
+
+def _acumular(deltas, gastos, signo):
+    for g in gastos:
+        clave = (inicio_mes(g.fecha), g.categoria)
+        total, num = deltas.get(clave, (Decimal("0"), 0))
+        deltas[clave] = (total + signo * g.cantidad, num + signo)
+    return deltas
+
+
+# para escrituras masivas: un UPDATE por (mes, categoria) en vez de uno por gasto
+def registrar_lote(usuario_id, gastos, signo=1, modelo=ResumenGasto):
+    for (mes, categoria), (total, num) in _acumular({}, gastos, signo).items():
+        aplicar_delta(usuario_id, mes, categoria, total, num, modelo)
+
+
+# cambios en lote (antes -> después): se netean por (mes, categoria) y solo se escribe
+# lo que realmente cambió
+def mover_lote(usuario_id, antes, despues):
+    deltas = _acumular(_acumular({}, antes, -1), despues, 1)
+    for (mes, categoria), (total, num) in deltas.items():
+        if total or num:
+            aplicar_delta(usuario_id, mes, categoria, total, num)
+
+
+def consulta_por_categoria(usuario_id):
+    return (
+        ResumenGasto.objects.filter(usuario_id=usuario_id)
+        .values("categoria")
+        .annotate(valor=Sum("total"), num=Sum("num_gastos"))
+        .order_by("categoria")
+    )
+
+
+def totales_desde_filas(filas):
+    categorias = {f["categoria"]: centavos(f["valor"]) for f in filas if f["num"]}
+    total = sum(categorias.values(), Decimal("0"))
+    return categorias, total
+
+
+# ({categoria: Decimal}, total Decimal) leyendo solo el resumen
+def totales_por_categoria(usuario_id):
+    return totales_desde_filas(consulta_por_categoria(usuario_id))
+
+
+# total y número de gastos de una lista filtrada: sin filtros sale del resumen, con filtros
+# se agrega sobre el mismo rango de índice que la página. Devuelve (queryset, agregados)
+# para usar con aggregate() o aaggregate().
+def consulta_totales(usuario_id, gastos_filtrados, filtrado):
+    if filtrado:
+        return gastos_filtrados.order_by(), {"total": Sum("cantidad"), "gastos": Count("id")}
+    return ResumenGasto.objects.filter(usuario_id=usuario_id), {"total": Sum("total"), "gastos": Sum("num_gastos")}
+
+
+def sumar_totales(fila, otra):
+    # totales de la tabla caliente + los del archivo (ver archivo.consulta_archivo)
+    return {"total": centavos(fila["total"] or 0) + centavos(otra["total"] or 0),
+            "gastos": (fila["gastos"] or 0) + (otra["gastos"] or 0)}
+
+
+def formatear_totales(fila):
+    # el total como string con 2 decimales, igual que la cantidad de cada gasto
+    return {"total": f"{centavos(fila['total'] or 0):f}", "gastos": fila["gastos"] or 0}
+
+
+# agregados reales desde la tabla de gastos: {(mes, categoria): (total, num)}
+def calcular_desde_gastos(usuario):
+    filas = (
+        Gasto.objects.filter(usuario=usuario)
+        .annotate(mes=TruncMonth("fecha"))
+        .values("mes", "categoria")
+        .annotate(total=Sum("cantidad"), num=Count("id"))
+        .order_by()
+    )
+    reales = {(f["mes"], f["categoria"]): (centavos(f["total"]), f["num"]) for f in filas}
+    # lo archivado ya no está en la tabla de gastos: entra por su resumen (exacto, en centavos)
+    for r in ResumenArchivo.objects.filter(usuario=usuario, num_gastos__gt=0):
+        total, num = reales.get((r.mes, r.categoria), (Decimal("0"), 0))
+        reales[(r.mes, r.categoria)] = (total + centavos(r.total), num + r.num_gastos)
+    return reales
+
+
+def leer_resumen(usuario):
+    filas = ResumenGasto.objects.filter(usuario=usuario, num_gastos__gt=0)
+    return {(r.mes, r.categoria): (r.total, r.num_gastos) for r in filas}
+
+
+def reconstruir(usuario):
+    with transaction.atomic():
+        ResumenGasto.objects.filter(usuario=usuario).delete()
+        ResumenGasto.objects.bulk_create([
+            ResumenGasto(usuario=usuario, mes=mes, categoria=categoria, total=total, num_gastos=num)
+            for (mes, categoria), (total, num) in calcular_desde_gastos(usuario).items()
+        ])
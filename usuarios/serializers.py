@@ -1,6 +1,9 @@
 # usuarios/serializers.py
+from datetime import date
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Usuario, Gasto
+from .models import Usuario, Gasto, GastoRecurrente
+from .metricas import medir
 
 class UsuarioSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,13 +11,115 @@ class UsuarioSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'correo', 'presupuesto']
 
 
+class PresupuestoSerializer(serializers.Serializer):
+    # POST /api/presupuesto/: mismo rango que Usuario.presupuesto; NaN, infinitos y negativos no
+    presupuesto = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0"))
+    periodo = serializers.ChoiceField(choices=Usuario.PERIODOS, required=False)
+
+
+class MedidoListSerializer(serializers.ListSerializer):
+    # el tiempo de serialización aparece en Server-Timing y /metrics
+    @property
+    def data(self):
+        with medir("serializer"):
+            return super().data
+
+
 class GastoSerializer(serializers.ModelSerializer):
     fecha = serializers.SerializerMethodField()
 
     class Meta:
         model = Gasto
         fields = ['id', 'categoria', 'cantidad', 'fecha']
+        list_serializer_class = MedidoListSerializer
+
+    @property
+    def data(self):
+        with medir("serializer"):
+            return super().data
 
     def get_fecha(self, obj):
         # obj.fecha es un date; mantenemos formato ISO YYYY-MM-DD
         return obj.fecha.isoformat() if obj.fecha else None
+
+
+class GastoLoteSerializer(serializers.Serializer):
+    # una operación de POST /api/gastos/lote/: {"id": 1, "op": "eliminar" | "categoria" | "cantidad", ...}
+    OPERACIONES = ("eliminar", "categoria", "cantidad")
+
+    id = serializers.IntegerField()
+    op = serializers.ChoiceField(choices=OPERACIONES)
+    categoria = serializers.ChoiceField(choices=Gasto.CATEGORIAS, required=False)
+    cantidad = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] != "eliminar" and attrs["op"] not in attrs:
+            raise serializers.ValidationError({attrs["op"]: "Este campo es requerido."})
+        return attrs
+
+
+class GastoRecurrenteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GastoRecurrente
+        fields = ['id', 'categoria', 'cantidad', 'frecuencia', 'inicio', 'fin', 'proxima']
+        read_only_fields = ['proxima']
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            # el calendario define qué ocurrencias ya se generaron: no se edita
+            for campo in ("frecuencia", "inicio"):
+                if campo in attrs and attrs[campo] != getattr(self.instance, campo):
+                    raise serializers.ValidationError({campo: "No se puede cambiar, crea otro gasto recurrente"})
+        inicio = attrs.get("inicio", getattr(self.instance, "inicio", None))
+        fin = attrs.get("fin", getattr(self.instance, "fin", None))
+        if fin and inicio and fin < inicio:
+            raise serializers.ValidationError({"fin": "fin no puede ser anterior a inicio"})
+        return attrs
+
+
+class GastoImportSerializer(GastoSerializer):
+    # mismas reglas que GastoSerializer, pero en una importación la fecha viene del archivo
+    fecha = serializers.DateField(required=False)
+
+    class Meta(GastoSerializer.Meta):
+        fields = ['categoria', 'cantidad', 'fecha']
+
+
+# --- camino rápido de solo lectura ---
+# Mismo JSON que GastoSerializer pero desde values_list: sin instancias del modelo ni
+# campos de DRF, cada valor sale ya como str/int. Para listas de miles de gastos.
+CAMPOS_GASTO = ("id", "categoria", "cantidad", "fecha")
+_CENTAVOS = Decimal("0.01")
+
+
+def _cantidad(valor):
+    # igual que DecimalField(decimal_places=2) con COERCE_DECIMAL_TO_STRING
+    return f"{valor.quantize(_CENTAVOS):f}"
+
+
+_FORMATOS = {"id": int, "categoria": str, "cantidad": _cantidad, "fecha": date.isoformat}
+
+
+def campos_pedidos(params):
+    # ?fields=id,cantidad -> ("id", "cantidad"), en el orden de CAMPOS_GASTO
+    valor = params.get("fields")
+    if not valor:
+        return CAMPOS_GASTO
+    pedidos = {c.strip() for c in valor.split(",") if c.strip()}
+    desconocidos = pedidos - set(CAMPOS_GASTO)
+    if desconocidos or not pedidos:
+        raise serializers.ValidationError(
+            {"fields": f"Campos válidos: {', '.join(CAMPOS_GASTO)}"}
+        )
+    return tuple(c for c in CAMPOS_GASTO if c in pedidos)
+
+
+def filas_gasto(queryset):
+    # siempre trae los cuatro campos: la paginación necesita fecha e id aunque no se pidan
+    return queryset.values_list(*CAMPOS_GASTO, named=True)
+
+
+def gastos_rapidos(filas, campos=CAMPOS_GASTO):
+    formatos = [(c, CAMPOS_GASTO.index(c), _FORMATOS[c]) for c in campos]
+    with medir("serializer"):
+        return [{c: f(fila[i]) for c, i, f in formatos} for fila in filas]
@@ -0,0 +1,123 @@
+# usuarios/series.py
+# Series de gasto por día / semana / mes agregadas en la base de datos.
+# Para "mes", los meses completos del rango salen de ResumenGasto (pocas filas aunque
+# el rango sea de años); solo los meses de los bordes se agregan desde Gasto.
+# ResumenGasto incluye lo archivado; lo que se agrega desde filas suma también
+# GastoArchivado si el rango empieza antes de Usuario.archivado_hasta (usuarios/archivo.py).
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from rest_framework.exceptions import ValidationError
+from .models import Gasto, GastoArchivado, ResumenGasto
+from .resumen import centavos, inicio_mes
+
+PERIODOS = {"dia": TruncDay, "semana": TruncWeek, "mes": TruncMonth}
+MAX_PUNTOS = 1000
+
+
+def inicio_periodo(fecha, periodo):
+    if periodo == "dia":
+        return fecha
+    if periodo == "semana":
+        return fecha - timedelta(days=fecha.weekday())  # lunes, igual que TruncWeek
+    return inicio_mes(fecha)
+
+
+def siguiente(fecha, periodo):
+    if periodo == "dia":
+        return fecha + timedelta(days=1)
+    if periodo == "semana":
+        return fecha + timedelta(days=7)
+    return (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def rango_por_defecto(periodo, hasta):
+    # últimos 30 días, 12 semanas o 12 meses
+    if periodo == "dia":
+        return hasta - timedelta(days=29)
+    if periodo == "semana":
+        return inicio_periodo(hasta, "semana") - timedelta(weeks=11)
+    mes = inicio_mes(hasta)
+    for _ in range(11):
+        mes = inicio_mes(mes - timedelta(days=1))
+    return mes
+
+
+def _agregar(queryset, periodo, desde, hasta, categorias):
+    queryset = queryset.filter(fecha__gte=desde, fecha__lte=hasta)
+    if categorias:
+        queryset = queryset.filter(categoria__in=categorias)
+    return list(
+        queryset.annotate(periodo=PERIODOS[periodo]("fecha"))
+        .values_list("periodo", "categoria")
+        .annotate(total=Sum("cantidad"))
+        .order_by()
+    )
+
+
+def _desde_gastos(usuario_id, periodo, desde, hasta, categorias, archivado_hasta=None):
+    filas = _agregar(Gasto.objects.filter(usuario_id=usuario_id), periodo, desde, hasta, categorias)
+    if archivado_hasta is not None and desde < archivado_hasta:
+        archivados = GastoArchivado.objects.filter(usuario_id=usuario_id, fecha__lt=archivado_hasta)
+        filas += _agregar(archivados, periodo, desde, hasta, categorias)
+    return filas
+
+
+def _desde_resumen(usuario_id, mes_desde, mes_hasta, categorias):
+    queryset = ResumenGasto.objects.filter(
+        usuario_id=usuario_id, mes__gte=mes_desde, mes__lte=mes_hasta, num_gastos__gt=0
+    )
+    if categorias:
+        queryset = queryset.filter(categoria__in=categorias)
+    return queryset.values_list("mes", "categoria", "total")
+
+
+def _filas(usuario_id, periodo, desde, hasta, categorias, archivado_hasta):
+    if periodo != "mes":
+        return _desde_gastos(usuario_id, periodo, desde, hasta, categorias, archivado_hasta)
+
+    primer_completo = desde if desde.day == 1 else siguiente(inicio_mes(desde), "mes")
+    if (hasta + timedelta(days=1)).day == 1:
+        ultimo_completo = inicio_mes(hasta)
+    else:
+        ultimo_completo = inicio_mes(inicio_mes(hasta) - timedelta(days=1))
+    if primer_completo > ultimo_completo:
+        return _desde_gastos(usuario_id, periodo, desde, hasta, categorias, archivado_hasta)
+
+    filas = list(_desde_resumen(usuario_id, primer_completo, ultimo_completo, categorias))
+    # bordes parciales: del día "desde" a fin de su mes, y del inicio del último mes a "hasta"
+    if desde < primer_completo:
+        filas += _desde_gastos(usuario_id, periodo, desde, primer_completo - timedelta(days=1), categorias,
+                               archivado_hasta)
+    despues = siguiente(ultimo_completo, "mes")
+    if despues <= hasta:
+        filas += _desde_gastos(usuario_id, periodo, despues, hasta, categorias, archivado_hasta)
+    return filas
+
+
+def calcular(usuario_id, periodo, desde, hasta, categorias=(), por_categoria=False, archivado_hasta=None):
+    if periodo not in PERIODOS:
+        raise ValidationError({"periodo": "periodo debe ser dia, semana o mes"})
+
+    inicios = []
+    actual = inicio_periodo(desde, periodo)
+    while actual <= hasta:
+        inicios.append(actual)
+        if len(inicios) > MAX_PUNTOS:
+            raise ValidationError({"desde": f"El rango pedido supera {MAX_PUNTOS} puntos"})
+        actual = siguiente(actual, periodo)
+
+    acumulado = {}
+    for inicio, categoria, total in _filas(usuario_id, periodo, desde, hasta, categorias, archivado_hasta):
+        por_cat = acumulado.setdefault(inicio, {})
+        por_cat[categoria] = por_cat.get(categoria, Decimal("0")) + centavos(total)
+
+    puntos = []
+    for inicio in inicios:
+        por_cat = acumulado.get(inicio, {})
+        punto = {"periodo": inicio.isoformat(), "total": sum(por_cat.values(), Decimal("0"))}
+        if por_categoria:
+            punto["categorias"] = dict(sorted(por_cat.items()))
+        puntos.append(punto)
+    return puntos
@@ -0,0 +1,42 @@
+# usuarios/sync.py
+# Sync incremental para clientes offline. El token es la version_datos del usuario:
+# cada escritura de gastos la sube dentro de su transacción (versiones.invalidar) y la
+# deja en Gasto.version_sync, o en GastoEliminado si fue un borrado. Un cliente con el
+# token N pide lo que tenga versión en (N, actual].
+from django.db import transaction
+from django.db.models import Max
+from .models import Usuario, Gasto, GastoEliminado
+from .serializers import filas_gasto
+
+
+def cambios(usuario_id, desde, hasta):
+    # `hasta` tiene que ser la versión leída ANTES de esta consulta: todo lo que tenga
+    # versión <= hasta ya está confirmado, lo posterior llega en el próximo sync
+    gastos = filas_gasto(
+        Gasto.objects.filter(usuario_id=usuario_id, version_sync__gt=desde, version_sync__lte=hasta)
+        .order_by("version_sync", "id")
+    )
+    eliminados = (
+        GastoEliminado.objects.filter(usuario_id=usuario_id, version_sync__gt=desde, version_sync__lte=hasta)
+        .order_by("version_sync", "gasto_id")
+        .values_list("gasto_id", flat=True)
+    )
+    return list(gastos), list(eliminados)
+
+
+def purgar(antes_de):
+    # borra lápidas viejas; los tokens anteriores a la última purgada pasan a pedir reinicio
+    purgadas = 0
+    viejas = (
+        GastoEliminado.objects.filter(eliminado_en__lt=antes_de)
+        .values("usuario_id").annotate(version=Max("version_sync")).order_by()
+    )
+    for fila in viejas:
+        with transaction.atomic():
+            Usuario.objects.filter(pk=fila["usuario_id"], sync_desde__lt=fila["version"]).update(
+                sync_desde=fila["version"]
+            )
+            purgadas += GastoEliminado.objects.filter(
+                usuario_id=fila["usuario_id"], version_sync__lte=fila["version"]
+            ).delete()[0]
+    return purgadas
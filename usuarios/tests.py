@@ -1,3 +1,1620 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import subprocess
+import sys
+import threading
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .autenticacion import tokens_para
+
+from . import insights, presupuestos
+from .archivo import archivar_usuario, corte
+from .models import (
+    Usuario, Gasto, GastoArchivado, GastoEliminado, GastoRecurrente, InsightUsuario, ResumenArchivo,
+    ResumenGasto, CorreoPendiente, OTPCode,
+)
+from .resumen import calcular_desde_gastos, leer_resumen, reconstruir, registrar_gasto
+from .versiones import invalidar
+from .views import GastoDetailView
+from .serializers import GastoSerializer, filas_gasto, gastos_rapidos
+
+
+class BaseAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(nombre="Ana", correo="ana@test.com", presupuesto=Decimal("1000"))
+        self.user = User.objects.create(username="ana@test.com", email="ana@test.com")
+        self.client = APIClient()
+        token = tokens_para(self.user, self.usuario).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def crear_gasto(self, categoria="comida", cantidad="10.00"):
+        resp = self.client.post("/api/gastos/", {"categoria": categoria, "cantidad": cantidad}, format="json")
+        self.assertEqual(resp.status_code, 201)
+        return resp.data["id"]
+
+
+class ResumenGastoTests(BaseAPITest):
+    def assertResumenAlineado(self):
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+    def test_crear_editar_borrar_mantienen_resumen(self):
+        a = self.crear_gasto("comida", "10.25")
+        b = self.crear_gasto("transporte", "4.75")
+        self.crear_gasto("comida", "0.10")
+        self.assertResumenAlineado()
+
+        resp = self.client.patch(f"/api/gastos/{a}/", {"categoria": "otros", "cantidad": "3.00"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertResumenAlineado()
+
+        resp = self.client.delete(f"/api/gastos/{b}/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertResumenAlineado()
+
+    def test_escrituras_con_instancia_vieja(self):
+        # la vista leyó el gasto antes de que otro pedido lo cambiara o lo borrara
+        gid = self.crear_gasto("comida", "10.00")
+        viejo = Gasto.objects.get(pk=gid)
+        self.client.patch(f"/api/gastos/{gid}/", {"cantidad": "25.00"}, format="json")
+        with mock.patch.object(GastoDetailView, "get_object", return_value=viejo):
+            resp = self.client.patch(f"/api/gastos/{gid}/", {"categoria": "otros"}, format="json")
+        self.assertEqual((resp.status_code, resp.data["cantidad"]), (200, "25.00"))
+        self.assertResumenAlineado()
+
+        self.client.delete(f"/api/gastos/{gid}/")
+        with mock.patch.object(GastoDetailView, "get_object", return_value=viejo):
+            self.assertEqual(self.client.patch(f"/api/gastos/{gid}/", {"cantidad": "1.00"}, format="json").status_code, 404)
+            self.assertEqual(self.client.delete(f"/api/gastos/{gid}/").status_code, 404)
+        self.assertFalse(Gasto.objects.filter(pk=gid).exists())  # no revive
+        self.assertEqual(GastoEliminado.objects.filter(gasto_id=gid).count(), 1)
+        self.assertResumenAlineado()
+
+    def test_dashboard_usa_resumen(self):
+        self.crear_gasto("comida", "30.00")
+        self.crear_gasto("transporte", "10.00")
+        resp = self.client.get("/api/dashboard/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["total"], 40.0)
+        self.assertEqual(resp.data["categorias"]["comida"]["valor"], Decimal("30.00"))
+        self.assertEqual(resp.data["categorias"]["comida"]["porcentaje"], 75.0)
+        self.assertEqual(resp.data["progreso"], 4.0)
+
+    def test_dashboard_omite_categorias_vaciadas(self):
+        gid = self.crear_gasto("comida", "5.00")
+        self.client.delete(f"/api/gastos/{gid}/")
+        resp = self.client.get("/api/dashboard/")
+        self.assertEqual(resp.data["categorias"], {})
+        self.assertEqual(resp.data["total"], 0.0)
+
+    def test_comando_verifica_y_reconstruye(self):
+        self.crear_gasto("comida", "12.00")
+        call_command("resumen_gastos", "--verificar", stdout=StringIO())
+
+        # gasto insertado por fuera de las vistas: el resumen queda desalineado
+        Gasto.objects.create(usuario=self.usuario, cantidad=Decimal("8.00"),
+                             categoria="otros", fecha=date(2024, 1, 15))
+        with self.assertRaises(CommandError):
+            call_command("resumen_gastos", "--verificar", stdout=StringIO())
+
+        call_command("resumen_gastos", stdout=StringIO())
+        call_command("resumen_gastos", "--verificar", stdout=StringIO())
+        self.assertEqual(ResumenGasto.objects.get(usuario=self.usuario, categoria="otros").mes, date(2024, 1, 1))
+
+
+class GastoPaginacionTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        inicio = date(2024, 1, 1)
+        # varios gastos por día para ejercitar el desempate por id
+        self.gastos = Gasto.objects.bulk_create([
+            Gasto(usuario=self.usuario, cantidad=Decimal(i + 1), categoria="comida",
+                  fecha=inicio + timedelta(days=i // 3))
+            for i in range(25)
+        ])
+        self.esperado = [g.id for g in sorted(self.gastos, key=lambda g: (g.fecha, g.id), reverse=True)]
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos, url, paginas = [], "/api/gastos/?limite=4", []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            paginas.append(resp.data)
+            vistos += [g["id"] for g in resp.data["results"]]
+            url = resp.data["next"]
+        self.assertEqual(vistos, self.esperado)
+        self.assertIsNone(paginas[0]["previous"])
+
+        # y hacia atrás desde la última página
+        atras, url = [], paginas[-1]["previous"]
+        while url:
+            resp = self.client.get(url)
+            atras = [g["id"] for g in resp.data["results"]] + atras
+            url = resp.data["previous"]
+        self.assertEqual(atras + [g["id"] for g in paginas[-1]["results"]], self.esperado)
+
+    def test_costo_constante_por_pagina(self):
+        primera = self.client.get("/api/gastos/?limite=2")
+        # versión del usuario (cache/ETag) + una sola consulta de página, sin COUNT
+        with self.assertNumQueries(2):
+            self.client.get(primera.data["next"])
+
+    def test_modo_lista_completa(self):
+        resp = self.client.get("/api/gastos/?todos=1")
+        self.assertEqual([g["id"] for g in resp.data], self.esperado)
+
+    def test_cursor_invalido(self):
+        resp = self.client.get("/api/gastos/?cursor=basura")
+        self.assertEqual(resp.status_code, 404)
+
+    @override_settings(DASHBOARD_GASTOS_RECIENTES=5)
+    def test_dashboard_solo_recientes(self):
+        resp = self.client.get("/api/dashboard/")
+        self.assertEqual([g["id"] for g in resp.data["gastos"]], self.esperado[:5])
+
+
+class GastoImportTests(BaseAPITest):
+    def test_importa_lista_json(self):
+        filas = [
+            {"categoria": "comida", "cantidad": "10.50", "fecha": "2024-02-01"},
+            {"categoria": "otros", "cantidad": "3.00"},
+        ]
+        resp = self.client.post("/api/gastos/importar/", filas, format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["creados"], 2)
+        self.assertEqual(Gasto.objects.get(categoria="comida").fecha, date(2024, 2, 1))
+        self.assertEqual(Gasto.objects.get(categoria="otros").fecha, date.today())
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+    def test_errores_por_fila_y_nada_insertado(self):
+        filas = [
+            {"categoria": "comida", "cantidad": "1.00"},
+            {"categoria": "viajes", "cantidad": "1.00"},
+            {"categoria": "comida", "cantidad": "abc"},
+        ]
+        resp = self.client.post("/api/gastos/importar/", filas, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([e["fila"] for e in resp.data["errores"]], [2, 3])
+        self.assertIn("categoria", resp.data["errores"][0]["errores"])
+        self.assertFalse(Gasto.objects.exists())
+
+    def test_importa_csv(self):
+        archivo = BytesIO("categoria,cantidad,fecha\ncomida,5.25,2024-03-10\ntransporte,2.00,\n".encode("utf-8"))
+        archivo.name = "gastos.csv"
+        resp = self.client.post("/api/gastos/importar/", {"archivo": archivo})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["creados"], 2)
+        self.assertEqual(Gasto.objects.get(categoria="comida").cantidad, Decimal("5.25"))
+
+
+class GastoExportTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        for fecha, categoria, cantidad in [
+            (date(2024, 1, 5), "comida", "10.50"),
+            (date(2024, 2, 5), "transporte", "3.00"),
+            (date(2024, 3, 5), "comida", "7.25"),
+        ]:
+            Gasto.objects.create(usuario=self.usuario, fecha=fecha, categoria=categoria,
+                                 cantidad=Decimal(cantidad))
+        otro = Usuario.objects.create(nombre="Beto", correo="beto@test.com")
+        Gasto.objects.create(usuario=otro, categoria="comida", cantidad=Decimal("99.00"))
+
+    def leer(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content).decode("utf-8")
+
+    def test_csv(self):
+        resp = self.client.get("/api/gastos/exportar/", HTTP_ACCEPT="text/csv")
+        self.assertEqual(resp["Content-Type"], "text/csv; charset=utf-8")
+        lineas = self.leer(resp).splitlines()
+        self.assertEqual(lineas[0], "id,categoria,cantidad,fecha")
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[1].endswith(",comida,10.50,2024-01-05"))
+
+    def test_ndjson_con_filtros(self):
+        resp = self.client.get("/api/gastos/exportar/?formato=ndjson&desde=2024-01-01&hasta=2024-03-31&categoria=comida")
+        filas = [json.loads(l) for l in self.leer(resp).splitlines()]
+        self.assertEqual([(f["fecha"], f["cantidad"]) for f in filas], [("2024-01-05", "10.50"), ("2024-03-05", "7.25")])
+
+    def test_filtro_invalido(self):
+        self.assertEqual(self.client.get("/api/gastos/exportar/?desde=ayer").status_code, 400)
+        self.assertEqual(self.client.get("/api/gastos/exportar/?categoria=viajes").status_code, 400)
+        self.assertEqual(self.client.get("/api/gastos/exportar/?formato=xml").status_code, 400)
+
+
+class BackendQueFalla(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("sin red")
+
+
+class CorreoPendienteTests(TestCase):
+    def test_registro_encola_sin_enviar(self):
+        resp = self.client.post("/api/register/", {"correo": "eva@test.com", "nombre": "Eva"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        correo = CorreoPendiente.objects.get()
+        self.assertEqual(correo.destinatario, "eva@test.com")
+        self.assertEqual(correo.estado, "pendiente")
+
+    def test_worker_envia_pendientes(self):
+        Usuario.objects.create(nombre="Eva", correo="eva@test.com")
+        self.client.post("/api/login/", {"correo": "eva@test.com"})
+        self.client.post("/api/login/", {"correo": "eva@test.com"})
+
+        call_command("procesar_correos", "--una-vez", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["eva@test.com"])
+        self.assertIn("código de verificación", mail.outbox[0].body)
+        self.assertEqual(CorreoPendiente.objects.filter(estado="enviado").count(), 2)
+
+    @override_settings(CORREO_MAX_INTENTOS=2)
+    def test_reintentos_con_backoff(self):
+        CorreoPendiente.objects.create(destinatario="eva@test.com", asunto="a", mensaje="b")
+        backend = "usuarios.tests.BackendQueFalla"
+
+        call_command("procesar_correos", "--una-vez", "--backend", backend, stdout=StringIO())
+        correo = CorreoPendiente.objects.get()
+        self.assertEqual((correo.estado, correo.intentos), ("pendiente", 1))
+        self.assertIn("sin red", correo.ultimo_error)
+        self.assertGreater(correo.proximo_intento, correo.creado)
+
+        # todavía no toca reintentar
+        call_command("procesar_correos", "--una-vez", "--backend", backend, stdout=StringIO())
+        self.assertEqual(CorreoPendiente.objects.get().intentos, 1)
+
+        CorreoPendiente.objects.update(proximo_intento=correo.creado)
+        call_command("procesar_correos", "--una-vez", "--backend", backend, stdout=StringIO())
+        self.assertEqual(CorreoPendiente.objects.get().estado, "fallido")
+
+
+class IdentidadEnTokenTests(BaseAPITest):
+    # cuántas consultas cuesta cada endpoint con un token nuevo vs uno sin claims (legado)
+    def setUp(self):
+        super().setUp()
+        self.gasto_id = self.crear_gasto("comida", "10.00")
+        self.legado = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        self.legado.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def contar(self, cliente, metodo, url, datos=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = getattr(cliente, metodo)(url, datos, format="json")
+        self.assertLess(resp.status_code, 300, resp.content)
+        # SAVEPOINT/RELEASE de los atomic() no son trabajo real
+        return len([q for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]])
+
+    def test_verify_login_emite_claims(self):
+        OTPCode.objects.create(usuario=self.usuario, code="123456",
+                               expires_at=timezone.now() + timedelta(minutes=5))
+        resp = self.client.post("/api/verify-login/", {"correo": "ana@test.com", "otp": "123456"})
+        token = AccessToken(resp.data["access"])
+        self.assertEqual((token["usuario_id"], token["correo"]), (self.usuario.id, "ana@test.com"))
+
+    def test_consultas_por_endpoint(self):
+        casos = [
+            # (método, url, datos, consultas con token nuevo)
+            ("get", "/api/dashboard/", None, 3),            # usuario (presupuesto) + resumen + recientes
+            ("get", "/api/gastos/", None, 3),               # versión + página + totales (resumen)
+            ("post", "/api/gastos/", {"categoria": "comida", "cantidad": "1.00"}, 4),  # + contador del período
+            ("get", f"/api/gastos/{self.gasto_id}/", None, 1),
+            ("post", "/api/presupuesto/", {"presupuesto": "500"}, 2),  # UPDATE + lectura del contador
+        ]
+        for metodo, url, datos, esperadas in casos:
+            with self.subTest(url=url, metodo=metodo):
+                nuevas = self.contar(self.client, metodo, url, datos)
+                legado = self.contar(self.legado, metodo, url, datos)
+                self.assertEqual(nuevas, esperadas)
+                self.assertLess(nuevas, legado)
+
+    def test_cache_de_usuario_por_request(self):
+        from .autenticacion import get_usuario
+        request = type("R", (), {"user": type("U", (), {"usuario_id": self.usuario.id})()})()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_usuario(request), self.usuario)
+            self.assertEqual(get_usuario(request), self.usuario)
+
+
+class CacheVersionadaTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.gasto_id = self.crear_gasto("comida", "10.00")
+
+    def get(self, url, etag=None):
+        extra = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **extra)
+
+    def test_304_sin_tocar_gastos(self):
+        for url in ("/api/dashboard/", "/api/gastos/"):
+            with self.subTest(url=url):
+                primera = self.get(url)
+                self.assertEqual(primera.status_code, 200)
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = self.get(url, primera["ETag"])
+                self.assertEqual(resp.status_code, 304)
+                self.assertFalse([q for q in ctx.captured_queries if "usuarios_gasto" in q["sql"]])
+
+                # sin If-None-Match: servido desde la cache
+                with CaptureQueriesContext(connection) as ctx:
+                    resp = self.get(url)
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.data, primera.data)
+                self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_query_params_forman_parte_del_etag(self):
+        a = self.get("/api/gastos/?limite=1")
+        b = self.get("/api/gastos/?limite=2")
+        self.assertNotEqual(a["ETag"], b["ETag"])
+
+    def test_cada_escritura_invalida(self):
+        escrituras = [
+            lambda: self.client.post("/api/gastos/", {"categoria": "otros", "cantidad": "2.00"}, format="json"),
+            lambda: self.client.patch(f"/api/gastos/{self.gasto_id}/", {"cantidad": "11.00"}, format="json"),
+            lambda: self.client.post("/api/gastos/importar/", [{"categoria": "otros", "cantidad": "1.00"}], format="json"),
+            lambda: self.client.post("/api/presupuesto/", {"presupuesto": "750"}, format="json"),
+            lambda: self.client.delete(f"/api/gastos/{self.gasto_id}/"),
+        ]
+        for i, escribir in enumerate(escrituras):
+            with self.subTest(escritura=i):
+                antes = {url: self.get(url) for url in ("/api/dashboard/", "/api/gastos/")}
+                self.assertLess(escribir().status_code, 300)
+                for url, resp in antes.items():
+                    despues = self.get(url, resp["ETag"])
+                    self.assertEqual(despues.status_code, 200, url)
+                    self.assertNotEqual(despues["ETag"], resp["ETag"])
+                # y el dashboard refleja el cambio, no una copia cacheada
+                self.assertNotEqual(self.get("/api/dashboard/").data, antes["/api/dashboard/"].data)
+
+
+class GastoSeriesTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        datos = [
+            (date(2023, 11, 20), "comida", "5.00"),
+            (date(2023, 12, 1), "comida", "10.00"),
+            (date(2023, 12, 31), "otros", "2.50"),
+            (date(2024, 1, 1), "transporte", "4.00"),
+            (date(2024, 1, 2), "comida", "1.25"),
+            (date(2024, 2, 14), "otros", "3.00"),
+            (date(2024, 3, 5), "comida", "7.00"),
+        ]
+        for fecha, categoria, cantidad in datos:
+            self.client.post("/api/gastos/importar/", [
+                {"categoria": categoria, "cantidad": cantidad, "fecha": fecha.isoformat()}
+            ], format="json")
+        self.gastos = Gasto.objects.all()
+
+    def esperado(self, desde, hasta, clave):
+        totales = {}
+        for g in self.gastos:
+            if desde <= g.fecha <= hasta:
+                totales[clave(g.fecha)] = totales.get(clave(g.fecha), Decimal("0")) + g.cantidad
+        return totales
+
+    def obtener(self, query):
+        resp = self.client.get(f"/api/gastos/series/?{query}")
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return {p["periodo"]: p["total"] for p in resp.data["puntos"] if p["total"]}
+
+    def test_mensual_con_bordes_parciales(self):
+        desde, hasta = date(2023, 11, 25), date(2024, 3, 4)
+        esperado = self.esperado(desde, hasta, lambda f: f.replace(day=1).isoformat())
+        self.assertEqual(self.obtener(f"periodo=mes&desde={desde}&hasta={hasta}"), esperado)
+
+    def test_mensual_rango_largo_lee_resumen(self):
+        # 5 años de meses completos: una consulta a ResumenGasto, ninguna a usuarios_gasto
+        with CaptureQueriesContext(connection) as ctx:
+            datos = self.obtener("periodo=mes&desde=2020-01-01&hasta=2024-12-31")
+        self.assertEqual(sum(datos.values()), sum(g.cantidad for g in self.gastos))
+        self.assertFalse([q for q in ctx.captured_queries if "usuarios_gasto" in q["sql"]])
+
+    def test_diario_y_semanal(self):
+        desde, hasta = date(2023, 12, 1), date(2024, 1, 2)
+        self.assertEqual(
+            self.obtener(f"periodo=dia&desde={desde}&hasta={hasta}"),
+            self.esperado(desde, hasta, lambda f: f.isoformat()),
+        )
+        self.assertEqual(
+            self.obtener(f"periodo=semana&desde={desde}&hasta={hasta}"),
+            self.esperado(desde, hasta, lambda f: (f - timedelta(days=f.weekday())).isoformat()),
+        )
+
+    def test_por_categoria_y_filtro(self):
+        resp = self.client.get("/api/gastos/series/?periodo=mes&desde=2023-12-01&hasta=2024-01-31&por_categoria=1")
+        puntos = {p["periodo"]: p["categorias"] for p in resp.data["puntos"]}
+        self.assertEqual(puntos["2023-12-01"], {"comida": Decimal("10.00"), "otros": Decimal("2.50")})
+        datos = self.obtener("periodo=mes&desde=2023-12-01&hasta=2024-01-31&categoria=comida")
+        self.assertEqual(datos, {"2023-12-01": Decimal("10.00"), "2024-01-01": Decimal("1.25")})
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get("/api/gastos/series/?periodo=hora").status_code, 400)
+        self.assertEqual(self.client.get("/api/gastos/series/?periodo=dia&desde=2000-01-01").status_code, 400)
+
+
+class GenerarDatosTests(TestCase):
+    def test_genera_escala_pedida_con_resumenes(self):
+        call_command("generar_datos", usuarios=5, gastos=300, otps=2, stdout=StringIO())
+        self.assertEqual(Usuario.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Gasto.objects.count(), 300)
+        self.assertEqual(OTPCode.objects.count(), 10)
+        # reparto sesgado: el primer usuario tiene más historial que el último
+        primero, ultimo = Usuario.objects.order_by("id")[0], Usuario.objects.order_by("-id")[0]
+        self.assertGreater(Gasto.objects.filter(usuario=primero).count(),
+                           Gasto.objects.filter(usuario=ultimo).count())
+        call_command("resumen_gastos", "--verificar", stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command("generar_datos", usuarios=1, gastos=1, stdout=StringIO())
+
+
+class MetricasTests(BaseAPITest):
+    def test_server_timing(self):
+        self.crear_gasto()
+        resp = self.client.get("/api/gastos/?todos=1")
+        timing = resp["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('"2 consultas"', timing)
+        self.assertIn("serializer;dur=", timing)
+
+    def test_email_en_server_timing(self):
+        # el login solo encola el correo: se mide como encolado, no como envío
+        resp = self.client.post("/api/login/", {"correo": "ana@test.com"})
+        partes = [p.split(";")[0] for p in resp["Server-Timing"].split(", ")]
+        self.assertIn("email_encolado", partes)
+        self.assertNotIn("email", partes)
+
+    def test_endpoint_metrics(self):
+        self.client.get("/api/dashboard/")
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        texto = resp.content.decode()
+        self.assertIn("# TYPE cashtrack_request_duration_seconds histogram", texto)
+        self.assertIn('cashtrack_request_duration_seconds_count{ruta="dashboard",metodo="GET",estado="200"}', texto)
+        self.assertIn('cashtrack_db_queries_bucket{ruta="dashboard",metodo="GET",le="+Inf"}', texto)
+
+    @override_settings(METRICAS_TOKEN="secreto")
+    def test_metrics_con_token(self):
+        cliente = APIClient()
+        self.assertEqual(cliente.get("/metrics").status_code, 403)
+        self.assertEqual(cliente.get("/metrics", HTTP_AUTHORIZATION="Bearer secreto").status_code, 200)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_log_de_requests_lentas_con_sql(self):
+        with self.assertLogs("usuarios.lentas", level="WARNING") as logs:
+            self.client.get("/api/dashboard/")
+        self.assertIn("(dashboard)", logs.output[0])
+        self.assertIn("usuarios_resumengasto", logs.output[0])
+
+
+class VistasAsyncTests(BaseAPITest):
+    # las variantes ASGI responden lo mismo que las sync
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.crear_gasto("comida" if i % 2 else "transporte", f"{i + 1}.50")
+
+    def test_dashboard_igual_al_sync(self):
+        sync = self.client.get("/api/dashboard/")
+        asinc = self.client.get("/api/async/dashboard/")
+        self.assertEqual(asinc.status_code, 200)
+        self.assertEqual(json.loads(asinc.content), json.loads(sync.content))
+        # mismo ETag salvo la huella de la URL; y 304 con el propio
+        self.assertEqual(self.client.get("/api/async/dashboard/", HTTP_IF_NONE_MATCH=asinc["ETag"]).status_code, 304)
+
+    def test_gastos_paginados_igual_al_sync(self):
+        sync = self.client.get("/api/gastos/?limite=2").json()
+        asinc = self.client.get("/api/async/gastos/?limite=2").json()
+        self.assertEqual(asinc["results"], sync["results"])
+        self.assertIn("/api/async/gastos/", asinc["next"])
+        siguiente_sync = self.client.get(sync["next"]).json()
+        siguiente = self.client.get(asinc["next"]).json()
+        self.assertEqual(siguiente["results"], siguiente_sync["results"])
+        self.assertEqual(self.client.get("/api/async/gastos/?todos=1").json(),
+                         self.client.get("/api/gastos/?todos=1").json())
+        self.assertEqual(self.client.get("/api/async/gastos/?cursor=xx").status_code, 404)
+
+    def test_sin_token_401(self):
+        self.assertEqual(APIClient().get("/api/async/dashboard/").status_code, 401)
+        resp = APIClient().get("/api/async/gastos/", HTTP_AUTHORIZATION="Bearer basura")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_token_legado(self):
+        legado = APIClient()
+        legado.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.assertEqual(legado.get("/api/async/gastos/?todos=1").json(),
+                         self.client.get("/api/gastos/?todos=1").json())
+
+    def test_verify_login(self):
+        OTPCode.objects.create(usuario=self.usuario, code="123456",
+                               expires_at=timezone.now() + timedelta(minutes=5))
+        datos = {"correo": "ana@test.com", "otp": "123456"}
+        resp = APIClient().post("/api/async/verify-login/", datos, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(AccessToken(resp.json()["access"])["usuario_id"], self.usuario.id)
+        # el OTP ya quedó usado
+        self.assertEqual(APIClient().post("/api/async/verify-login/", datos, format="json").status_code, 400)
+        # un cuerpo JSON que no es un objeto es un pedido inválido, no un 500
+        for cuerpo in ([datos], "123456", None):
+            resp = APIClient().post("/api/async/verify-login/", cuerpo, format="json")
+            self.assertEqual(resp.status_code, 400)
+
+    async def test_bajo_asgi(self):
+        token = self.client._credentials["HTTP_AUTHORIZATION"]
+        resp = await AsyncClient().get("/api/async/dashboard/", headers={"Authorization": token})
+        self.assertEqual(resp.status_code, 200)
+        self.assertRegex(resp["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* consultas"')
+        self.assertEqual(len(json.loads(resp.content)["gastos"]), 5)
+        # la vista sync servida por ASGI también cuenta su SQL (corre en otro hilo)
+        resp = await AsyncClient().get("/api/dashboard/", headers={"Authorization": token})
+        self.assertRegex(resp["Server-Timing"], r'desc="[1-9]\d* consultas"')
+
+
+class MigracionUsuarioEnteroTests(TransactionTestCase):
+    # 0008 pasa Gasto de la FK por correo a la FK entera, copiando por lotes
+    antes = [("usuarios", "0007_usuario_version_datos")]
+    despues = [("usuarios", "0008_gasto_usuario")]
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        # dejar la base en la última migración para los demás tests
+        self.migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_backfill_y_reversa(self):
+        apps = self.migrar(self.antes)
+        Usuario_ = apps.get_model("usuarios", "Usuario")
+        Gasto_ = apps.get_model("usuarios", "Gasto")
+        ana = Usuario_.objects.create(nombre="Ana", correo="ana@test.com")
+        beto = Usuario_.objects.create(nombre="Beto", correo="beto@test.com")
+        for i in range(5):
+            Gasto_.objects.create(correo_usuarios=ana if i % 2 else beto, categoria="comida", cantidad=i + 1)
+
+        apps = self.migrar(self.despues)
+        Gasto_ = apps.get_model("usuarios", "Gasto")
+        self.assertEqual(Gasto_.objects.filter(usuario_id=ana.id).count(), 2)
+        self.assertEqual(Gasto_.objects.filter(usuario_id=beto.id).count(), 3)
+
+        apps = self.migrar(self.antes)
+        Gasto_ = apps.get_model("usuarios", "Gasto")
+        self.assertEqual(Gasto_.objects.filter(correo_usuarios_id="ana@test.com").count(), 2)
+
+
+class SerializadorRapidoTests(BaseAPITest):
+    # el camino rápido (values_list) tiene que dar exactamente lo mismo que GastoSerializer
+    cantidades = ["0.01", "0.10", "5", "12.30", "999.99", "1000000.00", "9999999999.99"]
+
+    def setUp(self):
+        super().setUp()
+        for i, cantidad in enumerate(self.cantidades):
+            Gasto.objects.create(usuario=self.usuario, fecha=date(2024, 1, 1) + timedelta(days=i * 40),
+                                 categoria=Gasto.CATEGORIAS[i % 4][0], cantidad=Decimal(cantidad))
+
+    def test_identico_a_gasto_serializer(self):
+        queryset = Gasto.objects.filter(usuario=self.usuario).order_by("-fecha", "-id")
+        esperado = json.loads(json.dumps(GastoSerializer(queryset, many=True).data))
+        rapido = json.loads(json.dumps(gastos_rapidos(filas_gasto(queryset))))
+        self.assertEqual(rapido, esperado)
+        self.assertEqual(rapido[0]["cantidad"], "9999999999.99")
+        self.assertEqual(rapido[-1]["cantidad"], "0.01")
+
+    def test_endpoints_identicos(self):
+        esperado = json.loads(json.dumps(GastoSerializer(
+            Gasto.objects.filter(usuario=self.usuario).order_by("-fecha", "-id"), many=True
+        ).data))
+        self.assertEqual(self.client.get("/api/gastos/?todos=1").json(), esperado)
+        self.assertEqual(self.client.get("/api/gastos/?limite=3").json()["results"], esperado[:3])
+        self.assertEqual(self.client.get("/api/dashboard/").json()["gastos"], esperado)
+        resp = self.client.get("/api/gastos/exportar/?formato=ndjson")
+        exportado = [json.loads(l) for l in b"".join(resp.streaming_content).splitlines()]
+        self.assertEqual(exportado, esperado[::-1])
+
+    def test_fields(self):
+        pagina = self.client.get("/api/gastos/?limite=2&fields=cantidad,id").json()
+        self.assertEqual(list(pagina["results"][0]), ["id", "cantidad"])
+        # el cursor sigue funcionando aunque fecha no esté entre los campos
+        siguiente = self.client.get(pagina["next"]).json()
+        self.assertEqual(siguiente["results"][0]["cantidad"], "999.99")
+        gastos = self.client.get("/api/dashboard/?fields=fecha").json()["gastos"]
+        self.assertEqual(set(gastos[0]), {"fecha"})
+        resp = self.client.get("/api/gastos/exportar/?fields=fecha,cantidad")
+        self.assertEqual(b"".join(resp.streaming_content).splitlines()[0], b"cantidad,fecha")
+
+    def test_fields_invalido(self):
+        self.assertEqual(self.client.get("/api/gastos/?fields=id,usuario").status_code, 400)
+        self.assertEqual(self.client.get("/api/async/gastos/?fields=password").status_code, 400)
+        self.assertEqual(self.client.get("/api/gastos/exportar/?fields=,").status_code, 400)
+
+
+class GastoFiltrosTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        inicio = date(2024, 1, 1)
+        Gasto.objects.bulk_create([
+            Gasto(usuario=self.usuario, fecha=inicio + timedelta(days=i),
+                  categoria=Gasto.CATEGORIAS[i % 4][0], cantidad=Decimal(i * 7 % 50) + Decimal("0.25"))
+            for i in range(60)
+        ])
+        self.gastos = list(Gasto.objects.filter(usuario=self.usuario))
+
+    def ids(self, url):
+        ids = []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200, resp.content)
+            ids += [g["id"] for g in resp.data["results"]]
+            url = resp.data["next"]
+        return ids
+
+    def test_filtros_combinados_y_orden(self):
+        url = ("/api/gastos/?limite=4&desde=2024-01-10&hasta=2024-02-20&categoria=comida,otros"
+               "&cantidad_min=5&cantidad_max=40&orden=cantidad")
+        esperado = sorted(
+            (g for g in self.gastos
+             if date(2024, 1, 10) <= g.fecha <= date(2024, 2, 20) and g.categoria in ("comida", "otros")
+             and 5 <= g.cantidad <= 40),
+            key=lambda g: (g.cantidad, g.id),
+        )
+        self.assertTrue(esperado)
+        self.assertEqual(self.ids(url), [g.id for g in esperado])
+
+    def test_orden_descendente_por_cantidad(self):
+        esperado = sorted(self.gastos, key=lambda g: (g.cantidad, g.id), reverse=True)
+        self.assertEqual(self.ids("/api/gastos/?limite=7&orden=-cantidad"), [g.id for g in esperado])
+
+    def test_totales_filtrados(self):
+        resp = self.client.get("/api/gastos/?limite=2&categoria=transporte")
+        filtrados = [g for g in self.gastos if g.categoria == "transporte"]
+        self.assertEqual(resp.data["totales"], {
+            "total": f"{sum(g.cantidad for g in filtrados):.2f}", "gastos": len(filtrados),
+        })
+        # sin filtros salen del resumen (vacío aquí: bulk_create no lo actualiza)
+        self.assertEqual(self.client.get("/api/gastos/").data["totales"], {"total": "0.00", "gastos": 0})
+        self.assertIsNone(self.client.get(resp.data["next"]).data["totales"])
+        asinc = self.client.get("/api/async/gastos/?limite=2&categoria=transporte").json()
+        self.assertEqual(asinc["totales"], resp.data["totales"])
+
+    def test_parametros_invalidos(self):
+        for query in ("orden=categoria", "cantidad_min=abc", "cantidad_min=9&cantidad_max=1", "cantidad_max=NaN"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/api/gastos/?{query}").status_code, 400)
+
+    def test_explain_usa_indice(self):
+        # cada combinación recorre un rango del índice que le corresponde, nunca la tabla entera
+        casos = [
+            ("desde=2024-01-10&hasta=2024-02-01", "gasto_usuario_fecha_id_idx"),
+            ("categoria=comida&desde=2024-01-10", "gasto_usuario_cat_fecha_idx"),
+            ("orden=cantidad&cantidad_min=5&cantidad_max=20", "gasto_usuario_cantidad_idx"),
+            ("orden=-cantidad&categoria=otros&cantidad_max=30", "gasto_usuario_cat_cant_idx"),
+            # varias categorías: el planificador elige el rango (aquí evita ordenar), pero siempre SEARCH
+            ("categoria=comida,otros&cantidad_min=5", ""),
+        ]
+        for query, indice in casos:
+            with self.subTest(query=query):
+                primera = self.client.get(f"/api/gastos/?limite=3&{query}")
+                for url in (f"/api/gastos/?limite=3&{query}", primera.data["next"]):
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as ctx:
+                        self.client.get(url)
+                    pagina = [q["sql"] for q in ctx.captured_queries
+                              if 'FROM "usuarios_gasto"' in q["sql"] and "LIMIT" in q["sql"]]
+                    with connection.cursor() as cursor:
+                        cursor.execute("EXPLAIN QUERY PLAN " + pagina[0])
+                        plan = " ".join(str(fila[-1]) for fila in cursor.fetchall())
+                    self.assertIn(f"SEARCH usuarios_gasto USING INDEX {indice}", plan)
+                    self.assertNotIn("SCAN usuarios_gasto", plan)
+
+
+class ParticionesTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        hoy = timezone.localdate()
+        # pocos gastos recientes y muchos viejos: la ventana no alcanza y hay que completar
+        Gasto.objects.bulk_create([
+            Gasto(usuario=self.usuario, fecha=hoy - timedelta(days=d), categoria="comida", cantidad=Decimal(d + 1))
+            for d in (0, 3, 10, 100, 150, 200, 400, 401, 402)
+        ])
+        self.esperado = list(Gasto.objects.filter(usuario=self.usuario).order_by("-fecha", "-id")
+                             .values_list("id", flat=True))
+
+    def test_meses(self):
+        from .particiones import meses, nombre_particion
+        self.assertEqual(list(meses(date(2024, 11, 15), date(2025, 2, 1))),
+                         [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(nombre_particion(date(2025, 2, 1)), "usuarios_gasto_202502")
+
+    def test_comando_sin_postgres(self):
+        salida = StringIO()
+        call_command("crear_particiones", stdout=salida)
+        self.assertIn("Particionado desactivado", salida.getvalue())
+
+    @override_settings(GASTOS_VENTANA_DIAS=30, DASHBOARD_GASTOS_RECIENTES=5)
+    def test_ventana_da_lo_mismo(self):
+        with CaptureQueriesContext(connection) as ctx:
+            dashboard = self.client.get("/api/dashboard/").json()
+        self.assertEqual([g["id"] for g in dashboard["gastos"]], self.esperado[:5])
+        # primero la ventana (con predicado de fecha) y luego lo anterior
+        fechas = [q["sql"] for q in ctx.captured_queries if '"usuarios_gasto"."fecha" >=' in q["sql"]]
+        self.assertTrue(fechas)
+
+        vistos, url = [], "/api/gastos/?limite=2"
+        while url:
+            resp = self.client.get(url).json()
+            vistos += [g["id"] for g in resp["results"]]
+            url = resp["next"]
+        self.assertEqual(vistos, self.esperado)
+        asinc = self.client.get("/api/async/dashboard/").json()
+        self.assertEqual([g["id"] for g in asinc["gastos"]], self.esperado[:5])
+
+    @override_settings(GASTOS_VENTANA_DIAS=30)
+    def test_ventana_suficiente_una_consulta(self):
+        from .particiones import por_ventana
+        consulta = Gasto.objects.filter(usuario=self.usuario).order_by("-fecha", "-id")
+        with self.assertNumQueries(1):
+            self.assertEqual([g.id for g in por_ventana(consulta, 2)], self.esperado[:2])
+
+
+class SyncIncrementalTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.a = self.crear_gasto("comida", "10.00")
+        self.b = self.crear_gasto("transporte", "5.00")
+        self.token = self.sync()["token"]
+
+    def sync(self, token=None):
+        url = "/api/gastos/sync/" + (f"?token={token}" if token is not None else "")
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_sin_token_pide_reiniciar(self):
+        datos = self.sync()
+        self.assertTrue(datos["reiniciar"])
+        self.usuario.refresh_from_db()
+        self.assertEqual(datos["token"], str(self.usuario.version_datos))
+
+    def test_solo_lo_cambiado_desde_el_token(self):
+        self.client.patch(f"/api/gastos/{self.a}/", {"cantidad": "12.00"}, format="json")
+        c = self.crear_gasto("otros", "1.00")
+        self.client.delete(f"/api/gastos/{self.b}/")
+
+        datos = self.sync(self.token)
+        self.assertFalse(datos["reiniciar"])
+        self.assertEqual([g["id"] for g in datos["gastos"]], [self.a, c])
+        self.assertEqual(datos["gastos"][0]["cantidad"], "12.00")
+        self.assertEqual(datos["eliminados"], [self.b])
+
+        # sin cambios nuevos: nada que bajar y el mismo token
+        siguiente = self.sync(datos["token"])
+        self.assertEqual((siguiente["gastos"], siguiente["eliminados"]), ([], []))
+        self.assertEqual(siguiente["token"], datos["token"])
+
+    def test_creado_y_borrado_entre_syncs(self):
+        c = self.crear_gasto("otros", "1.00")
+        self.client.patch(f"/api/gastos/{c}/", {"cantidad": "2.00"}, format="json")
+        self.client.delete(f"/api/gastos/{c}/")
+        datos = self.sync(self.token)
+        self.assertEqual(datos["gastos"], [])
+        self.assertEqual(datos["eliminados"], [c])
+
+    def test_escritura_en_curso_llega_en_el_siguiente_sync(self):
+        # una escritura que tomó su versión pero todavía no subió version_datos (no commiteó
+        # cuando se leyó el token) no se pierde: queda fuera ahora y entra en el próximo
+        actual = int(self.token)
+        en_curso = Gasto.objects.create(usuario=self.usuario, categoria="otros",
+                                        cantidad=Decimal("3.00"), version_sync=actual + 1)
+        borrado = GastoEliminado.objects.create(usuario=self.usuario, gasto_id=self.b, version_sync=actual + 1)
+        datos = self.sync(self.token)
+        self.assertEqual((datos["gastos"], datos["eliminados"], datos["token"]), ([], [], self.token))
+
+        Usuario.objects.filter(pk=self.usuario.pk).update(version_datos=actual + 1)
+        datos = self.sync(self.token)
+        self.assertEqual([g["id"] for g in datos["gastos"]], [en_curso.id])
+        self.assertEqual(datos["eliminados"], [borrado.gasto_id])
+
+    def test_edicion_concurrente_gana_la_ultima(self):
+        # dos ediciones del mismo gasto entre syncs: una sola fila con el último valor
+        self.client.patch(f"/api/gastos/{self.a}/", {"cantidad": "20.00"}, format="json")
+        self.client.patch(f"/api/gastos/{self.a}/", {"categoria": "otros"}, format="json")
+        datos = self.sync(self.token)
+        self.assertEqual(len(datos["gastos"]), 1)
+        self.assertEqual((datos["gastos"][0]["cantidad"], datos["gastos"][0]["categoria"]), ("20.00", "otros"))
+
+    def test_importar_entra_en_el_sync(self):
+        resp = self.client.post("/api/gastos/importar/", [
+            {"categoria": "comida", "cantidad": "1.00", "fecha": "2024-01-01"},
+            {"categoria": "comida", "cantidad": "2.00", "fecha": "2024-01-02"},
+        ], format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(self.sync(self.token)["gastos"]), 2)
+
+    def test_token_invalido(self):
+        self.assertEqual(self.client.get("/api/gastos/sync/?token=abc").status_code, 400)
+
+    def test_purgar_lapidas_vence_tokens_viejos(self):
+        self.client.delete(f"/api/gastos/{self.b}/")
+        GastoEliminado.objects.update(eliminado_en=timezone.now() - timedelta(days=100))
+        call_command("purgar_eliminados", dias=90, stdout=StringIO())
+        self.assertFalse(GastoEliminado.objects.exists())
+
+        self.assertTrue(self.sync(self.token)["reiniciar"])
+        self.usuario.refresh_from_db()
+        self.assertFalse(self.sync(self.usuario.version_datos)["reiniciar"])
+
+    def test_respuesta_chica(self):
+        for _ in range(30):
+            self.crear_gasto()
+        token = self.sync()["token"]
+        self.client.patch(f"/api/gastos/{self.a}/", {"cantidad": "1.00"}, format="json")
+        with self.assertNumQueries(3):  # usuario + gastos + lápidas
+            resp = self.client.get(f"/api/gastos/sync/?token={token}")
+        self.assertEqual(len(resp.json()["gastos"]), 1)
+
+
+class GastoLoteTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.crear_gasto("comida", "10.00") for _ in range(6)]
+        otro = Usuario.objects.create(nombre="Otro", correo="otro@test.com")
+        self.ajeno = Gasto.objects.create(usuario=otro, categoria="comida", cantidad=Decimal("1.00"))
+
+    def lote(self, operaciones, status=200):
+        resp = self.client.post("/api/gastos/lote/", operaciones, format="json")
+        self.assertEqual(resp.status_code, status, resp.content)
+        return resp.json()
+
+    def test_operaciones_mixtas_y_resultados_por_id(self):
+        a, b, c = self.ids[:3]
+        datos = self.lote([
+            {"id": a, "op": "eliminar"},
+            {"id": b, "op": "categoria", "categoria": "otros"},
+            {"id": c, "op": "cantidad", "cantidad": "2.50"},
+            {"id": self.ajeno.id, "op": "eliminar"},
+            {"id": 999999, "op": "cantidad", "cantidad": "1.00"},
+        ])
+        self.assertEqual(datos["aplicados"], 3)
+        self.assertEqual([r["estado"] for r in datos["resultados"]],
+                         ["ok", "ok", "ok", "no_encontrado", "no_encontrado"])
+
+        self.assertFalse(Gasto.objects.filter(pk=a).exists())
+        self.assertTrue(Gasto.objects.filter(pk=self.ajeno.id).exists())
+        self.assertEqual(Gasto.objects.get(pk=b).categoria, "otros")
+        self.assertEqual(Gasto.objects.get(pk=c).cantidad, Decimal("2.50"))
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+    def test_una_version_por_lote_y_sync(self):
+        self.usuario.refresh_from_db()
+        token = self.usuario.version_datos
+        self.lote([{"id": self.ids[0], "op": "eliminar"},
+                   {"id": self.ids[1], "op": "cantidad", "cantidad": "1.00"}])
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.version_datos, token + 1)
+
+        sync = self.client.get(f"/api/gastos/sync/?token={token}").json()
+        self.assertEqual([g["id"] for g in sync["gastos"]], [self.ids[1]])
+        self.assertEqual(sync["eliminados"], [self.ids[0]])
+
+    def test_consultas_no_crecen_con_el_lote(self):
+        def consultas(ids):
+            with CaptureQueriesContext(connection) as ctx:
+                self.lote([{"id": i, "op": "cantidad", "cantidad": "3.00"} for i in ids])
+            return len(ctx.captured_queries)
+        self.assertEqual(consultas(self.ids[:1]), consultas(self.ids))
+
+    def test_errores_de_validacion(self):
+        datos = self.lote([{"id": self.ids[0], "op": "categoria"}, {"id": self.ids[1], "op": "mover"}], status=400)
+        self.assertEqual([e["fila"] for e in datos["errores"]], [1, 2])
+        self.lote([{"id": self.ids[0], "op": "eliminar"}, {"id": self.ids[0], "op": "eliminar"}], status=400)
+        self.lote({"id": self.ids[0], "op": "eliminar"}, status=400)
+        self.assertEqual(Gasto.objects.filter(usuario=self.usuario).count(), 6)
+
+
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(nombre="Ana", correo="ana@test.com")
+
+    def pedir_codigo(self):
+        resp = APIClient().post("/api/login/", {"correo": "ana@test.com"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        # el código sale del correo encolado
+        return CorreoPendiente.objects.latest("id").mensaje.split(": ")[1][:6]
+
+    def verificar(self, code, url="/api/verify-login/"):
+        return APIClient().post(url, {"correo": "ana@test.com", "otp": code}, format="json")
+
+    def test_un_solo_uso(self):
+        code = self.pedir_codigo()
+        self.assertEqual(self.verificar(code).status_code, 200)
+        self.assertEqual(self.verificar(code).json(), {"error": "OTP inválido"})
+
+    def test_expirado_no_se_marca_usado(self):
+        otp = OTPCode.objects.create(usuario=self.usuario, code="123456",
+                                     expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.verificar("123456").json(), {"error": "OTP expirado"})
+        otp.refresh_from_db()
+        self.assertFalse(otp.used)
+
+    def test_uso_concurrente(self):
+        # dos verificaciones leen la fila sin usar; solo el primer UPDATE gana
+        from . import otp as otps
+        code = self.pedir_codigo()
+        fila = OTPCode.objects.filter(code=code).values("id", "usuario_id", "expires_at")
+        self.assertEqual(otps.consumir("ana@test.com", code), self.usuario.id)
+        with mock.patch.object(otps, "_pendiente", return_value=fila):
+            with self.assertRaises(otps.OTPInvalido):
+                otps.consumir("ana@test.com", code)
+
+    def test_verificacion_usa_indice(self):
+        code = self.pedir_codigo()
+        with CaptureQueriesContext(connection) as ctx:
+            self.verificar(code)
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + ctx.captured_queries[0]["sql"])
+            plan = " ".join(str(fila[-1]) for fila in cursor.fetchall())
+        self.assertIn("USING INDEX otp_pendiente_idx", plan)
+
+    def test_purgar_vencidos_y_usados(self):
+        ahora = timezone.now()
+        for usado, expira in [(True, ahora + timedelta(minutes=5)), (False, ahora - timedelta(minutes=1)),
+                              (True, ahora - timedelta(minutes=1)), (False, ahora + timedelta(minutes=5))]:
+            OTPCode.objects.create(usuario=self.usuario, code="111111", used=usado, expires_at=expira)
+        salida = StringIO()
+        call_command("purgar_otp", lote=1, stdout=salida)
+        self.assertIn("3 OTP borrados", salida.getvalue())
+        self.assertEqual(list(OTPCode.objects.values_list("used", flat=True)), [False])
+
+    @override_settings(OTP_ALMACEN="cache")
+    def test_en_cache_sin_escribir_la_tabla(self):
+        code = self.pedir_codigo()
+        self.assertFalse(OTPCode.objects.exists())
+        resp = self.verificar(code)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(AccessToken(resp.json()["access"])["usuario_id"], self.usuario.id)
+        self.assertEqual(self.verificar(code).status_code, 400)
+        self.assertEqual(self.verificar("000000").status_code, 400)
+
+        # la variante async consume de la misma cache
+        code = self.pedir_codigo()
+        self.assertEqual(self.verificar(code, "/api/async/verify-login/").status_code, 200)
+        self.assertEqual(self.verificar(code).status_code, 400)
+
+
+@override_settings(LIMITE_OTP_POR_IP=4, LIMITE_OTP_POR_CORREO=2, LIMITE_OTP_PERIODO=600)
+class LimitesOTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(4):
+            Usuario.objects.create(nombre=f"U{i}", correo=f"u{i}@test.com")
+
+    def login(self, correo, ip="10.0.0.1"):
+        return APIClient().post("/api/login/", {"correo": correo}, format="json", REMOTE_ADDR=ip)
+
+    def test_por_correo(self):
+        self.assertEqual([self.login("u0@test.com").status_code for _ in range(3)], [200, 200, 429])
+        # otro correo desde otra IP no se ve afectado
+        self.assertEqual(self.login("u1@test.com", ip="10.0.0.2").status_code, 200)
+
+    def test_por_ip(self):
+        estados = [self.login(f"u{i % 4}@test.com").status_code for i in range(5)]
+        self.assertEqual(estados, [200, 200, 200, 200, 429])
+        self.assertEqual(self.login("u3@test.com", ip="10.0.0.9").status_code, 200)
+
+    def test_x_forwarded_for_inventado_no_cambia_la_ip(self):
+        def estados(ip, xff):
+            return [APIClient().post("/api/login/", {"correo": f"u{i % 4}@test.com"}, format="json",
+                                     REMOTE_ADDR=ip, HTTP_X_FORWARDED_FOR=xff(i)).status_code for i in range(5)]
+        # sin proxy: cuenta REMOTE_ADDR aunque el encabezado rote
+        self.assertEqual(estados("10.0.0.1", lambda i: f"1.2.3.{i}"), [200, 200, 200, 200, 429])
+        # detrás de un proxy: cuenta la IP que agregó el proxy, no las que mandó el cliente
+        cache.clear()
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}):
+            resultado = estados("10.0.0.254", lambda i: f"1.2.3.{i}, 9.9.9.9")
+        self.assertEqual(resultado, [200, 200, 200, 200, 429])
+
+    def test_429_con_retry_after_y_sin_consultas(self):
+        self.login("u0@test.com")
+        self.login("u0@test.com")
+        with self.assertNumQueries(0):
+            resp = self.login("u0@test.com")
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreater(int(resp["Retry-After"]), 0)
+        self.assertLessEqual(int(resp["Retry-After"]), 1200)
+
+    def test_registro_limitado(self):
+        estados = [APIClient().post("/api/register/", {"correo": "nuevo@test.com", "nombre": "N"},
+                                    format="json").status_code for _ in range(3)]
+        self.assertEqual(estados[-1], 429)
+
+    def test_ventana_deslizante(self):
+        with mock.patch("usuarios.limites.time.time", return_value=6000.0):  # inicio de una ventana
+            self.login("u0@test.com")
+            self.login("u0@test.com")
+        # en la mitad de la ventana siguiente la anterior pesa la mitad: entra uno más
+        with mock.patch("usuarios.limites.time.time", return_value=6900.0):
+            self.assertEqual(self.login("u0@test.com").status_code, 200)
+            self.assertEqual(self.login("u0@test.com").status_code, 429)
+
+    def test_rechazados_no_cuentan(self):
+        # insistir con el correo de otra persona no la deja bloqueada más allá de la ventana
+        with mock.patch("usuarios.limites.time.time", return_value=6000.0):
+            estados = [self.login("u0@test.com", ip=f"10.0.1.{i}").status_code for i in range(12)]
+        self.assertEqual(estados, [200, 200] + [429] * 10)
+        with mock.patch("usuarios.limites.time.time", return_value=6900.0):
+            self.assertEqual(self.login("u0@test.com", ip="10.0.2.1").status_code, 200)
+
+    def test_espera(self):
+        from .limites import LimiteOTP
+        # 2 usados en la ventana recién empezada con límite 2: toda la ventana + lo que tarda en pesar 1/2
+        self.assertEqual(LimiteOTP._espera(2, 600, 0, 0, 2), 600 + 300)
+        # la ventana anterior llena y 1 usado: hay lugar cuando la anterior pesa 0
+        self.assertEqual(LimiteOTP._espera(2, 600, 0, 2, 1), 600)
+
+
+class ReplicaLecturaTests(TransactionTestCase):
+    # dos bases SQLite: la réplica es una copia del primario que no recibe las escrituras
+    # posteriores, así se ve a qué base fue cada lectura
+    databases = "__all__"  # incluye el alias "replica" si está configurado (SQLITE_REPLICA_PATH)
+
+    def setUp(self):
+        cache.clear()
+        self.anterior = connections["replica"] if "replica" in connections.databases else None
+        primario = connections["default"]
+        connections["replica"] = primario.__class__({**primario.settings_dict, "NAME": ":memory:"}, alias="replica")
+        self.usuario = Usuario.objects.create(nombre="Ana", correo="ana@test.com", presupuesto=Decimal("100"))
+        user = User.objects.create(username="ana@test.com", email="ana@test.com")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_para(user, self.usuario).access_token}")
+        for _ in range(2):
+            self.client.post("/api/gastos/", {"categoria": "comida", "cantidad": "1.00"}, format="json")
+        self.replicar()
+
+    def tearDown(self):
+        connections["replica"].close()
+        if self.anterior is None:
+            del connections["replica"]
+        else:
+            connections["replica"] = self.anterior
+
+    def replicar(self):
+        # la réplica se pone al día y termina la ventana de read-your-writes
+        connections["replica"].ensure_connection()
+        connections["default"].connection.backup(connections["replica"].connection)
+        cache.clear()
+
+    def leer(self, url):
+        with CaptureQueriesContext(connections["replica"]) as replica, \
+                CaptureQueriesContext(connections["default"]) as primario:
+            resp = self.client.get(url)
+            contenido = b"".join(resp.streaming_content) if resp.streaming else resp.content
+        return contenido, len(replica.captured_queries), len(primario.captured_queries)
+
+    def test_lecturas_a_la_replica(self):
+        for url in ("/api/dashboard/", "/api/gastos/", "/api/gastos/exportar/"):
+            with self.subTest(url=url):
+                _, en_replica, en_primario = self.leer(url)
+                self.assertGreater(en_replica, 0)
+                self.assertEqual(en_primario, 0)
+
+    @override_settings(LECTURA_PRIMARIA_SEGUNDOS=30)
+    def test_read_your_writes(self):
+        self.client.post("/api/gastos/", {"categoria": "otros", "cantidad": "5.00"}, format="json")
+        contenido, en_replica, _ = self.leer("/api/gastos/")
+        self.assertEqual(len(json.loads(contenido)["results"]), 3)  # recién escrito: primario
+        self.assertEqual(en_replica, 0)
+
+        cache.clear()  # pasó la ventana; la réplica todavía no recibió el tercer gasto
+        contenido, en_replica, _ = self.leer("/api/gastos/")
+        self.assertEqual(len(json.loads(contenido)["results"]), 2)
+        self.assertGreater(en_replica, 0)
+
+    def test_presupuesto_tambien_abre_la_ventana(self):
+        self.client.post("/api/presupuesto/", {"presupuesto": "700"}, format="json")
+        self.assertEqual(json.loads(self.leer("/api/dashboard/")[0])["presupuesto"], 700.0)
+
+    def test_escrituras_al_primario(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.client.post("/api/gastos/", {"categoria": "comida", "cantidad": "1.00"}, format="json")
+            self.client.post("/api/gastos/lote/", [{"id": Gasto.objects.first().id, "op": "eliminar"}],
+                             format="json")
+        self.assertEqual(len(replica.captured_queries), 0)
+        self.assertEqual(Gasto.objects.using("replica").count(), 2)
+
+    def test_recurrente_al_leer_cuenta_en_el_presupuesto(self):
+        # el gasto recurrente se materializa dentro de la lectura de réplica del dashboard;
+        # el contador del período tiene que salir del primario, que ya tiene la fila nueva
+        hoy = timezone.localdate()
+        self.client.post("/api/recurrentes/", {"categoria": "otros", "cantidad": "60.00", "frecuencia": "mensual",
+                                               "inicio": hoy.isoformat()}, format="json")
+        Usuario.objects.filter(pk=self.usuario.pk).update(periodo_inicio=date(2000, 1, 1))  # contador de otro mes
+        self.replicar()
+        dashboard = json.loads(self.leer("/api/dashboard/")[0])
+        self.assertEqual(Usuario.objects.get(pk=self.usuario.pk).gastado_periodo, Decimal("62.00"))
+        self.assertEqual(CorreoPendiente.objects.filter(asunto__contains="50%").count(), 1)
+        # la respuesta sale del primario (ventana read-your-writes abierta por la escritura)
+        self.assertEqual(dashboard["progreso"], 62.0)
+
+
+class ConfiguracionCacheTests(SimpleTestCase):
+    # lo que se comparte entre workers no puede vivir en una cache locmem: settings lo rechaza
+    def cargar(self, **entorno):
+        limpio = {k: v for k, v in os.environ.items()
+                  if k not in ("REDIS_URL", "DB_NAME", "SQLITE_REPLICA_PATH", "OTP_ALMACEN", "OTP_CACHE", "LIMITES_CACHE")}
+        return subprocess.run([sys.executable, "-c", "import Backend.settings"], capture_output=True, text=True,
+                              env={**limpio, **entorno}, cwd=settings.BASE_DIR)
+
+    def test_replica_exige_cache_compartida(self):
+        resultado = self.cargar(SQLITE_REPLICA_PATH="/tmp/replica.sqlite3")
+        self.assertIn("ImproperlyConfigured", resultado.stderr)
+        resultado = self.cargar(SQLITE_REPLICA_PATH="/tmp/replica.sqlite3", REDIS_URL="redis://localhost:6379/0")
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+
+    def test_otp_en_cache_exige_cache_compartida(self):
+        self.assertIn("OTP_ALMACEN", self.cargar(OTP_ALMACEN="cache").stderr)
+        resultado = self.cargar(OTP_ALMACEN="cache", REDIS_URL="redis://localhost:6379/0")
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+
+    def test_limites_compartidos_fuera_de_desarrollo(self):
+        self.assertIn("LIMITES_CACHE", self.cargar(DB_NAME="cashtrack").stderr)
+        resultado = self.cargar(DB_NAME="cashtrack", REDIS_URL="redis://localhost:6379/0")
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+
+
+class GastosRecurrentesTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+
+    def crear_plantilla(self, inicio, frecuencia="mensual", **extra):
+        datos = {"categoria": "otros", "cantidad": "450.00", "frecuencia": frecuencia,
+                 "inicio": inicio.isoformat(), **extra}
+        resp = self.client.post("/api/recurrentes/", datos, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.json()["id"]
+
+    def esperadas(self, inicio, frecuencia, hasta):
+        from .recurrentes import ocurrencia
+        fechas, n = [], 0
+        while ocurrencia(inicio, frecuencia, n) <= hasta:
+            fechas.append(ocurrencia(inicio, frecuencia, n))
+            n += 1
+        return fechas
+
+    def fechas_creadas(self, plantilla):
+        return list(Gasto.objects.filter(recurrente_id=plantilla).order_by("fecha").values_list("fecha", flat=True))
+
+    def test_calendario(self):
+        from .recurrentes import ocurrencia
+        self.assertEqual([ocurrencia(date(2024, 1, 31), "mensual", n) for n in range(4)],
+                         [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        self.assertEqual(ocurrencia(date(2024, 2, 29), "anual", 1), date(2025, 2, 28))
+        self.assertEqual(ocurrencia(date(2024, 12, 30), "semanal", 1), date(2025, 1, 6))
+
+    def test_se_materializa_al_leer(self):
+        inicio = self.hoy - timedelta(days=70)
+        plantilla = self.crear_plantilla(inicio)
+        self.assertFalse(Gasto.objects.filter(recurrente_id=plantilla).exists())
+
+        dashboard = self.client.get("/api/dashboard/").json()
+        esperadas = self.esperadas(inicio, "mensual", self.hoy)
+        self.assertEqual(self.fechas_creadas(plantilla), esperadas)
+        self.assertEqual(dashboard["total"], 450.0 * len(esperadas))
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+        # la siguiente lectura no crea nada y no consulta plantillas
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/gastos/")
+        self.assertFalse([q for q in ctx.captured_queries if "usuarios_gastorecurrente" in q["sql"]])
+        self.assertEqual(len(self.fechas_creadas(plantilla)), len(esperadas))
+
+    def test_lectura_async(self):
+        plantilla = self.crear_plantilla(self.hoy - timedelta(days=14), "semanal")
+        resp = self.client.get("/api/async/gastos/?todos=1")
+        self.assertEqual(len(resp.json()), 3)
+        self.assertEqual(len(self.fechas_creadas(plantilla)), 3)
+
+    def test_reclamo_idempotente(self):
+        # dos procesos cargaron la misma plantilla; solo el primero crea los gastos
+        from .recurrentes import materializar
+        plantilla = self.crear_plantilla(self.hoy - timedelta(days=40))
+        vista_a = GastoRecurrente.objects.get(pk=plantilla)
+        vista_b = GastoRecurrente.objects.get(pk=plantilla)
+        creados = materializar(self.usuario.id, [vista_a], self.hoy)
+        self.assertEqual(creados, 2)
+        self.assertEqual(materializar(self.usuario.id, [vista_b], self.hoy), 0)
+        self.assertEqual(len(self.fechas_creadas(plantilla)), 2)
+
+    def test_unique_por_plantilla_y_fecha(self):
+        from django.db import IntegrityError, transaction
+        plantilla = self.crear_plantilla(self.hoy)
+        Gasto.objects.create(usuario=self.usuario, recurrente_id=plantilla, categoria="otros",
+                             cantidad=Decimal("1"), fecha=self.hoy)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Gasto.objects.create(usuario=self.usuario, recurrente_id=plantilla, categoria="otros",
+                                 cantidad=Decimal("1"), fecha=self.hoy)
+
+    def test_comando_por_lotes_y_atrasadas(self):
+        otros = [Usuario.objects.create(nombre=f"U{i}", correo=f"u{i}@test.com") for i in range(3)]
+        inicio = self.hoy - timedelta(weeks=200)  # más ocurrencias que el tope por pasada
+        for usuario in [self.usuario] + otros:
+            for frecuencia in ("semanal", "mensual"):
+                GastoRecurrente.objects.create(usuario=usuario, categoria="comida", cantidad=Decimal("3.10"),
+                                               frecuencia=frecuencia, inicio=inicio, proxima=inicio)
+        salida = StringIO()
+        call_command("materializar_recurrentes", lote=3, stdout=salida)
+        por_usuario = len(self.esperadas(inicio, "semanal", self.hoy)) + len(self.esperadas(inicio, "mensual", self.hoy))
+        self.assertIn(f"{4 * por_usuario} gastos recurrentes creados", salida.getvalue())
+        self.assertFalse(GastoRecurrente.objects.filter(proxima__lte=self.hoy).exists())
+        for usuario in otros:
+            self.assertEqual(leer_resumen(usuario), calcular_desde_gastos(usuario))
+            usuario.refresh_from_db()
+            self.assertGreater(usuario.recurrente_proxima, self.hoy)
+
+        call_command("materializar_recurrentes", stdout=salida)
+        self.assertIn("0 gastos recurrentes creados", salida.getvalue())
+
+    def test_lectura_hace_una_sola_pasada(self):
+        from .recurrentes import MAX_OCURRENCIAS
+        inicio = date(1990, 1, 1)  # ~1900 semanas de atraso
+        plantilla = self.crear_plantilla(inicio, "semanal")
+        self.client.get("/api/dashboard/")
+        self.assertEqual(len(self.fechas_creadas(plantilla)), MAX_OCURRENCIAS)
+        self.client.get("/api/gastos/")  # cada lectura avanza otra pasada acotada
+        self.assertEqual(len(self.fechas_creadas(plantilla)), 2 * MAX_OCURRENCIAS)
+        call_command("materializar_recurrentes", stdout=StringIO())  # el resto, por el comando
+        self.assertEqual(self.fechas_creadas(plantilla), self.esperadas(inicio, "semanal", self.hoy))
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+    def test_fin_y_edicion(self):
+        inicio = self.hoy - timedelta(days=70)
+        plantilla = self.crear_plantilla(inicio, fin=(inicio + timedelta(days=40)).isoformat())
+        self.client.get("/api/dashboard/")
+        self.assertEqual(len(self.fechas_creadas(plantilla)), 2)
+        self.assertIsNone(self.client.get(f"/api/recurrentes/{plantilla}/").json()["proxima"])
+
+        resp = self.client.patch(f"/api/recurrentes/{plantilla}/", {"inicio": self.hoy.isoformat()}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.client.delete(f"/api/recurrentes/{plantilla}/")
+        self.assertEqual(Gasto.objects.filter(usuario=self.usuario).count(), 2)  # los creados quedan
+
+
+class ArchivoGastosTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        categorias = [c for c, _ in Gasto.CATEGORIAS]
+        # tres años de gastos con centavos que en float no suman exacto
+        Gasto.objects.bulk_create([
+            Gasto(usuario=self.usuario, fecha=self.hoy - timedelta(days=9 * i),
+                  categoria=categorias[i % 4], cantidad=Decimal(("0.10", "0.20", "33.33", "1999.99")[i % 4]))
+            for i in range(125)
+        ])
+        reconstruir(self.usuario)
+        self.corte = corte()
+        self.viejo = self.hoy - timedelta(days=9 * 120)
+
+    def vistas(self):
+        cache.clear()
+        desde_borde = (self.corte - timedelta(days=45)).isoformat()
+        rutas = [
+            "/api/dashboard/",
+            "/api/async/dashboard/",
+            f"/api/gastos/series/?periodo=mes&desde={self.viejo.isoformat()}&por_categoria=1",
+            f"/api/gastos/series/?periodo=semana&desde={self.viejo.isoformat()}&categoria=comida,otros",
+            f"/api/gastos/series/?periodo=dia&desde={desde_borde}&hasta={(self.corte + timedelta(days=45)).isoformat()}",
+            f"/api/gastos/?limite=5&categoria=comida&desde={desde_borde}",
+            "/api/gastos/?limite=5&cantidad_min=0.15",
+            "/api/async/gastos/?limite=5&cantidad_max=40",
+        ]
+        datos = {}
+        for ruta in rutas:
+            resp = self.client.get(ruta)
+            self.assertEqual(resp.status_code, 200, ruta)
+            cuerpo = resp.json()
+            datos[ruta] = cuerpo.get("totales") if "results" in cuerpo else cuerpo
+        exportado = self.client.get("/api/gastos/exportar/?formato=ndjson")
+        datos["exportar"] = b"".join(exportado.streaming_content)
+        return datos
+
+    def test_totales_iguales_antes_y_despues(self):
+        antes = self.vistas()
+        reales = calcular_desde_gastos(self.usuario)
+        viejos = Gasto.objects.filter(usuario=self.usuario, fecha__lt=self.corte).count()
+
+        salida = StringIO()
+        call_command("archivar_gastos", lote=7, stdout=salida)
+        archivados = GastoArchivado.objects.filter(usuario=self.usuario).count()
+        self.assertEqual(archivados, viejos)
+        self.assertGreater(archivados, 7)  # más de un lote
+        self.assertIn(f"{archivados} gastos archivados de 1 usuarios", salida.getvalue())
+        self.assertFalse(Gasto.objects.filter(fecha__lt=self.corte).exists())
+
+        self.assertEqual(self.vistas(), antes)
+        self.assertEqual(calcular_desde_gastos(self.usuario), reales)
+        self.assertEqual(leer_resumen(self.usuario), reales)
+        call_command("resumen_gastos", verificar=True, stdout=StringIO())
+        archivado = ResumenArchivo.objects.filter(usuario=self.usuario).aggregate(n=Sum("num_gastos"))["n"]
+        self.assertEqual(archivado, archivados)
+
+        call_command("archivar_gastos", stdout=salida)
+        self.assertIn("0 gastos archivados", salida.getvalue())
+
+    def test_archivados_de_solo_lectura_y_gastos_viejos_nuevos(self):
+        viejo = Gasto.objects.filter(usuario=self.usuario, fecha__lt=self.corte).first()
+        archivar_usuario(self.usuario.id, self.corte)
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.archivado_hasta, self.corte)
+        self.assertEqual(self.client.patch(f"/api/gastos/{viejo.id}/", {"cantidad": "1.00"}, format="json").status_code, 404)
+        self.assertEqual(self.client.delete(f"/api/gastos/{viejo.id}/").status_code, 404)
+
+        # un gasto nuevo con fecha de un mes ya archivado queda en caliente y se suma igual
+        nuevo = Gasto.objects.create(usuario=self.usuario, categoria="comida", cantidad=Decimal("0.30"),
+                                     fecha=viejo.fecha)
+        registrar_gasto(self.usuario.id, nuevo)
+        invalidar(self.usuario.id)
+        dia = self.client.get(f"/api/gastos/series/?periodo=dia&desde={viejo.fecha}&hasta={viejo.fecha}").json()
+        self.assertEqual(Decimal(str(dia["puntos"][0]["total"])), viejo.cantidad + Decimal("0.30"))
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+    def test_gasto_archivado_entre_lectura_y_escritura(self):
+        # la vista leyó el gasto y el archivador lo movió antes de que lo bloqueara
+        viejo = Gasto.objects.filter(usuario=self.usuario, fecha__lt=self.corte).first()
+        archivar_usuario(self.usuario.id, self.corte)
+        with mock.patch.object(GastoDetailView, "get_object", return_value=viejo):
+            resp = self.client.patch(f"/api/gastos/{viejo.id}/", {"cantidad": "5.00"}, format="json")
+            self.assertEqual(resp.status_code, 404)
+            self.assertEqual(self.client.delete(f"/api/gastos/{viejo.id}/").status_code, 404)
+        self.assertFalse(Gasto.objects.filter(pk=viejo.id).exists())
+        self.assertFalse(GastoEliminado.objects.filter(gasto_id=viejo.id).exists())
+        self.assertEqual(leer_resumen(self.usuario), calcular_desde_gastos(self.usuario))
+
+
+class InsightsTests(BaseAPITest):
+    hoy = date(2026, 6, 15)
+
+    def setUp(self):
+        super().setUp()
+        # enero a mayo: comida fija en 100 y transporte creciendo de a 10; junio va por el día 15
+        for mes in range(1, 6):
+            self.gasto(date(2026, mes, 3), "comida", "60.00")
+            self.gasto(date(2026, mes, 20), "comida", "40.00")
+            self.gasto(date(2026, mes, 9), "transporte", f"{10 * mes}.00")
+        self.gasto(date(2026, 6, 2), "comida", "300.00")
+        self.gasto(date(2026, 6, 10), "transporte", "20.00")
+        self.otro = Usuario.objects.create(nombre="Beto", correo="beto@test.com")
+        reconstruir(self.usuario)
+
+    def gasto(self, fecha, categoria, cantidad):
+        Gasto.objects.create(usuario=self.usuario, fecha=fecha, categoria=categoria, cantidad=Decimal(cantidad))
+
+    def test_estadisticas(self):
+        self.assertEqual(insights.calcular(hoy=self.hoy), 2)
+        insight = InsightUsuario.objects.get(usuario=self.usuario)
+        self.assertEqual(insight.mes, date(2026, 6, 1))
+        self.assertEqual(insight.meses_historia, 5)  # los meses antes del primer gasto no cuentan
+        self.assertEqual(insight.promedio_mensual, Decimal("130.00"))
+        self.assertEqual(insight.tendencia_mensual, Decimal("10.00"))
+        self.assertEqual(insight.gastado_mes, Decimal("320.00"))
+        # a mitad de mes: mitad ritmo propio (320/15 por día), mitad historia (130/30)
+        self.assertEqual(insight.pronostico_mes, Decimal("512.50"))
+        self.assertEqual([a["categoria"] for a in insight.anomalias], ["comida"])
+        self.assertEqual(insight.anomalias[0]["promedio"], 100.0)
+
+        vacio = InsightUsuario.objects.get(usuario=self.otro)
+        self.assertEqual((vacio.gastado_mes, vacio.pronostico_mes, vacio.meses_historia), (0, 0, 0))
+        self.assertIsNone(vacio.tendencia_mensual)
+
+    def test_por_tramos_y_bloques_da_lo_mismo(self):
+        insights.calcular(hoy=self.hoy)
+        completo = list(InsightUsuario.objects.order_by("pk").values())
+        InsightUsuario.objects.all().delete()
+        with mock.patch.object(insights, "LECTURA", 2):
+            insights.calcular(hoy=self.hoy, lote=1)
+        por_partes = list(InsightUsuario.objects.order_by("pk").values())
+        for fila in completo + por_partes:
+            fila.pop("calculado_en")
+        self.assertEqual(por_partes, completo)
+
+    def test_endpoint(self):
+        self.assertEqual(self.client.get("/api/insights/").status_code, 404)
+        insights.calcular(hoy=self.hoy)
+        with self.assertNumQueries(1):
+            datos = self.client.get("/api/insights/").json()
+        self.assertEqual(datos["pronostico_mes"], 512.5)
+        self.assertEqual(datos["pronostico_progreso"], 51.25)  # presupuesto 1000
+        self.assertFalse(datos["excede_presupuesto"])
+        self.assertEqual(datos["tendencia_mensual"], 10.0)
+
+        self.client.post("/api/presupuesto/", {"presupuesto": "500"}, format="json")
+        datos = self.client.get("/api/insights/").json()
+        self.assertTrue(datos["excede_presupuesto"])
+
+    def test_presupuesto_semanal_se_lleva_al_mes(self):
+        insights.calcular(hoy=self.hoy)
+        self.client.post("/api/presupuesto/", {"presupuesto": "150", "periodo": "semanal"}, format="json")
+        datos = self.client.get("/api/insights/").json()
+        # junio: 150 * 30 / 7 contra el pronóstico de 512.50
+        self.assertEqual((datos["presupuesto"], datos["periodo"], datos["presupuesto_mes"]),
+                         (150.0, "semanal", 642.86))
+        self.assertEqual(datos["pronostico_progreso"], 79.72)
+        self.assertFalse(datos["excede_presupuesto"])
+
+
+class PresupuestoPeriodoTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        self.client.post("/api/presupuesto/", {"presupuesto": "100"}, format="json")
+
+    def estado(self):
+        u = Usuario.objects.get(pk=self.usuario.pk)
+        return u.gastado_periodo, u.alerta_umbral
+
+    def recalculado(self):
+        u = Usuario.objects.get(pk=self.usuario.pk)
+        inicio = presupuestos.inicio_periodo(u.periodo_presupuesto, self.hoy)
+        return presupuestos.gastado_en(u.id, u.periodo_presupuesto, inicio)
+
+    def asuntos(self):
+        return list(CorreoPendiente.objects.order_by("id").values_list("asunto", flat=True))
+
+    def test_contador_y_alertas_una_vez(self):
+        self.crear_gasto(cantidad="30.00")
+        self.assertEqual(self.estado(), (Decimal("30.00"), 0))
+        segundo = self.crear_gasto(cantidad="25.00")  # 55%: cruza 50
+        self.crear_gasto(cantidad="10.00")            # 65%: nada nuevo
+        self.assertEqual(self.estado(), (Decimal("65.00"), 50))
+        self.client.patch(f"/api/gastos/{segundo}/", {"cantidad": "40.00"}, format="json")  # 80%
+        self.client.delete(f"/api/gastos/{segundo}/")  # vuelve a 40%: no se re-avisa al subir
+        self.crear_gasto(cantidad="45.00")             # 85%
+        self.crear_gasto(cantidad="20.00")             # 105%
+        self.assertEqual(self.estado(), (Decimal("105.00"), 100))
+        self.assertEqual(self.recalculado(), Decimal("105.00"))
+        self.assertEqual(self.asuntos(), [
+            "Llevas el 50% de tu presupuesto - CashTrack",
+            "Llevas el 80% de tu presupuesto - CashTrack",
+            "Superaste tu presupuesto - CashTrack",
+        ])
+
+        dashboard = self.client.get("/api/dashboard/").json()
+        self.assertEqual((dashboard["periodo"], dashboard["gastado_periodo"], dashboard["progreso"]),
+                         ("mensual", 105.0, 105.0))
+
+    def test_lote_e_importacion_cuentan_solo_el_periodo(self):
+        anterior = presupuestos.inicio_periodo("mensual", self.hoy) - timedelta(days=1)
+        filas = [{"categoria": "comida", "cantidad": "500.00", "fecha": anterior.isoformat()},
+                 {"categoria": "comida", "cantidad": "60.00", "fecha": self.hoy.isoformat()}]
+        self.assertEqual(self.client.post("/api/gastos/importar/", filas, format="json").status_code, 201)
+        self.assertEqual(self.estado(), (Decimal("60.00"), 50))
+        ids = list(Gasto.objects.order_by("fecha").values_list("id", flat=True))
+        self.client.post("/api/gastos/lote/", [{"id": ids[0], "op": "eliminar"},
+                                               {"id": ids[1], "op": "cantidad", "cantidad": "90.00"}], format="json")
+        self.assertEqual(self.estado(), (Decimal("90.00"), 80))
+        self.assertEqual(self.recalculado(), Decimal("90.00"))
+
+    def test_semanal_y_cambio_de_periodo(self):
+        lunes = presupuestos.inicio_periodo("semanal", self.hoy)
+        filas = [{"categoria": "comida", "cantidad": "30.00", "fecha": (lunes - timedelta(days=1)).isoformat()},
+                 {"categoria": "comida", "cantidad": "20.00", "fecha": lunes.isoformat()}]
+        self.client.post("/api/gastos/importar/", filas, format="json")
+        avisados = len(self.asuntos())  # según caiga el domingo, el mensual pudo pasar el 50%
+        resp = self.client.post("/api/presupuesto/", {"presupuesto": "40", "periodo": "semanal"}, format="json")
+        self.assertEqual(resp.data["periodo"], "semanal")
+        # se recalcula para la semana y el 50% ya alcanzado queda como avisado, sin correo
+        self.assertEqual(self.estado(), (Decimal("20.00"), 50))
+        self.crear_gasto(cantidad="15.00")  # 35 de 40
+        self.assertEqual(self.estado(), (Decimal("35.00"), 80))
+        self.assertEqual(self.asuntos()[avisados:], ["Llevas el 80% de tu presupuesto - CashTrack"])
+        resp = self.client.post("/api/presupuesto/", {"presupuesto": "1", "periodo": "anual"}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_presupuesto_invalido(self):
+        for valor in ("NaN", "Infinity", "1e20", "-5", "abc", "10.555"):
+            with self.subTest(valor=valor):
+                resp = self.client.post("/api/presupuesto/", {"presupuesto": valor}, format="json")
+                self.assertEqual(resp.status_code, 400)
+        self.assertEqual(Usuario.objects.get(pk=self.usuario.pk).presupuesto, Decimal("100"))
+        resp = self.client.post("/api/presupuesto/", {"presupuesto": "9999999999.99"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_subir_presupuesto_rearma_los_umbrales(self):
+        self.crear_gasto(cantidad="60.00")
+        self.client.post("/api/presupuesto/", {"presupuesto": "200"}, format="json")
+        self.assertEqual(self.estado(), (Decimal("60.00"), 0))
+        self.crear_gasto(cantidad="45.00")
+        self.assertEqual(self.estado(), (Decimal("105.00"), 50))
+        self.assertEqual(len(self.asuntos()), 2)
+
+    def test_periodo_nuevo_recalcula_una_vez(self):
+        self.crear_gasto(cantidad="60.00")
+        # como si el contador fuera del mes pasado: el próximo gasto lo rehace desde el resumen
+        Usuario.objects.filter(pk=self.usuario.pk).update(
+            periodo_inicio=date(2000, 1, 1), gastado_periodo=Decimal("999"), alerta_umbral=100)
+        self.assertEqual(self.client.get("/api/dashboard/").json()["gastado_periodo"], 60.0)
+        self.crear_gasto(cantidad="5.00")
+        self.assertEqual(self.estado(), (Decimal("65.00"), 50))
+        self.assertEqual(len(self.asuntos()), 2)  # el 50% se vuelve a avisar en el período nuevo
+
+    def test_dos_escrituras_con_el_mismo_cruce(self):
+        # dos escrituras que leyeron el mismo estado (ambas ven 40 -> 60): solo una encola
+        fila = (Decimal("60.00"), Decimal("100.00"), 0, "mensual", "ana@test.com")
+        with transaction.atomic():
+            self.assertEqual(presupuestos.avisar(self.usuario.pk, *fila), 50)
+        with transaction.atomic():
+            self.assertEqual(presupuestos.avisar(self.usuario.pk, *fila), 0)
+        self.assertEqual(len(self.asuntos()), 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "SQLite en memoria no admite escrituras concurrentes")
+class PresupuestoConcurrenciaTests(TransactionTestCase):
+    # escrituras simultáneas alrededor de un umbral, cada una en su hilo y su conexión
+    hilos = 8
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre="Ana", correo="ana@test.com", presupuesto=Decimal("100"))
+        user = User.objects.create(username="ana@test.com", email="ana@test.com")
+        self.token = tokens_para(user, self.usuario).access_token
+        self.crear("45.00")  # a 5 del 50%
+
+    def crear(self, cantidad):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return client.post("/api/gastos/", {"categoria": "comida", "cantidad": cantidad}, format="json").status_code
+
+    def simultaneos(self, cantidad):
+        barrera = threading.Barrier(self.hilos)
+        codigos = []
+
+        def escribir():
+            try:
+                barrera.wait()
+                codigos.append(self.crear(cantidad))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escribir) for _ in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return codigos
+
+    def test_cruce_simultaneo(self):
+        # 8 x 5.00: el primero cruza 50%, el séptimo 80%; cada alerta una sola vez
+        self.assertEqual(self.simultaneos("5.00"), [201] * self.hilos)
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        self.assertEqual((usuario.gastado_periodo, usuario.alerta_umbral), (Decimal("85.00"), 80))
+        self.assertEqual(CorreoPendiente.objects.count(), 2)
+        self.assertEqual(self.simultaneos("2.00"), [201] * self.hilos)  # 101%
+        self.assertEqual(list(CorreoPendiente.objects.order_by("id").values_list("asunto", flat=True)), [
+            "Llevas el 50% de tu presupuesto - CashTrack",
+            "Llevas el 80% de tu presupuesto - CashTrack",
+            "Superaste tu presupuesto - CashTrack",
+        ])
+        self.assertEqual(Usuario.objects.get(pk=self.usuario.pk).gastado_periodo, Decimal("101.00"))
 
-# Create your tests here.
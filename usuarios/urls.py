@@ -2,8 +2,11 @@
 from django.urls import path
 from .views import (
     RegisterView, VerifyRegisterView, LoginView, VerifyLoginView,
-    DashboardView, GastoView, GastoDetailView, PresupuestoView
+    DashboardView, GastoView, GastoDetailView, PresupuestoView, GastoImportView,
+    GastoExportView, GastoSeriesView, GastoSyncView, GastoLoteView,
+    GastoRecurrenteView, GastoRecurrenteDetailView, InsightView,
 )
+from .vistas_async import dashboard_async, gastos_async, verify_login_async
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
@@ -12,6 +15,18 @@ urlpatterns = [
     path("verify-login/", VerifyLoginView.as_view(), name="verify-login"),
     path("dashboard/", DashboardView.as_view(), name="dashboard"),
     path("gastos/", GastoView.as_view(), name="gastos"),              # GET y POST
+    path("gastos/importar/", GastoImportView.as_view(), name="gastos-importar"),  # POST masivo
+    path("gastos/lote/", GastoLoteView.as_view(), name="gastos-lote"),  # POST eliminar/editar varios
+    path("gastos/exportar/", GastoExportView.as_view(), name="gastos-exportar"),  # GET csv/ndjson en streaming
+    path("gastos/series/", GastoSeriesView.as_view(), name="gastos-series"),  # GET día/semana/mes
+    path("gastos/sync/", GastoSyncView.as_view(), name="gastos-sync"),  # GET ?token= cambios desde el último sync
     path("gastos/<int:pk>/", GastoDetailView.as_view(), name="gasto-detail"),  # DELETE
     path("presupuesto/", PresupuestoView.as_view(), name="presupuesto"),  # 🔥
+    path("insights/", InsightView.as_view(), name="insights"),  # GET, calculados en lote
+    path("recurrentes/", GastoRecurrenteView.as_view(), name="recurrentes"),  # GET y POST plantillas
+    path("recurrentes/<int:pk>/", GastoRecurrenteDetailView.as_view(), name="recurrente-detail"),
+    # variantes async para servir bajo ASGI (uvicorn); mismas respuestas que las de arriba
+    path("async/verify-login/", verify_login_async, name="async-verify-login"),
+    path("async/dashboard/", dashboard_async, name="async-dashboard"),
+    path("async/gastos/", gastos_async, name="async-gastos"),  # solo GET
 ]
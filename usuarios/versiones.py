@@ -0,0 +1,79 @@
+# usuarios/versiones.py
+# Versión de datos por usuario (Usuario.version_datos) y cache de respuestas por versión.
+# Toda escritura de gastos o presupuesto llama a invalidar() dentro de su transacción;
+# las lecturas arman la clave de cache y el ETag con la versión, así nunca sirven datos
+# viejos aunque la cache sea local a cada worker.
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from rest_framework.response import Response
+from .autenticacion import get_usuario
+from .models import Usuario
+from . import replicas
+
+
+def invalidar(usuario_id):
+    # sube la versión y la devuelve (None si el usuario no existe). El UPDATE bloquea la
+    # fila del usuario hasta el commit: las versiones quedan en orden de commit, que es lo
+    # que necesita el sync incremental (Gasto.version_sync / GastoEliminado).
+    tabla = Usuario._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{tabla}" SET version_datos = version_datos + 1 WHERE id = %s RETURNING version_datos',
+            [usuario_id],
+        )
+        fila = cursor.fetchone()
+    replicas.escribio(usuario_id)  # sus lecturas siguientes van al primario
+    return fila[0] if fila else None
+
+
+def _etags(request):
+    cabecera = request.META.get("HTTP_IF_NONE_MATCH", "")
+    return {e.strip().removeprefix("W/") for e in cabecera.split(",") if e.strip()}
+
+
+def firma(request, prefijo, usuario):
+    # (clave de cache, ETag, cabeceras) de la respuesta; compartido con las vistas async
+    # la URL completa (host y query params) forma parte de la clave: links de paginación,
+    # filtros...; y la fecha, porque los rangos por defecto dependen de "hoy"
+    contenido = f"{request.build_absolute_uri()}|{timezone.localdate().isoformat()}"
+    huella = hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:16]
+    etag = f'"{prefijo}-{usuario.id}-{usuario.version_datos}-{huella}"'
+    cabeceras = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    clave = f"resp:{prefijo}:{usuario.id}:{usuario.version_datos}:{huella}"
+    return clave, etag, cabeceras
+
+
+def no_modificado(request, etag):
+    return etag in _etags(request)
+
+
+def respuesta_versionada(prefijo):
+    # decora un GET de DRF: 304 si el cliente ya tiene esta versión, si no sirve desde cache
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            try:
+                usuario = get_usuario(request)
+            except Usuario.DoesNotExist:
+                return metodo(self, request, *args, **kwargs)
+
+            clave, etag, cabeceras = firma(request, prefijo, usuario)
+            if no_modificado(request, etag):
+                return Response(status=304, headers=cabeceras)
+
+            datos = cache.get(clave)
+            if datos is not None:
+                return Response(datos, headers=cabeceras)
+
+            respuesta = metodo(self, request, *args, **kwargs)
+            if respuesta.status_code == 200:
+                cache.set(clave, respuesta.data, settings.RESPUESTAS_CACHE_SEGUNDOS)
+                for nombre, valor in cabeceras.items():
+                    respuesta[nombre] = valor
+            return respuesta
+        return envoltura
+    return decorador
@@ -3,40 +3,54 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Usuario, OTPCode, Gasto
-from .serializers import UsuarioSerializer, GastoSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
+from .models import Usuario, Gasto, GastoEliminado, GastoRecurrente, InsightUsuario
+from .serializers import (
+    UsuarioSerializer, GastoSerializer, GastoImportSerializer, GastoLoteSerializer, GastoRecurrenteSerializer,
+    PresupuestoSerializer,
+    campos_pedidos, filas_gasto, gastos_rapidos,
+)
+from .autenticacion import tokens_para, get_usuario, usuario_id
 from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.negotiation import BaseContentNegotiation
+from django.db import transaction
+from django.db.models import Case, F, Value, When
 from decimal import Decimal, InvalidOperation
-import os
-# --- Importar SendGrid ---
-import sendgrid
-from sendgrid.helpers.mail import Mail
+from . import resumen
+from .pagination import GastoCursorPagination
+from .particiones import por_ventana
+from .filtros import filtrar_gastos, ordenar_gastos, hay_filtros, rango_fechas, categorias as categorias_de
+from . import series
+from . import sync
+from .versiones import invalidar, respuesta_versionada
+from django.http import HttpResponse, StreamingHttpResponse
+import hmac
+from . import metricas
+import json
+import csv
+import io
+from .correo import encolar
+from .limites import LIMITES_OTP
+from .replicas import en_replica, escribio, alias_lectura
+from . import recurrentes
+from . import archivo
+from . import presupuestos
+from . import otp as otps
+import heapq
 
 
 def enviar_otp(correo, code):
+    # se encola en la bandeja de salida; el envío real lo hace `manage.py procesar_correos`
     asunto = "Tu código de uso temporal - CashTrack"
     mensaje = f"Tu código de verificación es: {code}\n\nExpira en 5 minutos."
-
-    try:
-        sg = sendgrid.SendGridAPIClient(api_key=settings.SENDGRID_API_KEY)
-        email = Mail(
-            from_email=settings.DEFAULT_FROM_EMAIL,  # remitente validado en SendGrid
-            to_emails=correo,
-            subject=asunto,
-            plain_text_content=mensaje,
-        )
-        response = sg.send(email)
-        print(f"Correo enviado a {correo}, status: {response.status_code}")
-    except Exception as e:
-        print(f"Error enviando correo: {e}")
-
+    encolar(correo, asunto, mensaje)
 
 
 class RegisterView(APIView):
+    throttle_classes = LIMITES_OTP  # cada pedido inserta un OTP y encola un correo
+
     def post(self, request):
         correo = request.data.get("correo")
         nombre = request.data.get("nombre")
@@ -44,14 +58,14 @@ class RegisterView(APIView):
         if Usuario.objects.filter(correo=correo).exists():
             return Response({"error": "Usuario ya existe"}, status=400)
 
-        usuario = Usuario(nombre=nombre, correo=correo)
-        usuario.save()
+        with transaction.atomic():
+            usuario = Usuario(nombre=nombre, correo=correo)
+            usuario.save()
 
-        # crear también (si no existe) el User nativo para JWT
-        User.objects.get_or_create(username=correo, defaults={"email": correo})
+            # crear también (si no existe) el User nativo para JWT
+            User.objects.get_or_create(username=correo, defaults={"email": correo})
 
-        otp = OTPCode.create_otp(usuario)
-        enviar_otp(correo, otp.code)
+            enviar_otp(correo, otps.emitir(usuario))
         return Response({"message": "OTP enviado al correo"}, status=200)
 
 
@@ -61,19 +75,15 @@ class VerifyRegisterView(APIView):
         code = request.data.get("otp")
 
         try:
-            otp = OTPCode.objects.filter(usuario__correo=correo, code=code, used=False).latest("id")
-        except OTPCode.DoesNotExist:
-            return Response({"error": "OTP inválido"}, status=400)
-
-        if otp.expires_at < timezone.now():
-            return Response({"error": "OTP expirado"}, status=400)
-
-        otp.used = True
-        otp.save()
+            otps.consumir(correo, code)
+        except otps.OTPInvalido as exc:
+            return Response({"error": str(exc)}, status=400)
         return Response({"message": "Usuario verificado con éxito"}, status=200)
 
 
 class LoginView(APIView):
+    throttle_classes = LIMITES_OTP
+
     def post(self, request):
         correo = request.data.get("correo")
 
@@ -82,8 +92,8 @@ class LoginView(APIView):
         except Usuario.DoesNotExist:
             return Response({"error": "Usuario no existe"}, status=404)
 
-        otp = OTPCode.create_otp(usuario)
-        enviar_otp(correo, otp.code)
+        with transaction.atomic():
+            enviar_otp(correo, otps.emitir(usuario))
         return Response({"message": "OTP enviado al correo"}, status=200)
 
 
@@ -93,19 +103,14 @@ class VerifyLoginView(APIView):
         code = request.data.get("otp")
 
         try:
-            otp = OTPCode.objects.filter(usuario__correo=correo, code=code, used=False).latest("id")
-        except OTPCode.DoesNotExist:
-            return Response({"error": "OTP inválido"}, status=400)
-
-        if otp.expires_at < timezone.now():
-            return Response({"error": "OTP expirado"}, status=400)
-
-        otp.used = True
-        otp.save()
+            uid = otps.consumir(correo, code)
+        except otps.OTPInvalido as exc:
+            return Response({"error": str(exc)}, status=400)
 
         # --- PARCHE RÁPIDO: crear/usar User y generar token con él ---
         user, _ = User.objects.get_or_create(username=correo, defaults={"email": correo})
-        refresh = RefreshToken.for_user(user)
+        # el token lleva usuario_id y correo: las vistas protegidas no vuelven a consultar la BD
+        refresh = tokens_para(user, Usuario(id=uid, correo=correo))
 
         return Response({
             "access": str(refresh.access_token),
@@ -113,105 +118,536 @@ class VerifyLoginView(APIView):
         }, status=200)
 
 
+# arma el payload del dashboard; compartido por la vista sync y la async
+def armar_dashboard(usuario, categorias_raw, total_dec, gastos_serializados, gastado_periodo):
+    total = float(total_dec)  # 🔥 convertir a float
+
+    # preparar estructura con porcentaje relativo al total (si total==0 porcentaje = 0)
+    categorias = {}
+    for cat, val in categorias_raw.items():
+        try:
+            porcentaje = (Decimal(val) / total_dec * 100) if total_dec else Decimal('0')
+        except (InvalidOperation, ZeroDivisionError):
+            porcentaje = Decimal('0')
+        categorias[cat] = {
+            "valor": val,
+            "porcentaje": round(float(porcentaje), 2)
+        }
+
+    # progreso relacionado al presupuesto: porcentaje gastado en el período en curso
+    presupuesto = usuario.presupuesto or Decimal('0')
+    try:
+        progreso = (gastado_periodo / Decimal(presupuesto) * 100) if presupuesto and presupuesto != 0 else Decimal('0')
+    except (InvalidOperation, ZeroDivisionError):
+        progreso = Decimal('0')
+
+    # total y presupuesto como número para el frontend (los gastos llevan la cantidad como string)
+    response = {
+        "total": total,
+        "categorias": categorias,
+        "gastos": gastos_serializados,
+        "presupuesto": float(presupuesto),
+        "periodo": usuario.periodo_presupuesto,
+        "gastado_periodo": float(gastado_periodo),
+        "progreso": round(float(progreso), 2)
+    }
+    return response
+
+
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @en_replica
+    @recurrentes.con_recurrentes  # crea los gastos recurrentes vencidos antes de leer
+    @respuesta_versionada("dashboard")
     def get(self, request):
         try:
-            usuario = Usuario.objects.get(correo=request.user.username)
+            usuario = get_usuario(request)
         except Usuario.DoesNotExist:
             return Response({"error": "Usuario no encontrado"}, status=404)
 
-        gastos = Gasto.objects.filter(correo_usuarios=usuario)
+        # solo los N gastos más recientes; la lista completa va por /api/gastos/ paginada
+        recientes = settings.DASHBOARD_GASTOS_RECIENTES
+        campos = campos_pedidos(request.query_params)  # ?fields= aplica a los gastos recientes
+        consulta = filas_gasto(Gasto.objects.filter(usuario_id=usuario.id).order_by("-fecha", "-id"))
+        gastos = por_ventana(consulta, recientes)  # con predicado de fecha si hay particiones
 
-        # total
-        total = sum([float(g.cantidad) for g in gastos])  # 🔥 convertir a float
+        # total y suma por categoria desde el resumen incremental (no recorre los gastos)
+        categorias_raw, total_dec = resumen.totales_por_categoria(usuario.id)
 
-        # categorias: suma por categoria
-        categorias_raw = {}
-        for g in gastos:
-            categorias_raw[g.categoria] = categorias_raw.get(g.categoria, Decimal('0')) + g.cantidad
-
-        # preparar estructura con porcentaje relativo al total (si total==0 porcentaje = 0)
-        categorias = {}
-        for cat, val in categorias_raw.items():
-            try:
-                porcentaje = (Decimal(val) / Decimal(total) * 100) if total and total != 0 else Decimal('0')
-            except (InvalidOperation, ZeroDivisionError):
-                porcentaje = Decimal('0')
-            categorias[cat] = {
-                "valor": val,
-                "porcentaje": round(float(porcentaje), 2)
-            }
-
-        # progreso relacionado al presupuesto (porcentaje de presupuesto gastado)
-        presupuesto = usuario.presupuesto or Decimal('0')
-        try:
-            progreso = (Decimal(total) / Decimal(presupuesto) * 100) if presupuesto and presupuesto != 0 else Decimal('0')
-        except (InvalidOperation, ZeroDivisionError):
-            progreso = Decimal('0')
-
-        # serializar gastos con GastoSerializer
-        gastos_serializados = GastoSerializer(gastos, many=True).data
-
-        # devolver Decimal como float/str (DRF serializa Decimal a string por defecto; convertimos a float para frontend)
-        def dec_to_number(x):
-            if isinstance(x, Decimal):
-                # si es entero grande, convertir a float puede perder precisión; para dinero suele estar bien.
-                return float(x)
-            return x
-
-        response = {
-            "total": dec_to_number(total),
-            "categorias": categorias,
-            "gastos": gastos_serializados,
-            "presupuesto": dec_to_number(presupuesto),
-            "progreso": round(float(progreso), 2)
-        }
+        # mismo formato que GastoSerializer, sin instanciar modelos
+        gastos_serializados = gastos_rapidos(gastos, campos)
 
+        # lo gastado en el período sale del contador incremental del usuario
+        gastado = presupuestos.gastado_actual(usuario)
+        response = armar_dashboard(usuario, categorias_raw, total_dec, gastos_serializados, gastado)
         return Response(response, status=200)
 
 
 class GastoView(generics.ListCreateAPIView):
     serializer_class = GastoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = GastoCursorPagination  # ?cursor=...&limite=N, o ?todos=1 para la lista completa
 
     def get_queryset(self):
-        usuario = Usuario.objects.get(correo=self.request.user.username)
-        return Gasto.objects.filter(correo_usuarios=usuario)
+        # ?desde=&hasta=&categoria=&cantidad_min=&cantidad_max=&orden=
+        queryset = Gasto.objects.filter(usuario_id=usuario_id(self.request))
+        return ordenar_gastos(filtrar_gastos(queryset, self.request.query_params), self.request.query_params)
+
+    @en_replica
+    @recurrentes.con_recurrentes
+    @respuesta_versionada("gastos")
+    def list(self, request, *args, **kwargs):
+        # lectura por el camino rápido (values_list); ?fields=id,cantidad para pedir menos campos
+        campos = campos_pedidos(request.query_params)
+        queryset = self.get_queryset()
+        filas = filas_gasto(queryset)
+        pagina = self.paginate_queryset(filas)
+        if pagina is None:
+            return Response(gastos_rapidos(filas, campos))
+        respuesta = self.get_paginated_response(gastos_rapidos(pagina, campos))
+        # totales del filtro solo en la primera página: no cambian al avanzar
+        respuesta.data["totales"] = None
+        if self.paginator.es_primera(request):
+            filtrado = hay_filtros(request.query_params)
+            consulta, agregados = resumen.consulta_totales(usuario_id(request), queryset, filtrado)
+            totales = consulta.aggregate(**agregados)
+            # sin filtros el resumen ya cuenta lo archivado; con filtros se suma aparte
+            archivados = archivo.consulta_archivo(get_usuario(request), request.query_params) if filtrado else None
+            if archivados is not None:
+                totales = resumen.sumar_totales(totales, archivados.order_by().aggregate(**agregados))
+            respuesta.data["totales"] = resumen.formatear_totales(totales)
+        return respuesta
 
     def perform_create(self, serializer):
-        usuario = Usuario.objects.get(correo=self.request.user.username)
-        serializer.save(correo_usuarios=usuario)
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            version = invalidar(uid)  # primero: bloquea al usuario y da la versión del cambio
+            gasto = serializer.save(usuario_id=uid, version_sync=version)
+            resumen.registrar_gasto(uid, gasto)
+            presupuestos.registrar(uid, despues=[gasto])  # contador del período y alertas
 
 
-class GastoDetailView(generics.RetrieveUpdateDestroyAPIView):
-    serializer_class = GastoSerializer
+class GastoImportView(APIView):
+    # POST /api/gastos/importar/ con una lista JSON de gastos o un CSV en el campo "archivo"
+    # (columnas categoria,cantidad,fecha). Todo o nada: si alguna fila falla no se inserta ninguna.
     permission_classes = [IsAuthenticated]
+    tamano_lote = 1000
 
-    def get_queryset(self):
-        usuario = self.request.user.username
-        return Gasto.objects.filter(correo_usuarios__correo=usuario)
+    def post(self, request):
+        archivo = request.FILES.get("archivo")
+        if archivo is not None:
+            try:
+                texto = io.TextIOWrapper(archivo.file, encoding="utf-8-sig")
+                filas = [
+                    {k.strip(): (v or "").strip() for k, v in fila.items() if k}
+                    for fila in csv.DictReader(texto)
+                ]
+            except (UnicodeDecodeError, csv.Error):
+                return Response({"error": "CSV inválido"}, status=400)
+            # celdas vacías = campo ausente (p. ej. fecha opcional)
+            filas = [{k: v for k, v in fila.items() if v != ""} for fila in filas]
+        elif isinstance(request.data, list):
+            filas = request.data
+        else:
+            return Response({"error": "Envía una lista de gastos o un archivo CSV"}, status=400)
+
+        if not filas:
+            return Response({"error": "No hay filas para importar"}, status=400)
+        if len(filas) > settings.IMPORTACION_MAX_FILAS:
+            return Response({"error": f"Máximo {settings.IMPORTACION_MAX_FILAS} filas por importación"}, status=400)
+
+        serializer = GastoImportSerializer(data=filas, many=True)
+        if not serializer.is_valid():
+            errores = [
+                {"fila": i + 1, "errores": e}
+                for i, e in enumerate(serializer.errors) if e
+            ]
+            return Response({"creados": 0, "errores": errores}, status=400)
+
+        uid = usuario_id(request)
+        with transaction.atomic():
+            version = invalidar(uid)
+            gastos = [Gasto(usuario_id=uid, version_sync=version, **datos) for datos in serializer.validated_data]
+            Gasto.objects.bulk_create(gastos, batch_size=self.tamano_lote)
+            resumen.registrar_lote(uid, gastos)
+            presupuestos.registrar(uid, despues=gastos)
+
+        return Response({"creados": len(gastos), "errores": []}, status=201)
+
+
+def _por_id(cambios, campo):
+    # {id: valor} -> CASE id WHEN ... THEN valor END, para un único UPDATE
+    return Case(*[When(id=i, then=Value(v)) for i, v in cambios.items()], output_field=Gasto._meta.get_field(campo))
+
+
+class GastoLoteView(APIView):
+    # POST /api/gastos/lote/ con una lista de operaciones sobre gastos del usuario:
+    #   [{"id": 1, "op": "eliminar"}, {"id": 2, "op": "categoria", "categoria": "otros"},
+    #    {"id": 3, "op": "cantidad", "cantidad": "5.00"}]
+    # Una transacción, un DELETE y un UPDATE por tipo de cambio; el resumen y la versión
+    # se actualizan una vez por lote. Ids ajenos o inexistentes salen como "no_encontrado".
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"error": "Envía una lista de operaciones"}, status=400)
+        if len(request.data) > settings.LOTE_MAX_OPERACIONES:
+            return Response({"error": f"Máximo {settings.LOTE_MAX_OPERACIONES} operaciones por lote"}, status=400)
+
+        serializer = GastoLoteSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errores = [{"fila": i + 1, "errores": e} for i, e in enumerate(serializer.errors) if e]
+            return Response({"errores": errores}, status=400)
+        operaciones = serializer.validated_data
+        ids = [o["id"] for o in operaciones]
+        if len(set(ids)) != len(ids):
+            return Response({"error": "Cada gasto puede aparecer una sola vez por lote"}, status=400)
+
+        uid = usuario_id(request)
+        with transaction.atomic():
+            version = invalidar(uid)
+            # filas actuales (bloqueadas) para saber qué existe y descontar del resumen
+            antes = {g.id: g for g in Gasto.objects.select_for_update()
+                     .filter(usuario_id=uid, id__in=ids).only("id", "fecha", "categoria", "cantidad")}
+            encontradas = [o for o in operaciones if o["id"] in antes]
+
+            borrar = [o["id"] for o in encontradas if o["op"] == "eliminar"]
+            categorias = {o["id"]: o["categoria"] for o in encontradas if o["op"] == "categoria"}
+            cantidades = {o["id"]: o["cantidad"] for o in encontradas if o["op"] == "cantidad"}
+
+            if borrar:
+                GastoEliminado.objects.bulk_create(
+                    [GastoEliminado(usuario_id=uid, gasto_id=i, version_sync=version) for i in borrar]
+                )
+                Gasto.objects.filter(usuario_id=uid, id__in=borrar).delete()
+            cambios = {"version_sync": version, "updated_at": timezone.now()}  # update() no pasa por auto_now
+            if categorias:
+                Gasto.objects.filter(usuario_id=uid, id__in=categorias).update(
+                    categoria=_por_id(categorias, "categoria"), **cambios)
+            if cantidades:
+                Gasto.objects.filter(usuario_id=uid, id__in=cantidades).update(
+                    cantidad=_por_id(cantidades, "cantidad"), **cambios)
+
+            despues = []
+            for i in list(categorias) + list(cantidades):
+                g = antes[i]
+                despues.append(Gasto(fecha=g.fecha, categoria=categorias.get(i, g.categoria),
+                                     cantidad=cantidades.get(i, g.cantidad)))
+            resumen.mover_lote(uid, [antes[o["id"]] for o in encontradas], despues)
+            presupuestos.registrar(uid, antes=[antes[o["id"]] for o in encontradas], despues=despues)
+
+        resultados = [
+            {"id": o["id"], "op": o["op"], "estado": "ok" if o["id"] in antes else "no_encontrado"}
+            for o in operaciones
+        ]
+        return Response({"aplicados": len(encontradas), "resultados": resultados}, status=200)
+
+
+def _en_bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+class _Eco:
+    # "archivo" para csv.writer que devuelve la línea en vez de guardarla
+    def write(self, valor):
+        return valor
+
+
+class _SinNegociacion(BaseContentNegotiation):
+    # la exportación no es JSON: no rechazar clientes que piden Accept: text/csv
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class GastoExportView(APIView):
+    # GET /api/gastos/exportar/?formato=csv|ndjson&desde=&hasta=&categoria=&fields=
+    # Lee con un cursor del servidor y va escribiendo la respuesta por partes:
+    # la memoria no depende de cuántos gastos tenga el usuario.
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = _SinNegociacion
+    chunk_size = 2000
+
+    @en_replica
+    def get(self, request):
+        formato = request.query_params.get("formato", "csv")
+        if formato not in ("csv", "ndjson"):
+            return Response({"error": "formato debe ser csv o ndjson"}, status=400)
+
+        columnas = campos_pedidos(request.query_params)
+        # el alias se fija aquí: la consulta corre después de que la vista devolvió la respuesta
+        alias = alias_lectura()
+        queryset = filtrar_gastos(
+            Gasto.objects.using(alias).filter(usuario_id=usuario_id(request)),
+            request.query_params,
+        )
+        filas = filas_gasto(queryset.order_by("fecha", "id")).iterator(chunk_size=self.chunk_size)
+        archivados = archivo.consulta_archivo(get_usuario(request), request.query_params)
+        if archivados is not None:
+            # la exportación es el historial completo: se intercalan los archivados por (fecha, id)
+            viejas = filas_gasto(archivados.using(alias).order_by("fecha", "id")).iterator(chunk_size=self.chunk_size)
+            filas = heapq.merge(viejas, filas, key=lambda f: (f.fecha, f.id))
+        # el mismo formato que la API, convertido por bloques para no materializar todo
+        bloques = (gastos_rapidos(bloque, columnas) for bloque in _en_bloques(filas, self.chunk_size))
+
+        if formato == "csv":
+            contenido = self._csv(bloques, columnas)
+            content_type = "text/csv; charset=utf-8"
+        else:
+            contenido = self._ndjson(bloques)
+            content_type = "application/x-ndjson"
+
+        respuesta = StreamingHttpResponse(contenido, content_type=content_type)
+        respuesta["Content-Disposition"] = f'attachment; filename="gastos.{formato}"'
+        return respuesta
+
+    def _por_bloques(self, lineas):
+        # agrupa líneas para no emitir un write() por fila
+        bloque = []
+        for linea in lineas:
+            bloque.append(linea)
+            if len(bloque) >= 500:
+                yield "".join(bloque)
+                bloque = []
+        if bloque:
+            yield "".join(bloque)
+
+    def _csv(self, bloques, columnas):
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(columnas)
+        yield from self._por_bloques(
+            escritor.writerow(gasto.values()) for bloque in bloques for gasto in bloque
+        )
 
+    def _ndjson(self, bloques):
+        yield from self._por_bloques(
+            json.dumps(gasto) + "\n" for bloque in bloques for gasto in bloque
+        )
 
-class PresupuestoView(APIView):
+
+class GastoSeriesView(APIView):
+    # GET /api/gastos/series/?periodo=dia|semana|mes&desde=&hasta=&categoria=&por_categoria=1
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    @respuesta_versionada("series")
+    def get(self, request):
+        periodo = request.query_params.get("periodo", "mes")
+        if periodo not in series.PERIODOS:
+            return Response({"error": "periodo debe ser dia, semana o mes"}, status=400)
+
+        desde, hasta = rango_fechas(request.query_params)
+        hasta = hasta or timezone.localdate()
+        desde = desde or series.rango_por_defecto(periodo, hasta)
+        if desde > hasta:
+            return Response({"error": "desde no puede ser posterior a hasta"}, status=400)
+        por_categoria = request.query_params.get("por_categoria") in ("1", "true")
+
+        puntos = series.calcular(
+            usuario_id(request), periodo, desde, hasta,
+            categorias_de(request.query_params), por_categoria,
+            archivado_hasta=get_usuario(request).archivado_hasta,
+        )
+        return Response({
+            "periodo": periodo,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "puntos": puntos,
+        }, status=200)
+
+
+class GastoSyncView(APIView):
+    # GET /api/gastos/sync/?token=N -> gastos creados/editados y ids borrados desde N, y el token nuevo.
+    # Sin token (o con uno vencido) responde reiniciar=true: recargar todo y seguir desde "token".
+    permission_classes = [IsAuthenticated]
+
+    @respuesta_versionada("sync")
+    def get(self, request):
         try:
-            usuario = Usuario.objects.get(correo=request.user.username)
+            usuario = get_usuario(request)  # la versión se lee antes que los cambios
         except Usuario.DoesNotExist:
             return Response({"error": "Usuario no encontrado"}, status=404)
+        campos = campos_pedidos(request.query_params)
+        actual = usuario.version_datos
 
-        nuevo_presupuesto = request.data.get("presupuesto")
-        if nuevo_presupuesto is None:
-            return Response({"error": "Debes enviar un valor"}, status=400)
+        token = request.query_params.get("token")
+        try:
+            desde = int(token) if token else None
+        except ValueError:
+            return Response({"token": "Token inválido"}, status=400)
+
+        respuesta = {"token": str(actual), "reiniciar": False, "gastos": [], "eliminados": [],
+                     "presupuesto": float(usuario.presupuesto)}
+        if desde is None or desde < usuario.sync_desde or desde > actual:
+            respuesta["reiniciar"] = True
+        elif desde < actual:
+            gastos, eliminados = sync.cambios(usuario.id, desde, actual)
+            respuesta["gastos"] = gastos_rapidos(gastos, campos)
+            respuesta["eliminados"] = eliminados
+        return Response(respuesta, status=200)
+
+
+class GastoDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = GastoSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Gasto.objects.filter(usuario_id=usuario_id(self.request))
+
+    def _releer(self, uid, pk):
+        # con el usuario ya bloqueado: la fila actual, no la leída antes del bloqueo
+        # (otro PATCH pudo cambiarla, un DELETE borrarla o el archivador moverla)
+        gasto = Gasto.objects.select_for_update().filter(usuario_id=uid, pk=pk).first()
+        if gasto is None:
+            raise NotFound()
+        return gasto
+
+    def perform_update(self, serializer):
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            version = invalidar(uid)
+            gasto = self._releer(uid, serializer.instance.pk)  # 404 si se borró o se archivó
+            anterior = Gasto(fecha=gasto.fecha, categoria=gasto.categoria, cantidad=gasto.cantidad)
+            for campo, valor in serializer.validated_data.items():
+                setattr(gasto, campo, valor)
+            gasto.version_sync = version
+            gasto.save(force_update=True)  # nunca un INSERT que reviva la fila
+            serializer.instance = gasto
+            resumen.retirar_gasto(uid, anterior)
+            resumen.registrar_gasto(uid, gasto)
+            presupuestos.registrar(uid, antes=[anterior], despues=[gasto])
+
+    def perform_destroy(self, instance):
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            version = invalidar(uid)
+            gasto = self._releer(uid, instance.pk)  # 404 si ya se borró o se archivó
+            resumen.retirar_gasto(uid, gasto)
+            GastoEliminado.objects.create(usuario_id=uid, gasto_id=gasto.id, version_sync=version)
+            gasto.delete()
+            presupuestos.registrar(uid, antes=[gasto])
+
+
+class GastoRecurrenteView(generics.ListCreateAPIView):
+    # GET/POST /api/recurrentes/: plantillas de gastos periódicos. Los gastos se crean al
+    # vencer (próxima lectura del dashboard / lista, o `manage.py materializar_recurrentes`)
+    serializer_class = GastoRecurrenteSerializer
+    permission_classes = [IsAuthenticated]
 
-        # parsear a Decimal de forma segura
+    def get_queryset(self):
+        return GastoRecurrente.objects.filter(usuario_id=usuario_id(self.request)).order_by("id")
+
+    def perform_create(self, serializer):
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            serializer.save(usuario_id=uid, proxima=serializer.validated_data["inicio"])
+            recurrentes.actualizar_proxima(uid)
+
+
+class GastoRecurrenteDetailView(generics.RetrieveUpdateDestroyAPIView):
+    # editar monto / categoría / fin, o borrar la plantilla (los gastos ya creados quedan)
+    serializer_class = GastoRecurrenteSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return GastoRecurrente.objects.filter(usuario_id=usuario_id(self.request))
+
+    def perform_update(self, serializer):
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            plantilla = serializer.save()
+            # con un fin nuevo la próxima ocurrencia puede desaparecer (o volver)
+            plantilla.proxima = recurrentes.siguiente(plantilla, plantilla.generados)
+            plantilla.save(update_fields=["proxima"])
+            recurrentes.actualizar_proxima(uid)
+
+    def perform_destroy(self, instance):
+        uid = usuario_id(self.request)
+        with transaction.atomic():
+            instance.delete()
+            recurrentes.actualizar_proxima(uid)
+
+
+class InsightView(APIView):
+    # GET /api/insights/ -> lo último que calculó `manage.py calcular_insights` (una consulta)
+    permission_classes = [IsAuthenticated]
+
+    @en_replica
+    def get(self, request):
         try:
-            usuario.presupuesto = Decimal(str(nuevo_presupuesto))
-        except (InvalidOperation, ValueError):
-            return Response({"error": "Valor de presupuesto inválido"}, status=400)
+            insight = InsightUsuario.objects.select_related("usuario").get(usuario_id=usuario_id(request))
+        except InsightUsuario.DoesNotExist:
+            return Response({"error": "Todavía no hay insights para este usuario"}, status=404)
+
+        # contra el presupuesto actual, aunque haya cambiado después del cálculo; el
+        # pronóstico es mensual, así que un presupuesto semanal se lleva al mes
+        usuario = insight.usuario
+        presupuesto = presupuestos.presupuesto_mensual(usuario, insight.mes)
+        progreso = round(float(insight.pronostico_mes / presupuesto * 100), 2) if presupuesto else None
+        tendencia = insight.tendencia_mensual
+        return Response({
+            "mes": insight.mes.isoformat(),
+            "gastado_mes": float(insight.gastado_mes),
+            "pronostico_mes": float(insight.pronostico_mes),
+            "presupuesto": float(usuario.presupuesto),
+            "periodo": usuario.periodo_presupuesto,
+            "presupuesto_mes": float(presupuesto),
+            "pronostico_progreso": progreso,
+            "excede_presupuesto": bool(presupuesto) and insight.pronostico_mes > presupuesto,
+            "promedio_mensual": float(insight.promedio_mensual),
+            "tendencia_mensual": None if tendencia is None else float(tendencia),
+            "meses_historia": insight.meses_historia,
+            "anomalias": insight.anomalias,
+            "calculado_en": insight.calculado_en.isoformat(),
+        }, status=200)
 
-        usuario.save()
-        return Response({"message": "Presupuesto actualizado con éxito", "presupuesto": float(usuario.presupuesto)}, status=200)
+
+class PresupuestoView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.data.get("presupuesto") is None:
+            return Response({"error": "Debes enviar un valor"}, status=400)
+        serializer = PresupuestoSerializer(data=request.data)
+        if not serializer.is_valid():
+            if "periodo" in serializer.errors:
+                return Response({"error": "periodo debe ser mensual o semanal"}, status=400)
+            return Response({"error": "Valor de presupuesto inválido",
+                             "detalle": serializer.errors["presupuesto"]}, status=400)
+        presupuesto = serializer.validated_data["presupuesto"]
+        # opcional: "mensual" o "semanal"; sin enviarlo se mantiene el período actual
+        periodo = serializer.validated_data.get("periodo")
+
+        uid = usuario_id(request)
+        cambios = {"presupuesto": presupuesto, "version_datos": F("version_datos") + 1}
+        if periodo is not None:
+            cambios["periodo_presupuesto"] = periodo
+        with transaction.atomic():
+            # UPDATE directo por id, sin leer antes la fila (y nueva versión de datos)
+            if not Usuario.objects.filter(pk=uid).update(**cambios):
+                return Response({"error": "Usuario no encontrado"}, status=404)
+            periodo = presupuestos.ajustar(uid, cambio_periodo=periodo is not None)
+        escribio(uid)
+        return Response({"message": "Presupuesto actualizado con éxito", "presupuesto": float(presupuesto),
+                         "periodo": periodo}, status=200)
+
+
+def metrics(request):
+    # /metrics interno (formato Prometheus): con METRICAS_TOKEN pide "Authorization: Bearer <token>",
+    # sin token solo responde en DEBUG o desde localhost
+    token = settings.METRICAS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponse(status=403)
+    elif not settings.DEBUG and request.META.get("REMOTE_ADDR") not in ("127.0.0.1", "::1"):
+        return HttpResponse(status=403)
+    return HttpResponse(metricas.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
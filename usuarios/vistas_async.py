@@ -0,0 +1,180 @@
+# usuarios/vistas_async.py
+# Variantes async (ASGI) de las lecturas más usadas y de la verificación del login.
+# Usan el ORM async (aget, alatest, aupdate, iteración async), así bajo uvicorn un cliente
+# lento o una consulta en curso no bloquean un worker entero. Devuelven exactamente lo
+# mismo que las vistas sync (que siguen en views.py para gunicorn):
+#     uvicorn Backend.asgi:application --workers 4
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from . import otp as otps
+from . import presupuestos
+from . import resumen
+from .archivo import consulta_archivo
+from .autenticacion import UsuarioJWTAuthentication, tokens_para
+from .filtros import filtrar_gastos, ordenar_gastos, hay_filtros
+from .models import Usuario, Gasto
+from .pagination import GastoCursorPagination
+from .particiones import apor_ventana
+from .replicas import alecturas
+from . import recurrentes
+from .serializers import campos_pedidos, filas_gasto, gastos_rapidos
+from .versiones import firma, no_modificado
+from .views import armar_dashboard
+
+_renderer = JSONRenderer()
+
+
+def _json(datos, status=200, headers=None):
+    # mismo render que DRF para que el cuerpo sea idéntico al de la vista sync
+    return HttpResponse(_renderer.render(datos), status=status, headers=headers,
+                        content_type="application/json")
+
+
+async def _autenticar(request):
+    # JWT como en UsuarioJWTAuthentication; con los claims nuevos no toca la BD
+    auth = UsuarioJWTAuthentication()
+    cabecera = auth.get_header(request)
+    crudo = auth.get_raw_token(cabecera) if cabecera is not None else None
+    if crudo is None:
+        raise NotAuthenticated()
+    token = auth.get_validated_token(crudo)
+    if "usuario_id" in token and "correo" in token:
+        return token["usuario_id"], token["correo"]
+    # tokens viejos: se resuelve el User y luego el Usuario por correo
+    user = await sync_to_async(auth.get_user)(token)
+    usuario = await Usuario.objects.only("id").aget(correo=user.username)
+    return usuario.id, user.username
+
+
+def _no_autenticado(request, exc):
+    auth = UsuarioJWTAuthentication()
+    detalle = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+    return _json(detalle, status=exc.status_code,
+                 headers={"WWW-Authenticate": auth.authenticate_header(request)})
+
+
+def protegida(vista):
+    async def envoltura(request, *args, **kwargs):
+        try:
+            request.usuario_id, request.correo = await _autenticar(request)
+        except (AuthenticationFailed, NotAuthenticated) as exc:
+            return _no_autenticado(request, exc)
+        except Usuario.DoesNotExist:
+            return _json({"error": "Usuario no encontrado"}, status=404)
+        try:
+            return await vista(request, *args, **kwargs)
+        except ValidationError as exc:
+            return _json(exc.detail, status=400)
+    return envoltura
+
+
+async def _versionada(request, prefijo, calcular, materializado=False):
+    # mismo esquema que versiones.respuesta_versionada, con la cache async
+    try:
+        usuario = await Usuario.objects.aget(pk=request.usuario_id)
+    except Usuario.DoesNotExist:
+        return _json({"error": "Usuario no encontrado"}, status=404)
+    if not materializado and recurrentes.hay_vencidos(usuario):
+        # como recurrentes.con_recurrentes: crear lo vencido y leer del primario
+        await sync_to_async(recurrentes.materializar_usuario)(usuario.id, pasadas=1)
+        async with alecturas(usuario.id):
+            return await _versionada(request, prefijo, calcular, materializado=True)
+    clave, etag, cabeceras = firma(request, prefijo, usuario)
+    if no_modificado(request, etag):
+        return HttpResponse(status=304, headers=cabeceras)
+    datos = await cache.aget(clave)
+    if datos is None:
+        datos = await calcular(usuario)
+        await cache.aset(clave, datos, settings.RESPUESTAS_CACHE_SEGUNDOS)
+    return _json(datos, headers=cabeceras)
+
+
+@require_GET
+@protegida
+async def dashboard_async(request):
+    campos = campos_pedidos(request.GET)
+
+    async def calcular(usuario):
+        recientes = settings.DASHBOARD_GASTOS_RECIENTES
+        consulta = filas_gasto(Gasto.objects.filter(usuario_id=usuario.id).order_by("-fecha", "-id"))
+        gastos = await apor_ventana(consulta, recientes)
+        filas = [f async for f in resumen.consulta_por_categoria(usuario.id)]
+        categorias_raw, total_dec = resumen.totales_desde_filas(filas)
+        gastado = await presupuestos.agastado_actual(usuario)
+        return armar_dashboard(usuario, categorias_raw, total_dec, gastos_rapidos(gastos, campos), gastado)
+    async with alecturas(request.usuario_id):
+        return await _versionada(request, "dashboard", calcular)
+
+
+@require_GET
+@protegida
+async def gastos_async(request):
+    # solo lectura: el alta sigue por POST /api/gastos/
+    drf_request = Request(request)
+    paginador = GastoCursorPagination()
+
+    campos = campos_pedidos(request.GET)
+    queryset = Gasto.objects.filter(usuario_id=request.usuario_id)
+    queryset = ordenar_gastos(filtrar_gastos(queryset, request.GET), request.GET)
+
+    async def calcular(usuario):
+        consulta = filas_gasto(queryset)
+        pagina = await paginador.apaginate_queryset(consulta, drf_request)
+        if pagina is None:
+            return gastos_rapidos([g async for g in consulta], campos)
+        datos = paginador.get_paginated_response(gastos_rapidos(pagina, campos)).data
+        datos["totales"] = None
+        if paginador.es_primera(drf_request):
+            filtrado = hay_filtros(request.GET)
+            consulta, agregados = resumen.consulta_totales(usuario.id, queryset, filtrado)
+            totales = await consulta.aaggregate(**agregados)
+            archivados = consulta_archivo(usuario, request.GET) if filtrado else None
+            if archivados is not None:
+                totales = resumen.sumar_totales(totales, await archivados.order_by().aaggregate(**agregados))
+            datos["totales"] = resumen.formatear_totales(totales)
+        return datos
+    try:
+        async with alecturas(request.usuario_id):
+            return await _versionada(request, "gastos", calcular)
+    except NotFound as exc:
+        # cursor inválido, como en la vista sync
+        return _json({"detail": exc.detail}, status=404)
+
+
+def _datos(request):
+    if request.content_type == "application/json":
+        try:
+            datos = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return datos if isinstance(datos, dict) else {}  # una lista o un escalar no trae campos
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def verify_login_async(request):
+    datos = _datos(request)
+    correo = datos.get("correo")
+    code = datos.get("otp")
+
+    try:
+        uid = await otps.aconsumir(correo, code)
+    except otps.OTPInvalido as exc:
+        return _json({"error": str(exc)}, status=400)
+
+    user, _ = await User.objects.aget_or_create(username=correo, defaults={"email": correo})
+    refresh = tokens_para(user, Usuario(id=uid, correo=correo))
+    return _json({
+        "access": str(refresh.access_token),
+        "refresh": str(refresh),
+    })